@@ -0,0 +1,126 @@
+"""
+Benchmark: IVF approximate search (`ANNStore`) vs. exact search over one memory namespace.
+
+Memories are synthetic 768-d vectors drawn around topic centres, like the
+embeddings of a user's memories on a few recurring subjects; queries are drawn
+the same way. `--spread` sets how loosely they cluster: recall at a given nprobe
+drops as it grows. For each namespace size the benchmark reports:
+- recall@k of the IVF index against brute force, for several nprobe values,
+- queries per second of the index alone and through `store.search`,
+- the same `store.search` on InMemoryStore (up to --store-limit memories, since
+  every put/search there is pure Python).
+The embedder maps each text to its precomputed vector, so the numbers are search
+cost only.
+
+Usage:
+    python -m benchmarks.bench_ann_store [--sizes 1000,10000,50000] [--k 10] [--nprobe 1,4,8,16,32] [--spread 2.0] [--store-limit 10000]
+"""
+import argparse
+import os
+import time
+from typing import Dict, List
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langgraph.store.memory import InMemoryStore
+
+from src.graph.ann_store import ANNStore, IVFIndex
+
+DIMS = 768
+NUM_TOPICS = 200
+NUM_QUERIES = 200
+NAMESPACE = ("1", "memories")
+
+
+def make_vectors(n: int, rng: np.random.Generator, centres: np.ndarray, spread: float) -> np.ndarray:
+    topics = rng.integers(0, len(centres), n)
+    return (centres[topics] + spread * rng.standard_normal((n, DIMS))).astype(np.float32)
+
+
+class LookupEmbeddings(Embeddings):
+    """Returns the precomputed vector of each text."""
+
+    def __init__(self, vectors: Dict[str, np.ndarray]):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[text].tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vectors[text].tolist()
+
+
+def _qps(fn, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return len(queries) / (time.perf_counter() - start)
+
+
+def _store_qps(store, names: List[str], k: int) -> float:
+    return _qps(lambda name: store.search(NAMESPACE, query=name, limit=k), names)
+
+
+def _fill(store, n: int):
+    for i in range(n):
+        store.put(NAMESPACE, str(i), {"data": f"memory {i}"})
+
+
+def bench_size(n: int, k: int, nprobes: List[int], store_limit: int, spread: float, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((NUM_TOPICS, DIMS)).astype(np.float32)
+    vectors = make_vectors(n, rng, centres, spread)
+    queries = make_vectors(NUM_QUERIES, rng, centres, spread)
+
+    index = IVFIndex(DIMS)
+    start = time.perf_counter()
+    # Inserted in chunks, as memories arrive, so training and incremental inserts both count
+    for chunk in range(0, n, 1000):
+        index.add(list(range(chunk, min(chunk + 1000, n))), vectors[chunk:chunk + 1000])
+    build_s = time.perf_counter() - start
+
+    truth = [{id for id, _ in index.search_exact(q, k)} for q in queries]
+    exact_qps = _qps(lambda q: index.search_exact(q, k), queries)
+    lists = index.num_lists or 1
+    print(f"n={n:,}: {lists} lists, built in {build_s:.2f}s")
+    print(f"  {'search':<16} {'recall@' + str(k):>9} {'index QPS':>10} {'speedup':>8}")
+    print(f"  {'exact':<16} {1.0:9.3f} {exact_qps:10,.0f} {1.0:7.1f}x")
+    for nprobe in nprobes:
+        if nprobe >= lists:
+            break
+        recall = np.mean([len({id for id, _ in index.search(q, k, nprobe)} & t) / k for q, t in zip(queries, truth)])
+        qps = _qps(lambda q: index.search(q, k, nprobe), queries)
+        print(f"  {'nprobe=' + str(nprobe):<16} {recall:9.3f} {qps:10,.0f} {qps / exact_qps:7.1f}x")
+
+    # End to end through BaseStore.search, query embedding excluded
+    texts = {f"memory {i}": v for i, v in enumerate(vectors)}
+    names = [f"query {i}" for i in range(NUM_QUERIES)]
+    texts.update(zip(names, queries))
+    embed = LookupEmbeddings(texts)
+    ann = ANNStore(index={"embed": embed, "dims": DIMS, "fields": ["data"]})
+    _fill(ann, n)
+    line = f"  store.search QPS: ANNStore(nprobe={ann.nprobe}) {_store_qps(ann, names, k):,.0f}"
+    if n <= store_limit:
+        exact = InMemoryStore(index={"embed": embed, "dims": DIMS, "fields": ["data"]})
+        _fill(exact, n)
+        line += f", InMemoryStore {_store_qps(exact, names, k):,.0f}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", default="1,4,8,16,32")
+    parser.add_argument("--spread", type=float, default=2.0, help="Noise around the topic centres; higher is harder for IVF")
+    parser.add_argument("--store-limit", type=int, default=10000, help="Largest namespace also measured on InMemoryStore")
+    args = parser.parse_args()
+    nprobes = [int(p) for p in args.nprobe.split(",")]
+    for n in (int(s) for s in args.sizes.split(",")):
+        bench_size(n, args.k, nprobes, args.store_limit, args.spread)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Microbenchmark: per-turn cost of `with_structured_output` / `bind_tools`.
+
+Compares rebuilding the bound runnable on every turn (what the nodes used to pay)
+with the memoized runnables of `LLM`. No request is sent, only the binding is timed.
+
+Usage:
+    python -m benchmarks.bench_bound_runnables [iterations]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+from src.model.llm import LLM
+from src.nodes.deep_researcher import ReActStep
+from src.nodes.memory_checker import MemoryDecision
+from src.tools.memory_tools import get_memory_tools
+
+
+def _time_per_call(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def main(iterations: int = 2000):
+    llm = LLM(
+        api_key="benchmark",
+        base_url=["http://127.0.0.1:1/v1", "http://127.0.0.1:2/v1"],
+        model="benchmark-model",
+    )
+    memory_tools = get_memory_tools()
+    replica = llm.replicas[0]
+
+    cases = {
+        "with_structured_output(ReActStep)": (
+            lambda: replica.llm.with_structured_output(ReActStep),
+            lambda: llm.with_structured_output(ReActStep).bound(replica),
+        ),
+        "with_structured_output(MemoryDecision)": (
+            lambda: replica.llm.with_structured_output(MemoryDecision),
+            lambda: llm.with_structured_output(MemoryDecision).bound(replica),
+        ),
+        "bind_tools(memory_tools)": (
+            lambda: replica.llm.bind_tools(memory_tools),
+            lambda: llm.bind_tools(memory_tools).bound(replica),
+        ),
+    }
+
+    print(f"{'case':<42} {'rebuilt (us)':>14} {'memoized (us)':>14} {'speedup':>9}")
+    for name, (rebuild, memoized) in cases.items():
+        memoized()  # warm the cache
+        rebuilt_time = _time_per_call(rebuild, iterations)
+        memoized_time = _time_per_call(memoized, iterations)
+        print(f"{name:<42} {rebuilt_time * 1e6:>14.1f} {memoized_time * 1e6:>14.1f} {rebuilt_time / memoized_time:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
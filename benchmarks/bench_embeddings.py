@@ -0,0 +1,111 @@
+"""
+Benchmark: `BatchingEmbeddings` vs. calling the embedder one text at a time.
+
+Many sessions (threads) each embed a stream of memory writes and search queries,
+some of them repeated. The embedder is a stand-in for a sentence-transformers
+forward pass: every `encode` call costs a fixed overhead plus a smaller cost per
+text, which is what makes batching pay off on CPU, and calls run one at a time, as
+they would on a shared CPU. Pass `--hf MODEL_NAME` to use
+a real HuggingFaceEmbeddings model instead.
+
+Usage:
+    python -m benchmarks.bench_embeddings [num_sessions] [texts_per_session] [--hf MODEL_NAME]
+"""
+import os
+import random
+import sys
+import threading
+import time
+from typing import List
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+from langchain_core.embeddings import Embeddings
+
+from src.model.embeddings import BatchingEmbeddings
+
+# Cost model of the stand-in encoder, in seconds
+CALL_OVERHEAD = 0.004
+PER_TEXT_COST = 0.0004
+DIMS = 768
+
+
+class SimulatedEncoder(Embeddings):
+    """Sleeps like a CPU forward pass would take and returns deterministic vectors."""
+
+    def __init__(self):
+        self.calls = 0
+        self._device = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._device:
+            self.calls += 1
+            time.sleep(CALL_OVERHEAD + PER_TEXT_COST * len(texts))
+        return [[float(hash(text) % 997) / 997] * DIMS for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def make_workload(num_sessions: int, texts_per_session: int, seed: int = 0) -> List[List[str]]:
+    rng = random.Random(seed)
+    # Some questions and memories recur across sessions
+    common = [f"câu hỏi thường gặp số {i}" for i in range(50)]
+    return [
+        [rng.choice(common) if rng.random() < 0.3 else f"phiên {s} tin nhắn {i}" for i in range(texts_per_session)]
+        for s in range(num_sessions)
+    ]
+
+
+def run_sessions(embeddings: Embeddings, workload: List[List[str]]) -> float:
+    def session(texts: List[str]):
+        for text in texts:
+            embeddings.embed_query(text)
+
+    threads = [threading.Thread(target=session, args=(texts,)) for texts in workload]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main(num_sessions: int = 32, texts_per_session: int = 40, hf_model: str = None):
+    if hf_model:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        make_encoder = lambda: HuggingFaceEmbeddings(model_name=hf_model)
+    else:
+        make_encoder = SimulatedEncoder
+
+    workload = make_workload(num_sessions, texts_per_session)
+    total = num_sessions * texts_per_session
+
+    base = make_encoder()
+    base_time = run_sessions(base, workload)
+
+    batching = BatchingEmbeddings(make_encoder())
+    batch_time = run_sessions(batching, workload)
+    stats = batching.stats()
+    sample = [text for texts in workload for text in texts][:100]
+    assert batching.embed_documents(sample) == base.embed_documents(sample), "BatchingEmbeddings returned different vectors"
+    batching.close()
+
+    print(f"{num_sessions} sessions x {texts_per_session} texts ({total} embeds)")
+    print(f"  {'one text per call':<24} {total / base_time:10,.0f} texts/s")
+    print(f"  {'BatchingEmbeddings':<24} {total / batch_time:10,.0f} texts/s  ({base_time / batch_time:.1f}x)")
+    print(f"  cache hits {stats['cache']['hits']}, coalesced {stats['coalesced']}, encode calls {stats['batches']}, mean batch {stats['mean_batch_size']:.1f}")
+    print(f"  encode throughput {stats['encode_throughput']:,.0f} texts/s")
+    print(f"  batch sizes {stats['batch_size_histogram']}")
+    print(f"  queue wait ms {stats['wait_ms_histogram']}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    hf_model = None
+    if "--hf" in args:
+        i = args.index("--hf")
+        hf_model = args[i + 1]
+        del args[i:i + 2]
+    main(*(int(a) for a in args), hf_model=hf_model)
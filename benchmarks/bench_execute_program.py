@@ -0,0 +1,285 @@
+"""
+Benchmark: compiled/cached program execution vs. the previous `execute_program`.
+
+Runs a FinQA-style workload (a few program shapes with varying constants, some
+table operations, some failing programs) through:
+
+- the previous interpreter, kept below as `legacy_execute_program`,
+- `execute_program` (compile through the LRU cache, then run),
+- `execute_programs` (batch, vectorized with NumPy per program shape).
+
+A third workload runs table-heavy programs against a larger table, where the
+previous implementation scanned and re-parsed a row for every table operation.
+
+Every path is checked to return the same results and errors. Throughput is
+reported in ops (program operations) per second.
+
+Usage:
+    python -m benchmarks.bench_execute_program [num_programs]
+"""
+import random
+import re
+import sys
+import time
+
+from src.utils.helper import _TABLE_CACHE, _compile_program, execute_program, execute_programs
+
+TABLE = [
+    ["", "2019", "2018", "2017"],
+    ["Revenue", "$1,250", "$1,100", "$980"],
+    ["Net income", "210", "180", "(15)"],
+    ["P/E (x)", "15.2", "NA", "12.8"],
+]
+
+SHAPES = [
+    "subtract({a}, {b}), divide(#0, {b})",
+    "add({a}, {b}), add(#0, {c}), divide(#1, const_3)",
+    "multiply({a}, const_100), divide(#0, {b})",
+    "table_max(Revenue, none), subtract(#0, {a}), divide(#1, {a})",
+    "table_average(P/E (x), none), multiply(#0, {p}%)",
+    "subtract({a}, {b}), divide(#0, {z})",
+    "divide({a}, #3)",
+]
+
+
+def legacy_get_column_values(row_identifier, table_data):
+    """`_get_column_values` before tables were parsed once, as the baseline."""
+    if not table_data:
+        raise ValueError("Table data not found. Cannot perform table operations.")
+
+    values_str = []
+    for row in table_data[1:]:
+        if row and row[0].strip().lower() == row_identifier.strip().lower():
+            values_str.extend(row[1:])
+            break
+
+    if not values_str:
+        raise ValueError(f"Metric row identifier '{row_identifier}' not found in the table.")
+
+    values = []
+    for item in values_str:
+        if item is None or str(item).strip() in ["NA", "-", ""]:
+            continue
+        try:
+            match = re.search(r'-?[\d,]+(?:\.\d+)?(?:\s*[%$KMBT]|\s*[a-zA-Z]+)?', str(item).strip())
+            if match:
+                values.append(float(re.sub(r'[^\d.-]', '', match.group(0))))
+        except (ValueError, TypeError):
+            continue
+
+    if not values:
+        raise ValueError(f"No numeric data found for metric row '{row_identifier}'.")
+
+    return values
+
+
+def legacy_execute_program(program, table_data=None):
+    """`execute_program` before programs were compiled, as the baseline."""
+
+    results = []
+
+    if not program or not program.strip():
+        raise ValueError("Empty program")
+
+    program = program.replace('\n', ' ').replace('\r', ' ')
+    operations = []
+    current_op = ""
+    paren_count = 0
+
+    for char in program:
+        if char == '(':
+            paren_count += 1
+            current_op += char
+        elif char == ')':
+            paren_count -= 1
+            current_op += char
+        elif char == ',' and paren_count == 0:
+            if current_op.strip():
+                operations.append(current_op.strip())
+            current_op = ""
+        else:
+            current_op += char
+
+    if current_op.strip():
+        operations.append(current_op.strip())
+
+    if not operations:
+        raise ValueError("No valid operations found")
+
+    for operation in operations:
+        if '(' in operation and ')' in operation:
+            func_name = operation.split('(')[0].strip()
+            args_str = operation[operation.index('(')+1:operation.rindex(')')].strip()
+
+            if not args_str:
+                args = []
+            else:
+                if func_name in ['table_max', 'table_min', 'table_sum', 'table_average']:
+                    # Split args but preserve row identifier with spaces/parentheses
+                    args = [arg.strip() for arg in args_str.split(',') if arg.strip()]
+                    # Filter out 'none' (case-insensitive)
+                    args = [arg for arg in args if arg.lower() != 'none']
+                else:
+                    args = [arg.strip() for arg in args_str.split(',') if arg.strip()]
+
+            if func_name in ['table_max', 'table_min', 'table_sum', 'table_average']:
+                if not table_data:
+                    raise ValueError(f"Table data required for {func_name} function")
+                
+                if len(args) < 1:
+                    raise ValueError(f"{func_name} requires at least one argument (row_identifier)")
+                
+                row_identifier = args[0].strip('"\'')
+                values = legacy_get_column_values(row_identifier, table_data)
+                
+                if func_name == 'table_max':
+                    result = max(values)
+                elif func_name == 'table_min':
+                    result = min(values)
+                elif func_name == 'table_sum':
+                    result = sum(values)
+                elif func_name == 'table_average':
+                    result = sum(values) / len(values) if values else 0.0
+                
+                results.append(result)
+                
+            else:
+                parsed_args = []
+                number_pattern = re.compile(r'-?[\d,]+(?:\.\d+)?(?:\s*[%$KMBT]|\s*[a-zA-Z]+)?')
+                for arg in args:
+                    if arg.startswith('#'):
+                        index = int(arg[1:])
+                        if index >= len(results):
+                            raise ValueError(f"Invalid reference #{index}: only {len(results)} results available")
+                        parsed_args.append(results[index])
+                    elif arg.startswith('const_'):
+                        tm_value = float(arg.split("_")[1])
+                        parsed_args.append(tm_value)
+                    else:
+                        try:
+                            match = number_pattern.search(arg)
+                            if match:
+                                number_str = match.group(0)
+                                cleaned_str = re.sub(r'[^\d.-]', '', number_str)
+                                value = float(cleaned_str)
+                                # Convert percentage to decimal if % is present
+                                if '%' in number_str:
+                                    value = value / 100
+                                parsed_args.append(value)
+                            else:
+                                raise ValueError(f"Invalid number: {arg}")
+                        except (ValueError, TypeError):
+                            raise ValueError(f"Invalid number: {arg}")
+
+                if func_name == 'add':
+                    if len(parsed_args) != 2:
+                        raise ValueError(f"add requires exactly 2 arguments, got {len(parsed_args)}")
+                    result = parsed_args[0] + parsed_args[1]
+                elif func_name == 'subtract':
+                    if len(parsed_args) != 2:
+                        raise ValueError(f"subtract requires exactly 2 arguments, got {len(parsed_args)}")
+                    result = parsed_args[0] - parsed_args[1]
+                elif func_name == 'multiply':
+                    if len(parsed_args) != 2:
+                        raise ValueError(f"multiply requires exactly 2 arguments, got {len(parsed_args)}")
+                    result = parsed_args[0] * parsed_args[1]
+                elif func_name == 'divide':
+                    if len(parsed_args) != 2:
+                        raise ValueError(f"divide requires exactly 2 arguments, got {len(parsed_args)}")
+                    if parsed_args[1] == 0:
+                        raise ValueError("Division by zero")
+                    result = parsed_args[0] / parsed_args[1]
+                else:
+                    raise ValueError(f"Unknown function: {func_name}")
+
+                results.append(result)
+        else:
+            raise ValueError(f"Invalid operation format: {operation}")
+
+    if not results:
+        raise ValueError("No results generated")
+
+    return f"{results[-1]:.4f}"
+
+
+def make_table_workload(n: int, num_rows: int = 60, num_years: int = 10, seed: int = 3):
+    """A larger table and programs made mostly of table operations."""
+    rng = random.Random(seed)
+    labels = [f"Metric {i}" for i in range(num_rows)]
+    table = [[""] + [str(2024 - i) for i in range(num_years)]]
+    for label in labels:
+        table.append([label] + [rng.choice(["NA", f"${rng.uniform(1, 9000):,.1f}", f"({rng.randint(1, 500)})", f"{rng.uniform(-50, 50):.2f}%"]) for _ in range(num_years)])
+    functions = ["table_max", "table_min", "table_sum", "table_average"]
+    programs = []
+    for _ in range(n):
+        a, b, c = (rng.choice(labels).upper() if rng.random() < 0.2 else rng.choice(labels) for _ in range(3))
+        f, g, h = (rng.choice(functions) for _ in range(3))
+        programs.append(f"{f}({a}, none), {g}({b}, none), {h}({c}, none), add(#0, #1), divide(#3, #2)")
+    return programs, table
+
+
+def make_workload(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    programs = []
+    for _ in range(n):
+        shape = rng.choice(SHAPES)
+        programs.append(shape.format(
+            a=round(rng.uniform(1, 5000), 2),
+            b=round(rng.uniform(1, 5000), 2),
+            c=rng.randint(1, 100),
+            p=rng.randint(1, 100),
+            z=rng.choice([0, 1, 2.5]),
+        ))
+    return programs
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, Exception) or isinstance(b, Exception):
+        return type(a) is type(b) and str(a) == str(b)
+    return a == b
+
+
+def _run(fn, program, table):
+    try:
+        return fn(program, table)
+    except (ValueError, IndexError) as e:
+        return e
+
+
+def bench(title: str, programs, table=TABLE):
+    num_ops = sum(program.count("(") - program.count("(x)") for program in programs)
+
+    start = time.perf_counter()
+    legacy = [_run(legacy_execute_program, p, table) for p in programs]
+    legacy_time = time.perf_counter() - start
+
+    _compile_program.cache_clear()
+    _TABLE_CACHE.clear()
+    start = time.perf_counter()
+    single = [_run(execute_program, p, table) for p in programs]
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = execute_programs(programs, table)
+    batch_time = time.perf_counter() - start
+
+    assert all(_same(a, b) for a, b in zip(legacy, single)), "execute_program differs from the previous implementation"
+    assert all(_same(a, b) for a, b in zip(legacy, batch)), "execute_programs differs from the previous implementation"
+
+    print(f"{title}: {len(programs)} programs, {num_ops} ops, {len(set(programs))} distinct")
+    for name, elapsed in [("previous execute_program", legacy_time), ("execute_program (cached)", single_time), ("execute_programs (batch)", batch_time)]:
+        print(f"  {name:<28} {num_ops / elapsed:14,.0f} ops/s  ({legacy_time / elapsed:.1f}x)")
+
+
+def main(n: int = 20000):
+    bench("distinct programs", make_workload(n))
+    # Re-evaluating the same programs, e.g. across evaluation runs or sampled predictions
+    pool = make_workload(max(n // 20, 1), seed=1)
+    rng = random.Random(2)
+    bench("repeated programs", [rng.choice(pool) for _ in range(n)])
+    programs, table = make_table_workload(max(n // 4, 1))
+    bench("table-heavy programs", programs, table)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
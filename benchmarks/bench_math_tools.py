@@ -0,0 +1,69 @@
+"""
+Microbenchmark: `evaluate_expression` AST fast path vs. the sympy path it replaces.
+
+Times, per expression, the previous implementation (`sympy.sympify` + float), the
+uncached AST evaluator, and the memoized tool entry point. Also reports the cold
+import time of sympy, which the tool module no longer pays on startup.
+
+Usage:
+    python -m benchmarks.bench_math_tools [iterations]
+"""
+import os
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+from src.tools.math_tools import _evaluate, _fast_eval, evaluate_expression
+
+EXPRESSIONS = [
+    "(1 + 2) * 3 / 4",
+    "1250000 * 0.15",
+    "(125 * 48) / 6 + 17",
+    "2 ** 10 - 1",
+    "-(3.5 - 7.25) * 4",
+    "((1 + 0.07) ** 5 - 1) * 100",
+]
+
+
+def _time_per_call(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for expression in EXPRESSIONS:
+            fn(expression)
+    return (time.perf_counter() - start) / (iterations * len(EXPRESSIONS))
+
+
+def _cold_import(module: str) -> float:
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    return float(subprocess.check_output([sys.executable, "-c", code]).decode().strip())
+
+
+def main(iterations: int = 200):
+    import sympy as sp
+
+    def sympy_path(expression: str) -> float:
+        return float(sp.sympify(expression, evaluate=True))
+
+    for expression in EXPRESSIONS:
+        assert abs(sympy_path(expression) - _fast_eval(expression)) < 1e-9, expression
+
+    sympy_time = _time_per_call(sympy_path, iterations)
+    fast_time = _time_per_call(_fast_eval, iterations)
+    _evaluate.cache_clear()
+    cached_time = _time_per_call(evaluate_expression, iterations)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        evaluate_expression(EXPRESSIONS)
+    batch_time = (time.perf_counter() - start) / (iterations * len(EXPRESSIONS))
+
+    print(f"{'sympy.sympify':<28} {sympy_time * 1e6:10.1f} us/expr")
+    print(f"{'AST fast path (uncached)':<28} {fast_time * 1e6:10.1f} us/expr  ({sympy_time / fast_time:.0f}x)")
+    print(f"{'evaluate_expression':<28} {cached_time * 1e6:10.1f} us/expr  ({sympy_time / cached_time:.0f}x)")
+    print(f"{'evaluate_expression(list)':<28} {batch_time * 1e6:10.1f} us/expr  ({sympy_time / batch_time:.0f}x)")
+    print(f"{'cold import sympy':<28} {_cold_import('sympy') * 1e3:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
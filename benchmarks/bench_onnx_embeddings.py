@@ -0,0 +1,145 @@
+"""
+Benchmark: int8 ONNX Runtime embeddings vs. the PyTorch HuggingFaceEmbeddings model.
+
+Each backend runs in its own subprocess so that its RSS is measured alone. For
+each backend the benchmark reports:
+- load time,
+- single-query latency (p50/p95),
+- batched throughput over a corpus of memory-like sentences,
+- peak RSS.
+It then reports the cosine similarity between the ONNX and PyTorch vectors of
+every text, and how often the top-5 memory search results agree.
+
+The first ONNX run exports and quantizes the model (this needs torch), then
+reuses the files cached in src.model.onnx_embeddings.ONNX_CACHE_DIR.
+
+Usage:
+    python -m benchmarks.bench_onnx_embeddings [--model NAME] [--threads N] [--texts N] [--backends pytorch,onnx-fp32,onnx-int8]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import numpy as np
+
+from src.model.onnx_embeddings import DEFAULT_MODEL
+
+SUBJECTS = ["Tôi", "Vợ tôi", "Con trai tôi", "Sếp của tôi", "Bạn thân tôi"]
+FACTS = [
+    "thích ăn pizza và uống trà sữa",
+    "đang học tiếng Nhật để đi du học",
+    "làm kỹ sư phần mềm ở Hà Nội",
+    "có một con mèo tên là Miu",
+    "nghiên cứu các mô hình ngôn ngữ lớn",
+    "hay chơi cầu lông vào cuối tuần",
+    "không ăn được hải sản vì bị dị ứng",
+    "sẽ chuyển vào Thành phố Hồ Chí Minh vào tháng sau",
+]
+QUERIES = ["Tôi thích ăn gì?", "Tôi làm nghề gì?", "Tôi sống ở đâu?", "Thú cưng của tôi tên gì?", "Cuối tuần tôi làm gì?"]
+
+
+def make_corpus(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [f"{rng.choice(SUBJECTS)} {rng.choice(FACTS)}" + (f", từ năm {rng.randint(2000, 2024)}" if rng.random() < 0.5 else "") for _ in range(n)]
+
+
+def _load(backend: str, model: str, threads: int):
+    if backend == "pytorch":
+        import torch
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        if threads:
+            torch.set_num_threads(threads)
+        return HuggingFaceEmbeddings(model_name=model)
+    from src.model.onnx_embeddings import ONNXEmbeddings
+
+    return ONNXEmbeddings(model, quantize=backend == "onnx-int8", intra_op_threads=threads or None)
+
+
+def run_backend(backend: str, model: str, threads: int, num_texts: int, out_path: str):
+    """Child process: measure one backend and save its vectors next to the timings."""
+    start = time.perf_counter()
+    embeddings = _load(backend, model, threads)
+    load_time = time.perf_counter() - start
+    corpus = make_corpus(num_texts)
+
+    embeddings.embed_query("khởi động")
+    latencies = []
+    for query in QUERIES * 20:
+        start = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents(corpus), dtype=np.float32)
+    batch_time = time.perf_counter() - start
+    query_vectors = np.asarray(embeddings.embed_documents(QUERIES), dtype=np.float32)
+
+    np.savez(out_path, vectors=vectors, queries=query_vectors)
+    print(json.dumps({
+        "load_s": load_time,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "texts_per_s": len(corpus) / batch_time,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    return x / np.clip(np.linalg.norm(x, axis=1, keepdims=True), 1e-12, None)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads, 0 for the library default")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--backends", default="pytorch,onnx-int8", help="Comma-separated: pytorch, onnx-fp32, onnx-int8")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_backend(args.child, args.model, args.threads, args.texts, args.out)
+        return
+
+    results, arrays = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends.split(","):
+            out = os.path.join(tmp, f"{backend}.npz")
+            cmd = [sys.executable, "-m", "benchmarks.bench_onnx_embeddings", "--child", backend, "--out", out,
+                   "--model", args.model, "--threads", str(args.threads), "--texts", str(args.texts)]
+            output = subprocess.check_output(cmd).decode().strip().splitlines()
+            results[backend] = json.loads(output[-1])
+            with np.load(out) as data:
+                arrays[backend] = {"vectors": data["vectors"], "queries": data["queries"]}
+
+    print(f"{args.model}, {args.texts} texts, threads={args.threads or 'default'}")
+    print(f"  {'backend':<11} {'load s':>7} {'p50 ms':>8} {'p95 ms':>8} {'texts/s':>9} {'peak RSS MB':>12}")
+    for backend, r in results.items():
+        print(f"  {backend:<11} {r['load_s']:7.1f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['texts_per_s']:9.1f} {r['peak_rss_mb']:12.0f}")
+
+    if "pytorch" in arrays:
+        reference = arrays["pytorch"]
+        for backend, data in arrays.items():
+            if backend == "pytorch":
+                continue
+            cosine = np.sum(_unit(reference["vectors"]) * _unit(data["vectors"]), axis=1)
+            # Same top-5 memories for each query, as the store would rank them
+            ref_top = np.argsort(-_unit(reference["queries"]) @ _unit(reference["vectors"]).T, axis=1, kind="stable")[:, :5]
+            top = np.argsort(-_unit(data["queries"]) @ _unit(data["vectors"]).T, axis=1, kind="stable")[:, :5]
+            overlap = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(ref_top, top)])
+            print(f"  {backend} vs pytorch: cosine mean {cosine.mean():.4f}, min {cosine.min():.4f}; top-5 overlap {overlap:.2f}")
+
+
+if __name__ == "__main__":
+    main()
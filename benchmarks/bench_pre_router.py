@@ -0,0 +1,130 @@
+"""
+Benchmark: local kNN pre-router vs. the LLM router of select_node.
+
+Questions are replayed in order, like production traffic. For each question the
+pre-router predicts first (and is scored against the LLM decision when it is
+confident), then learns the LLM decision, as select_node does.
+
+Labels come either from a JSONL log of {"question", "decision"} records (for
+example the router_decisions.jsonl written by main.py), or from live calls to the
+LLM router over the built-in question set (needs GEMINI_API_KEY in .env).
+
+Usage:
+    python -m benchmarks.bench_pre_router [--labels router_decisions.jsonl --llm-latency 0.8]
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from src.model.pre_router import EmbeddingPreRouter
+from src.nodes.selector import SELECTOR_SYSTEM_PROMPT, Decision
+
+QUESTIONS = [
+    "Xin chào, hôm nay bạn thế nào?",
+    "Chào buổi sáng!",
+    "Cảm ơn bạn nhiều nhé",
+    "Bạn tên là gì?",
+    "Kể cho tôi một câu chuyện cười",
+    "Thủ đô của Nhật Bản là gì?",
+    "Nước có công thức hóa học là gì?",
+    "Ai là tác giả của Truyện Kiều?",
+    "Một năm có bao nhiêu tháng?",
+    "Bạn có thích mèo không?",
+    "Tạm biệt, hẹn gặp lại",
+    "Dịch câu 'good morning' sang tiếng Việt",
+    "Giá vàng hôm nay là bao nhiêu?",
+    "Tỷ giá USD sang VND hiện tại?",
+    "Thời tiết Hà Nội ngày mai thế nào?",
+    "Kết quả trận đấu của Manchester United tối qua?",
+    "Tin tức mới nhất về OpenAI là gì?",
+    "Tính 15% của 2.350.000",
+    "Căn bậc hai của 1764 là bao nhiêu?",
+    "Tính (125 * 48) / 6 + 17",
+    "Giá cổ phiếu Apple hôm nay?",
+    "Ai vừa thắng giải Nobel Văn học năm nay?",
+    "Lãi suất tiết kiệm ngân hàng Vietcombank hiện nay?",
+    "Dân số Việt Nam năm 2024 là bao nhiêu?",
+    "Chào bạn, bạn khỏe không?",
+    "Thủ đô của Đức là gì?",
+    "Giá Bitcoin bây giờ là bao nhiêu?",
+    "Tính căn bậc hai của 2025.",
+    "Bạn có thể giúp tôi không?",
+    "Lịch chiếu phim ở rạp CGV tối nay?",
+]
+
+
+def load_labels(path: str):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def label_with_llm(questions):
+    from src.model.llm import LLM
+
+    load_dotenv()
+    llm = LLM(
+        model="gemini-2.5-flash",
+        temperature=0,
+        api_key=os.getenv("GEMINI_API_KEY"),
+        base_url=["https://generativelanguage.googleapis.com/v1beta/openai/"],
+    )
+    structured_llm = llm.with_structured_output(Decision)
+    records, latencies = [], []
+    for question in questions:
+        messages = [SystemMessage(content=SELECTOR_SYSTEM_PROMPT), HumanMessage(content=f"Câu hỏi: {question}")]
+        start = time.perf_counter()
+        decision = structured_llm.invoke(messages).decision
+        latencies.append(time.perf_counter() - start)
+        records.append({"question": question, "decision": decision})
+    return records, statistics.mean(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--labels", help="JSONL file of {question, decision} LLM decisions")
+    parser.add_argument("--llm-latency", type=float, default=None, help="Mean LLM router latency in seconds, when using --labels")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--confidence", type=float, default=0.8)
+    parser.add_argument("--min-similarity", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.labels:
+        records, llm_latency = load_labels(args.labels), args.llm_latency
+    else:
+        records, llm_latency = label_with_llm(QUESTIONS)
+
+    embeddings = HuggingFaceEmbeddings(model_name="keepitreal/vietnamese-sbert")
+    router = EmbeddingPreRouter.from_prompt(
+        embeddings, SELECTOR_SYSTEM_PROMPT, k=args.k, confidence=args.confidence, min_similarity=args.min_similarity
+    )
+
+    agree, confident, latencies = 0, 0, []
+    for record in records:
+        start = time.perf_counter()
+        prediction = router.predict(record["question"])
+        latencies.append(time.perf_counter() - start)
+        if prediction is not None:
+            confident += 1
+            agree += prediction.label == record["decision"]
+        router.record(record["question"], record["decision"])
+
+    coverage = confident / len(records)
+    pre_router_latency = statistics.mean(latencies)
+    print(f"questions:             {len(records)}")
+    print(f"answered locally:      {confident} ({coverage:.1%})")
+    print(f"agreement with LLM:    {agree / confident:.1%}" if confident else "agreement with LLM:    n/a")
+    print(f"pre-router latency:    {pre_router_latency * 1000:.2f} ms/question")
+    if llm_latency is not None:
+        saved = coverage * llm_latency - pre_router_latency
+        print(f"LLM router latency:    {llm_latency * 1000:.1f} ms/question")
+        print(f"latency saved:         {saved * 1000:.1f} ms/turn on average")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: float32 vs. float16 vs. int8 vector storage in `ANNStore`.
+
+Uses the synthetic memories of bench_ann_store. For each storage type and
+namespace size the benchmark reports:
+- bytes per memory of the stored vector, and of all index arrays,
+- bytes per memory the whole store holds (traced with tracemalloc, so including
+  items, keys and Python objects), next to InMemoryStore, which keeps each vector
+  as a list of Python floats,
+- recall@k against exact float32 search, for exact search and for nprobe lists,
+- queries per second, exact and with nprobe lists.
+
+Usage:
+    python -m benchmarks.bench_vector_storage [--sizes 10000,50000] [--k 10] [--nprobe 8] [--spread 2.0] [--store-limit 10000]
+"""
+import argparse
+import os
+import time
+import tracemalloc
+from typing import List
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import numpy as np
+from langgraph.store.memory import InMemoryStore
+
+from benchmarks.bench_ann_store import DIMS, NUM_QUERIES, NUM_TOPICS, LookupEmbeddings, _fill, make_vectors
+from src.graph.ann_store import VECTOR_DTYPES, ANNStore, IVFIndex
+
+
+def _recall_qps(index: IVFIndex, queries: np.ndarray, truth: List[set], k: int, nprobe: int):
+    start = time.perf_counter()
+    found = [{id for id, _ in index.search(q, k, nprobe)} for q in queries]
+    qps = len(queries) / (time.perf_counter() - start)
+    return float(np.mean([len(f & t) / k for f, t in zip(found, truth)])), qps
+
+
+def _store_bytes(make_store, n: int) -> float:
+    """Bytes per memory held by a store filled with n memories."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = make_store()
+    _fill(store, n)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del store
+    return used / n
+
+
+def bench_size(n: int, k: int, nprobe: int, spread: float, store_limit: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((NUM_TOPICS, DIMS)).astype(np.float32)
+    vectors = make_vectors(n, rng, centres, spread)
+    queries = make_vectors(NUM_QUERIES, rng, centres, spread)
+    texts = {f"memory {i}": v for i, v in enumerate(vectors)}
+    embed = LookupEmbeddings(texts)
+    index_config = {"embed": embed, "dims": DIMS, "fields": ["data"]}
+
+    truth = None
+    print(f"n={n:,}, recall@{k} vs exact float32 search")
+    print(f"  {'storage':<14} {'vector B':>9} {'index B':>8} {'store B':>8} {'exact recall':>13} {'QPS':>6} {'nprobe=' + str(nprobe) + ' recall':>16} {'QPS':>6}")
+    for dtype in VECTOR_DTYPES:
+        index = IVFIndex(DIMS, dtype=dtype)
+        for chunk in range(0, n, 1000):
+            index.add(list(range(chunk, min(chunk + 1000, n))), vectors[chunk:chunk + 1000])
+        if truth is None:
+            truth = [{id for id, _ in index.search_exact(q, k)} for q in queries]
+        exact_recall, exact_qps = _recall_qps(index, queries, truth, k, index.num_lists or 1)
+        ivf_recall, ivf_qps = _recall_qps(index, queries, truth, k, nprobe)
+        # int8 rows carry a float32 scale
+        row_bytes = np.dtype(dtype).itemsize * DIMS + (np.dtype(np.float32).itemsize if dtype == "int8" else 0)
+        store_bytes = _store_bytes(lambda: ANNStore(index=index_config, vector_dtype=dtype), n)
+        print(f"  {dtype:<14} {row_bytes:9,} {index.nbytes / n:8,.0f} {store_bytes:8,.0f} {exact_recall:13.3f} {exact_qps:6,.0f} {ivf_recall:16.3f} {ivf_qps:6,.0f}")
+    if n <= store_limit:
+        store_bytes = _store_bytes(lambda: InMemoryStore(index=index_config), n)
+        print(f"  {'InMemoryStore':<14} {'':>9} {'':>8} {store_bytes:8,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,50000")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--spread", type=float, default=2.0, help="Noise around the topic centres")
+    parser.add_argument("--store-limit", type=int, default=10000, help="Largest namespace also measured on InMemoryStore")
+    args = parser.parse_args()
+    for n in (int(s) for s in args.sizes.split(",")):
+        bench_size(n, args.k, args.nprobe, args.spread, args.store_limit)
+
+
+if __name__ == "__main__":
+    main()
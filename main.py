@@ -1,14 +1,19 @@
 from src.graph.builder import build_graph
 from src.graph.state import State
+from src.graph.memory_worker import MemoryWriteBehind
+from src.graph.ann_store import ANNStore
 from src.model.llm import LLM
+from src.model.semantic_cache import SemanticCache
+from src.model.embeddings import BatchingEmbeddings
+from src.model.pre_router import EmbeddingPreRouter
+from src.nodes.selector import SELECTOR_SYSTEM_PROMPT
 # Import your actual tool functions
 from src.tools.math_tools import get_math_tool
-from src.tools.search_tools import get_search_tool
+from src.tools.search_tools import get_batch_search_tool, get_search_tool
 from src.tools.memory_tools import get_memory_tools
 from langchain_core.messages import HumanMessage
 from dotenv import load_dotenv
 from langgraph.checkpoint.memory import InMemorySaver
-from langgraph.store.memory import InMemoryStore
 from langgraph.store.base import BaseStore
 from langchain_community.embeddings import HuggingFaceEmbeddings
 import os
@@ -29,15 +34,25 @@ def main():
         base_url=["https://generativelanguage.googleapis.com/v1beta/openai/"]
     )
 
-    # Initialize the embeddings model
-    embeddings = HuggingFaceEmbeddings(model_name="keepitreal/vietnamese-sbert")
+    # Initialize the embeddings model, cached and with concurrent requests batched into one encode
+    embeddings = BatchingEmbeddings(HuggingFaceEmbeddings(model_name="keepitreal/vietnamese-sbert"))
+
+    # Semantic caches let repeated small-talk and routing decisions skip the LLM
+    router_cache = SemanticCache(embeddings, threshold=0.9)
+    answer_cache = SemanticCache(embeddings, threshold=0.95)
+    # Local kNN router seeded from the prompt examples and past LLM decisions
+    pre_router = EmbeddingPreRouter.from_prompt(embeddings, SELECTOR_SYSTEM_PROMPT, log_path="router_decisions.jsonl")
 
     checkpointer = InMemorySaver()
-    store = InMemoryStore(
+    # Large memory namespaces are searched through an IVF index instead of scoring every memory
+    store = ANNStore(
         index={
             "embed": embeddings,
             "dims": 768,
-        }
+        },
+        nprobe=int(os.getenv("MEMORY_NPROBE", "8")),
+        # float32 by default; MEMORY_VECTOR_DTYPE=float16 or int8 opts in to 1536 or 772 bytes per vector
+        vector_dtype=os.getenv("MEMORY_VECTOR_DTYPE", "float32"),
     )
 
     store.put(("1", "memories"), "1", {"data": "Tôi thích ăn pizza"})
@@ -48,11 +63,15 @@ def main():
     store.put(("1", "memories"), "6", {"data": "Tôi có một con mèo tên là Miu"})
 
     # Initialize tools
-    research_tools = [get_search_tool(), get_math_tool()]
+    research_tools = [get_search_tool(), get_batch_search_tool(), get_math_tool()]
     memory_tools = get_memory_tools()
 
+    # MEMORY_WRITE_BEHIND=1 runs memory maintenance on background workers, off the answer path
+    background_memory = os.getenv("MEMORY_WRITE_BEHIND") == "1"
+    memory_worker = MemoryWriteBehind(num_workers=4, max_queue_size=100) if background_memory else None
+
     # Build the graph once
-    graph = build_graph(checkpointer=checkpointer, store=store)
+    graph = build_graph(checkpointer=checkpointer, store=store, background_memory=background_memory)
 
     conversation_id = "1"
     bot_instruct_id = "1"
@@ -64,7 +83,15 @@ def main():
             "memory_tools": memory_tools,
             "thread_id": conversation_id,
             "user_id": bot_instruct_id,
-
+            "router_cache": router_cache,
+            "answer_cache": answer_cache,
+            # Memory score at which an answer counts as personal and skips the shared answer cache.
+            # None treats any retrieved memory as personal; set a cutoff only after measuring the embedder's scores.
+            "memory_relevance_threshold": None,
+            "pre_router": pre_router,
+            "memory_worker": memory_worker,
+            # Start tool calls while the ReAct step is still being generated
+            "stream_react_steps": True,
         }
     }
 
@@ -79,6 +106,9 @@ def main():
 
         # Check if the user wants to exit
         if question.lower() in ["exit", "quit"]:
+            # Apply the memory updates that are still queued before leaving
+            if memory_worker is not None:
+                memory_worker.shutdown(flush=True)
             print("Goodbye!")
             break
 
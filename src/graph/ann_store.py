@@ -0,0 +1,471 @@
+import inspect
+import threading
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langgraph.store.base import Item, PutOp, SearchItem, SearchOp
+from langgraph.store.memory import InMemoryStore
+
+try:
+    from langgraph.store.memory import _compare_values
+except ImportError as e:
+    raise ImportError("ANNStore needs langgraph-checkpoint>=2.1,<3.1: langgraph.store.memory._compare_values is missing.") from e
+
+# Below this many vectors a namespace is searched exactly, above it the index is trained
+MIN_TRAIN_SIZE = 1024
+# Lists probed per query; more means higher recall and slower search
+DEFAULT_NPROBE = 8
+# The index is retrained once it has grown this much since the last training
+RETRAIN_GROWTH = 2.0
+KMEANS_ITERATIONS = 10
+# Training uses at most this many vectors per list
+KMEANS_SAMPLES_PER_LIST = 64
+# With a filter, this many times more candidates are fetched before filtering
+FILTER_OVERFETCH = 4
+# How vectors are stored: 4, 2 or 1 byte per dimension, int8 with a float32 scale per vector
+VECTOR_DTYPES = ("float32", "float16", "int8")
+# Compact vectors are converted to float32 this many rows at a time while scoring
+SCORE_BLOCK_ROWS = 4096
+
+# Private InMemoryStore methods ANNStore overrides, with their parameters after self. They are
+# not a public API, so a langgraph-checkpoint release that changes them must fail at import
+# instead of silently bypassing the index.
+_INMEMORY_HOOKS = {
+    "_filter_items": ("op",),
+    "_insertinmem_store": ("to_embed", "embeddings"),
+    "_apply_put_ops": ("put_ops",),
+    "_batch_search": ("ops", "queryinmem_store", "results"),
+}
+
+
+def _check_inmemory_hooks():
+    changed = [
+        name for name, params in _INMEMORY_HOOKS.items()
+        if not callable(getattr(InMemoryStore, name, None))
+        or tuple(inspect.signature(getattr(InMemoryStore, name)).parameters)[1:] != params
+    ]
+    if changed:
+        raise ImportError(
+            f"ANNStore is not compatible with this langgraph-checkpoint: InMemoryStore.{', '.join(changed)} "
+            "changed. Install langgraph-checkpoint>=2.1,<3.1."
+        )
+
+
+_check_inmemory_hooks()
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, highest first."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class IVFIndex:
+    """
+    Inverted-file index over unit vectors, for cosine similarity with NumPy.
+
+    Vectors live in one growable matrix of `dtype`: float32, float16, or int8 codes with
+    a per-vector scale (max |x| / 127), which store 768 dimensions in 3072, 1536 and
+    772 bytes. Compact rows are scored block by block as float32 dot products, the
+    int8 scale applied to the dot product rather than to the codes. NumPy converts
+    float16 slowly, so int8 is both the smallest and, after float32, the fastest. Once the index holds `min_train_size`
+    vectors, spherical k-means splits them into `nlist` lists; a query scores the list
+    centroids, then only the vectors of the `nprobe` closest lists. Until then, and
+    whenever `nprobe` covers every list, search is exact. Inserts are assigned to their
+    nearest list right away and deletes free their row for reuse, so the index never
+    needs a rebuild; it is retrained when it has grown RETRAIN_GROWTH times since the
+    last training, to keep the lists balanced.
+
+    Args:
+        dims (int): Vector dimensionality.
+        nlist (int, optional): Number of lists. Defaults to sqrt(n) at training time.
+        nprobe (int): Lists probed per query.
+        min_train_size (int): Vectors needed before the index is trained.
+        seed (int): Seed for k-means initialisation.
+        dtype (str): Vector storage, one of VECTOR_DTYPES.
+    """
+
+    def __init__(self, dims: int, nlist: Optional[int] = None, nprobe: int = DEFAULT_NPROBE, min_train_size: int = MIN_TRAIN_SIZE, seed: int = 0, dtype: str = "float32"):
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown vector dtype: {dtype}")
+        self.dims = dims
+        self.dtype = dtype
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self._rng = np.random.default_rng(seed)
+        self._vectors = np.zeros((0, dims), dtype=np.dtype(dtype))
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._list_of_row = np.zeros(0, dtype=np.int32)
+        self._row_ids: List[Optional[Hashable]] = []
+        self._row_of: Dict[Hashable, int] = {}
+        self._free: List[int] = []
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._list_arrays: List[Optional[np.ndarray]] = []
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def __contains__(self, id: Hashable) -> bool:
+        return id in self._row_of
+
+    @property
+    def num_lists(self) -> int:
+        """Number of inverted lists, 0 until the index is trained."""
+        return len(self._lists)
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in the index arrays: vectors, scales, row flags and centroids."""
+        arrays = (self._vectors, self._scales, self._alive, self._list_of_row, self._centroids)
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Unit float32 vectors to stored rows, plus their scales for int8."""
+        if self.dtype != "int8":
+            return vectors.astype(self._vectors.dtype), None
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _decode(self, rows) -> np.ndarray:
+        """Stored rows (indices or a slice) back to float32 vectors."""
+        vectors = self._vectors[rows].astype(np.float32, copy=False)
+        if self.dtype == "int8":
+            vectors = vectors * self._scales[rows, None]
+        return vectors
+
+    def _score(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Dot products of `rows` (every used row if None) with the query."""
+        total = len(self._row_ids) if rows is None else len(rows)
+        if self.dtype == "float32":
+            return self._vectors[:total] @ query if rows is None else self._vectors[rows] @ query
+        scores = np.empty(total, dtype=np.float32)
+        for start in range(0, total, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, total)
+            block = slice(start, end) if rows is None else rows[start:end]
+            scores[start:end] = self._vectors[block].astype(np.float32) @ query
+            if self.dtype == "int8":
+                scores[start:end] *= self._scales[block]
+        return scores
+
+    def _grow(self, needed: int):
+        capacity = len(self._vectors)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 64)
+        vectors = np.zeros((new_capacity, self.dims), dtype=self._vectors.dtype)
+        vectors[:capacity] = self._vectors
+        self._vectors = vectors
+        if self.dtype == "int8":
+            self._scales = np.concatenate([self._scales, np.ones(new_capacity - capacity, dtype=np.float32)])
+        self._alive = np.concatenate([self._alive, np.zeros(new_capacity - capacity, dtype=bool)])
+        self._list_of_row = np.concatenate([self._list_of_row, np.full(new_capacity - capacity, -1, dtype=np.int32)])
+
+    def _assign(self, rows: np.ndarray):
+        """Puts rows into the list of their nearest centroid."""
+        if not len(rows):
+            return
+        lists = np.argmax(self._decode(rows) @ self._centroids.T, axis=1)
+        self._list_of_row[rows] = lists
+        for row, lst in zip(rows.tolist(), lists.tolist()):
+            self._lists[lst].append(row)
+            self._list_arrays[lst] = None
+
+    def add(self, ids: Sequence[Hashable], vectors: np.ndarray):
+        """Adds or replaces vectors by id."""
+        vectors = _unit(np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dims))
+        self.remove([id for id in ids if id in self._row_of])
+        rows = []
+        for id in ids:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self._row_ids)
+                self._row_ids.append(None)
+            self._row_ids[row] = id
+            self._row_of[id] = row
+            rows.append(row)
+        rows = np.asarray(rows, dtype=np.int64)
+        self._grow(len(self._row_ids))
+        stored, scales = self._encode(vectors)
+        self._vectors[rows] = stored
+        if scales is not None:
+            self._scales[rows] = scales
+        self._alive[rows] = True
+
+        if self.trained and len(self) < self._trained_size * RETRAIN_GROWTH:
+            self._assign(rows)
+        elif len(self) >= self.min_train_size:
+            self.train()
+
+    def remove(self, ids: Sequence[Hashable]):
+        """Removes vectors by id; unknown ids are ignored."""
+        for id in ids:
+            row = self._row_of.pop(id, None)
+            if row is None:
+                continue
+            self._row_ids[row] = None
+            self._alive[row] = False
+            lst = self._list_of_row[row]
+            if lst >= 0:
+                self._lists[lst].remove(row)
+                self._list_arrays[lst] = None
+                self._list_of_row[row] = -1
+            self._free.append(row)
+
+    def train(self):
+        """(Re)builds the lists with spherical k-means over the current vectors."""
+        rows = np.flatnonzero(self._alive)
+        nlist = self.nlist or max(1, int(np.sqrt(len(rows))))
+        nlist = min(nlist, len(rows))
+        sample = rows
+        if len(rows) > nlist * KMEANS_SAMPLES_PER_LIST:
+            sample = self._rng.choice(rows, nlist * KMEANS_SAMPLES_PER_LIST, replace=False)
+        data = self._decode(sample)
+
+        centroids = data[self._rng.choice(len(data), nlist, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, data)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            # Empty lists restart from random vectors
+            sums[empty] = data[self._rng.choice(len(data), int(empty.sum()))]
+            centroids = _unit(sums)
+
+        self._centroids = centroids.astype(np.float32)
+        self._lists = [[] for _ in range(nlist)]
+        self._list_arrays = [None] * nlist
+        self._list_of_row[:] = -1
+        for start in range(0, len(rows), 8192):
+            self._assign(rows[start:start + 8192])
+        self._trained_size = len(rows)
+
+    def _list_rows(self, lst: int) -> np.ndarray:
+        array = self._list_arrays[lst]
+        if array is None:
+            array = self._list_arrays[lst] = np.asarray(self._lists[lst], dtype=np.int64)
+        return array
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> Optional[np.ndarray]:
+        """Rows in the probed lists, or None when every row has to be scored."""
+        if not self.trained or nprobe >= self.num_lists:
+            return None
+        probe = _top_k(self._centroids @ query, nprobe)
+        return np.concatenate([self._list_rows(lst) for lst in probe.tolist()])
+
+    def search(self, query: Sequence[float], k: int, nprobe: Optional[int] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Returns up to k (id, cosine similarity) pairs, most similar first.
+
+        Args:
+            query (Sequence[float]): The query vector.
+            k (int): Number of results.
+            nprobe (int, optional): Lists to probe, overriding the index default.
+        """
+        if not len(self) or k <= 0:
+            return []
+        query = _unit(np.asarray(query, dtype=np.float32))
+        rows = self._candidates(query, nprobe or self.nprobe)
+        if rows is None:
+            # Scoring the matrix in place avoids copying it; free rows are never returned
+            used = len(self._row_ids)
+            rows = np.arange(used)
+            scores = self._score(query)
+            scores[~self._alive[:used]] = -np.inf
+            k = min(k, len(self))
+        elif not len(rows):
+            return []
+        else:
+            scores = self._score(query, rows)
+        top = _top_k(scores, k)
+        return [(self._row_ids[row], float(score)) for row, score in zip(rows[top].tolist(), scores[top].tolist())]
+
+    def search_exact(self, query: Sequence[float], k: int) -> List[Tuple[Hashable, float]]:
+        """Brute-force search over every vector, the reference for recall."""
+        return self.search(query, k, nprobe=self.num_lists or 1)
+
+
+class ANNStore(InMemoryStore):
+    """
+    InMemoryStore whose semantic search uses one IVFIndex per namespace.
+
+    Drop-in for `InMemoryStore(index={...})`: get/put/delete/list and filters behave the
+    same, and `write_memory`/`delete_memory` update the index incrementally through
+    put/delete. A query search embeds the query, probes the index of each namespace under
+    the prefix and merges the results, instead of scoring every item of the namespace;
+    vectors are kept only in the index, as float16 or int8 with `vector_dtype` instead
+    of InMemoryStore's lists of Python floats. Searches without a query are unchanged.
+
+    Args:
+        index (IndexConfig): The same index config as InMemoryStore ("embed", "dims", "fields").
+        nlist (int, optional): Lists per namespace index; defaults to sqrt(n).
+        nprobe (int): Lists probed per query, the recall/latency trade-off.
+        min_train_size (int): Namespaces with fewer vectors are searched exactly.
+        vector_dtype (str): How vectors are stored: "float32", "float16" or "int8".
+    """
+
+    def __init__(
+        self,
+        *,
+        index,
+        nlist: Optional[int] = None,
+        nprobe: int = DEFAULT_NPROBE,
+        min_train_size: int = MIN_TRAIN_SIZE,
+        vector_dtype: str = "float32",
+    ):
+        if vector_dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown vector dtype: {vector_dtype}")
+        super().__init__(index=index)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.vector_dtype = vector_dtype
+        self._indexes: Dict[Tuple[str, ...], IVFIndex] = {}
+        # Indexed paths of every key, to remove all of its vectors on delete
+        self._paths: Dict[Tuple[str, ...], Dict[str, set]] = {}
+        self._index_lock = threading.RLock()
+
+    def _namespace_index(self, namespace: Tuple[str, ...]) -> IVFIndex:
+        index = self._indexes.get(namespace)
+        if index is None:
+            index = self._indexes[namespace] = IVFIndex(
+                self.index_config["dims"],
+                nlist=self.nlist,
+                nprobe=self.nprobe,
+                min_train_size=self.min_train_size,
+                dtype=self.vector_dtype,
+            )
+            self._paths[namespace] = {}
+        return index
+
+    def set_nprobe(self, nprobe: int):
+        """Changes the lists probed per query for every namespace."""
+        with self._index_lock:
+            self.nprobe = nprobe
+            for index in self._indexes.values():
+                index.nprobe = nprobe
+
+    def stats(self) -> Dict[str, Any]:
+        with self._index_lock:
+            return {
+                "namespaces": len(self._indexes),
+                "vectors": sum(len(index) for index in self._indexes.values()),
+                "trained": sum(index.trained for index in self._indexes.values()),
+                "nprobe": self.nprobe,
+                "vector_dtype": self.vector_dtype,
+                "vector_bytes": sum(index.nbytes for index in self._indexes.values()),
+            }
+
+    # --- InMemoryStore hooks ---
+
+    def _filter_items(self, op: SearchOp):
+        if op.query and self.index_config and self.embeddings:
+            # Candidates come from the index, not from scanning the namespace
+            return None
+        return super()._filter_items(op)
+
+    def _insertinmem_store(self, to_embed, embeddings) -> None:
+        indices = [index for indices in to_embed.values() for index in indices]
+        if len(indices) != len(embeddings):
+            raise ValueError(f"Number of embeddings ({len(embeddings)}) does not match number of indices ({len(indices)})")
+        by_namespace: Dict[Tuple[str, ...], Tuple[List, List]] = {}
+        for embedding, (ns, key, path) in zip(embeddings, indices):
+            ids, vectors = by_namespace.setdefault(ns, ([], []))
+            ids.append((key, path))
+            vectors.append(embedding)
+        with self._index_lock:
+            for ns, (ids, vectors) in by_namespace.items():
+                # Like InMemoryStore, a re-put replaces the vector of each (key, path) it embeds
+                self._namespace_index(ns).add(ids, np.asarray(vectors, dtype=np.float32))
+                paths = self._paths[ns]
+                for key, path in ids:
+                    paths.setdefault(key, set()).add(path)
+
+    def _apply_put_ops(self, put_ops: Dict[Tuple[Tuple[str, ...], str], PutOp]) -> None:
+        with self._index_lock:
+            for (namespace, key), op in put_ops.items():
+                if op.value is None and namespace in self._indexes:
+                    paths = self._paths[namespace].pop(key, ())
+                    self._indexes[namespace].remove([(key, path) for path in paths])
+        super()._apply_put_ops(put_ops)
+
+    def _batch_search(self, ops, queryinmem_store, results) -> None:
+        plain = {i: entry for i, entry in ops.items() if entry[1] is not None}
+        if plain:
+            super()._batch_search(plain, queryinmem_store, results)
+        for i, (op, candidates) in ops.items():
+            if candidates is None:
+                results[i] = self._ann_search(op, queryinmem_store[op.query])
+
+    def _ann_search(self, op: SearchOp, query: List[float]) -> List[SearchItem]:
+        prefix = op.namespace_prefix
+        wanted = op.offset + op.limit
+
+        def matches(item: Item) -> bool:
+            return not op.filter or all(_compare_values(item.value.get(k), v) for k, v in op.filter.items())
+
+        def under_prefix(namespaces) -> List[Tuple[str, ...]]:
+            return [ns for ns in namespaces if ns[:len(prefix)] == prefix]
+
+        scored: List[Tuple[float, Item]] = []
+        with self._index_lock:
+            for ns in under_prefix(self._indexes):
+                index, items = self._indexes[ns], self._data.get(ns, {})
+                # Several paths of a key or a filter can use up hits: fetch more until `wanted`
+                # keys survive or the probed lists run out, then fall back to an exact search
+                for nprobe in (None, index.num_lists) if index.trained else (None,):
+                    k = wanted * (FILTER_OVERFETCH if op.filter else 1)
+                    while True:
+                        hits = index.search(query, k, nprobe=nprobe)
+                        found: Dict[str, Tuple[float, Item]] = {}
+                        for (key, _), score in hits:
+                            item = items.get(key)
+                            if item is not None and key not in found and matches(item):
+                                found[key] = (score, item)
+                        if len(found) >= wanted or len(hits) < k:
+                            break
+                        k *= 2
+                    if len(found) >= wanted:
+                        break
+                scored.extend(found.values())
+
+            kept: List[Tuple[Optional[float], Item]] = sorted(scored, key=lambda x: x[0], reverse=True)[op.offset:wanted]
+            if len(kept) < op.limit:
+                # Like InMemoryStore: fill up with items that have no vector
+                for ns in under_prefix(list(self._data)):
+                    paths = self._paths.get(ns, {})
+                    for key, item in self._data[ns].items():
+                        if len(kept) >= op.limit:
+                            break
+                        if key not in paths and matches(item):
+                            kept.append((None, item))
+
+        return [
+            SearchItem(
+                namespace=item.namespace,
+                key=item.key,
+                value=item.value,
+                created_at=item.created_at,
+                updated_at=item.updated_at,
+                score=float(score) if score is not None else None,
+            )
+            for score, item in kept
+        ]
@@ -7,6 +7,11 @@ from ..nodes.deep_researcher import call_agent_and_parse, execute_tool
 from ..nodes.memory_updater import memory_updater
 from ..nodes.memory_checker import memory_checker
 from ..nodes.memory_summarizer import memory_summarizer
+from ..nodes.router import fused_router
+from ..nodes.memory_enqueuer import memory_enqueuer
+from ..nodes.speculative_router import speculative_router
+from ..nodes.compiler import plan_and_execute, join_results
+from ..nodes.memory_retriever import retrieve_memories
 from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.store.base import BaseStore
 
@@ -24,6 +29,20 @@ def should_update_mem(state: State) -> str:
     else:
         return "select_node"
 
+def should_update_mem_or_answer(state: State) -> str:
+    """Conditional edge after fused_router: update memory first, or go straight to answering."""
+    if state.get("update_memory") == "yes":
+        return "memory_summarizer"
+    return should_answer(state)
+
+def after_speculation(state: State) -> str:
+    """Conditional edge after speculative_router: skip the branch node it already ran."""
+    if not state.get("speculated"):
+        return should_answer(state)
+    if state.get("decision") == "normal":
+        return END
+    return should_continue(state)
+
 def should_continue(state: State) -> str:
     """Conditional edge to decide whether to continue the loop or end."""
     if state.get("parsed_action"):
@@ -31,7 +50,36 @@ def should_continue(state: State) -> str:
     else:
         return END
 
-def build_graph(checkpointer: BaseCheckpointSaver, store: BaseStore) -> StateGraph:
+def should_replan(state: State) -> str:
+    """Conditional edge after join_results: plan again or end."""
+    if state.get("replan"):
+        return "plan_and_execute"
+    return END
+
+def build_graph(checkpointer: BaseCheckpointSaver, store: BaseStore, fuse_router: bool = False, background_memory: bool = False, speculative: bool = False, deep_research_mode: str = "react") -> StateGraph:
+    """
+    Build the chatbot graph.
+
+    Args:
+        checkpointer (BaseCheckpointSaver): Saver for the conversation state.
+        store (BaseStore): Long-term memory store.
+        fuse_router (bool): Replace memory_checker -> select_node with fused_router, which
+            returns both decisions from a single structured LLM call.
+        background_memory (bool): Answer immediately and queue memory maintenance to the
+            MemoryWriteBehind passed as config["configurable"]["memory_worker"].
+            Takes precedence over fuse_router, whose memory decision it makes unnecessary.
+        speculative (bool): Replace select_node with speculative_router, which runs the router,
+            simple_answerer and the first agent_step concurrently within the
+            SpeculationBudget passed as config["configurable"]["speculation_budget"].
+            Not used with fuse_router, whose single call already decides the route.
+        deep_research_mode (str): "react" runs the one-step-per-LLM-call agent_step/tool_executor
+            loop. "compiler" plans every tool call in one streamed LLM call and runs the plan as
+            a DAG (plan_and_execute -> join_results), which suits multi-tool questions.
+            speculative only applies to "react", whose first step it pre-runs.
+    """
+    if deep_research_mode not in ("react", "compiler"):
+        raise ValueError(f"Unknown deep_research_mode: {deep_research_mode}")
+
     # Define the graph
     graph_builder = StateGraph(State)
     
@@ -39,43 +87,100 @@ def build_graph(checkpointer: BaseCheckpointSaver, store: BaseStore) -> StateGra
     # graph_builder.set_config({'recursion_limit': 50})
     
     # Add nodes
-    graph_builder.add_node("memory_checker", memory_checker)
-    graph_builder.add_node("memory_summarizer", memory_summarizer)
-    graph_builder.add_node("memory_updater", memory_updater)
-    graph_builder.add_node("select_node", select_node)
+    # Memories are embedded and searched once per turn, the other nodes read them from the state
+    graph_builder.add_node("retrieve_memories", retrieve_memories)
+    graph_builder.add_edge(START, "retrieve_memories")
     graph_builder.add_node("simple_answerer", simple_answerer)
-    graph_builder.add_node("agent_step", call_agent_and_parse)
-    graph_builder.add_node("tool_executor", execute_tool)
+    if deep_research_mode == "compiler":
+        graph_builder.add_node("plan_and_execute", plan_and_execute)
+        graph_builder.add_node("join_results", join_results)
+    else:
+        graph_builder.add_node("agent_step", call_agent_and_parse)
+        graph_builder.add_node("tool_executor", execute_tool)
+
+    answer_branches = {
+        "normal": "simple_answerer",
+        "deep_research": "plan_and_execute" if deep_research_mode == "compiler" else "agent_step"
+    }
+
+    # The router in front of the answer branches. fused_router routes by itself, so the separate
+    # router node is only added when background_memory or the memory_checker path leads to it
+    router = None
+    if background_memory or not fuse_router:
+        if speculative and not fuse_router and deep_research_mode == "react":
+            router = "speculative_router"
+            graph_builder.add_node(router, speculative_router)
+            graph_builder.add_conditional_edges(
+                router,
+                after_speculation,
+                {
+                    **answer_branches,
+                    "execute_tool": "tool_executor",
+                    END: END
+                }
+            )
+        else:
+            router = "select_node"
+            graph_builder.add_node(router, select_node)
+            graph_builder.add_conditional_edges(router, should_answer, answer_branches)
 
     # Define edges
-    graph_builder.add_edge(START, "memory_checker")
-    graph_builder.add_conditional_edges(
-        "memory_checker", 
-        should_update_mem,
-        {
-            "memory_summarizer": "memory_summarizer",
-            "select_node": "select_node"
-        }
-    )
-    graph_builder.add_edge("memory_summarizer", "memory_updater")
-    graph_builder.add_edge("memory_updater", "select_node")
-    graph_builder.add_conditional_edges(
-        "select_node", 
-        should_answer,
-        {
-            "normal": "simple_answerer",
-            "deep_research": "agent_step"
-        }
-    )
+    if background_memory:
+        # Memory maintenance runs in the background, the answer path starts right away
+        graph_builder.add_node("memory_enqueuer", memory_enqueuer)
+        graph_builder.add_edge("retrieve_memories", "memory_enqueuer")
+        graph_builder.add_edge("memory_enqueuer", router)
+    elif fuse_router:
+        # One structured call decides both memory update and answer path
+        graph_builder.add_node("memory_summarizer", memory_summarizer)
+        graph_builder.add_node("memory_updater", memory_updater)
+        graph_builder.add_node("fused_router", fused_router)
+        graph_builder.add_edge("retrieve_memories", "fused_router")
+        graph_builder.add_conditional_edges(
+            "fused_router",
+            should_update_mem_or_answer,
+            {
+                "memory_summarizer": "memory_summarizer",
+                **answer_branches
+            }
+        )
+        graph_builder.add_edge("memory_summarizer", "memory_updater")
+        graph_builder.add_conditional_edges("memory_updater", should_answer, answer_branches)
+    else:
+        graph_builder.add_node("memory_checker", memory_checker)
+        graph_builder.add_node("memory_summarizer", memory_summarizer)
+        graph_builder.add_node("memory_updater", memory_updater)
+        graph_builder.add_edge("retrieve_memories", "memory_checker")
+        graph_builder.add_conditional_edges(
+            "memory_checker", 
+            should_update_mem,
+            {
+                "memory_summarizer": "memory_summarizer",
+                "select_node": router
+            }
+        )
+        graph_builder.add_edge("memory_summarizer", "memory_updater")
+        graph_builder.add_edge("memory_updater", router)
     graph_builder.add_edge("simple_answerer", END)
-    graph_builder.add_conditional_edges(
-        "agent_step",
-        should_continue,
-        {
-            "execute_tool": "tool_executor",
-            END: END
-        }
-    )
-    graph_builder.add_edge("tool_executor", "agent_step")
+    if deep_research_mode == "compiler":
+        graph_builder.add_edge("plan_and_execute", "join_results")
+        graph_builder.add_conditional_edges(
+            "join_results",
+            should_replan,
+            {
+                "plan_and_execute": "plan_and_execute",
+                END: END
+            }
+        )
+    else:
+        graph_builder.add_conditional_edges(
+            "agent_step",
+            should_continue,
+            {
+                "execute_tool": "tool_executor",
+                END: END
+            }
+        )
+        graph_builder.add_edge("tool_executor", "agent_step")
 
     return graph_builder.compile(checkpointer=checkpointer, store=store)
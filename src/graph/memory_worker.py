@@ -0,0 +1,110 @@
+import queue
+import threading
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+# Sentinel telling a shard thread to exit once everything queued before it is done
+_STOP = object()
+
+
+class MemoryWriteBehind:
+    """
+    Background worker pool for memory maintenance, so the answer path never waits on it.
+
+    Jobs are routed to `num_workers` shards by user id. Each shard is one thread with its
+    own bounded FIFO queue, so the jobs of a user run one at a time in submission order
+    while different users are processed in parallel. When a shard's queue is full,
+    `submit` blocks (backpressure) for up to `put_timeout` seconds, then raises queue.Full.
+    `shutdown` stops intake and flushes every queued job before returning.
+
+    Args:
+        num_workers (int): Number of shard threads.
+        max_queue_size (int): Capacity of each shard queue.
+        put_timeout (float, optional): Seconds `submit` may block on a full queue. None waits forever.
+    """
+
+    def __init__(self, num_workers: int = 4, max_queue_size: int = 100, put_timeout: Optional[float] = None):
+        self.put_timeout = put_timeout
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=max_queue_size) for _ in range(num_workers)]
+        self._threads = [
+            threading.Thread(target=self._run, args=(q,), name=f"memory-worker-{i}", daemon=True)
+            for i, q in enumerate(self._queues)
+        ]
+        self._lock = threading.Lock()
+        # Guards _closed and the puts, so no job is queued after shutdown() closed intake
+        self._intake_lock = threading.Lock()
+        self._closed = False
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        for thread in self._threads:
+            thread.start()
+
+    def _shard(self, user_id: str) -> queue.Queue:
+        return self._queues[zlib.crc32(str(user_id).encode("utf-8")) % len(self._queues)]
+
+    def submit(self, user_id: str, fn: Callable[..., Any], *args: Any, **kwargs: Any):
+        """Queue `fn(*args, **kwargs)` behind the earlier jobs of the same user."""
+        with self._intake_lock:
+            if self._closed:
+                raise RuntimeError("MemoryWriteBehind has been shut down.")
+            self._shard(user_id).put((fn, args, kwargs), timeout=self.put_timeout)
+        with self._lock:
+            self.submitted += 1
+
+    def _run(self, jobs: queue.Queue):
+        while True:
+            job = jobs.get()
+            try:
+                if job is _STOP:
+                    return
+                fn, args, kwargs = job
+                try:
+                    fn(*args, **kwargs)
+                    with self._lock:
+                        self.completed += 1
+                except Exception as e:
+                    print(f"LỖI trong tác vụ cập nhật bộ nhớ nền: {e}")
+                    with self._lock:
+                        self.failed += 1
+            finally:
+                jobs.task_done()
+
+    def flush(self):
+        """Block until every job queued so far has run."""
+        for jobs in self._queues:
+            jobs.join()
+
+    def shutdown(self, flush: bool = True):
+        """Stop accepting jobs. With flush=True, wait for the queued jobs to finish first."""
+        # Waits for a submit that is blocked on a full queue, so its job is flushed or dropped with the rest
+        with self._intake_lock:
+            if self._closed:
+                return
+            self._closed = True
+        for jobs in self._queues:
+            if not flush:
+                # Drop what has not started yet
+                while True:
+                    try:
+                        jobs.get_nowait()
+                        jobs.task_done()
+                    except queue.Empty:
+                        break
+            jobs.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self) -> "MemoryWriteBehind":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(flush=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "queued": [jobs.qsize() for jobs in self._queues],
+        }
@@ -1,4 +1,4 @@
-from typing import Annotated, TypedDict, Optional, List, Any
+from typing import Annotated, TypedDict, Optional, List, Any, Dict
 from langgraph.graph.message import add_messages
 from ..model.llm import LLM
 from langchain_core.tools import StructuredTool
@@ -15,4 +15,10 @@ class State(TypedDict):
     parsed_action: Optional[List[Any]] # Use Any to avoid circular import, or define ToolCall here
     memory_update_iter: Optional[int]
     update_memory: Optional[str]
-    memory_summary: Optional[str]
\ No newline at end of file
+    memory_summary: Optional[str]
+    speculated: Optional[bool]  # True khi speculative_router đã chạy sẵn nhánh được chọn
+    plan_iter: Optional[int]  # Số kế hoạch đã chạy trong lượt hiện tại (chế độ compiler)
+    replan: Optional[bool]  # True khi join_results yêu cầu lập lại kế hoạch
+    memories: Optional[List[Dict[str, Any]]]  # Ký ức của lượt hiện tại do retrieve_memories lấy về
+    memory_query: Optional[str]  # Câu hỏi đã dùng để lấy `memories`
+    memory_searches: Optional[int]  # Số lần tìm trong store (mỗi lần một embedding) trong lượt hiện tại
\ No newline at end of file
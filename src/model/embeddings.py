@@ -0,0 +1,252 @@
+import hashlib
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from ..utils.cache import MISSING, LRUTTLCache
+
+# Embeddings kept in memory, keyed by a hash of the text
+EMBEDDING_CACHE_SIZE = 10_000
+# Most texts sent to the model in one encode call
+MAX_BATCH_SIZE = 32
+# How long the first request of a batch waits for others to join it
+MAX_WAIT_MS = 5.0
+
+# Upper bounds of the histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100, 500)
+
+
+class _Histogram:
+    """Counts of observations per bucket, the last bucket catching everything above the bounds."""
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def to_dict(self) -> Dict[str, int]:
+        labels = [f"<={bound:g}" for bound in self.bounds] + [f">{self.bounds[-1]:g}"]
+        return dict(zip(labels, self.counts))
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that caches vectors and batches concurrent requests.
+
+    Every text is looked up in an LRU cache keyed by the SHA-1 of its content, so a
+    repeated memory or question is embedded once. Misses from all threads (sessions)
+    go to one queue; a dispatcher thread takes the first waiting call, lets others join
+    for up to `max_wait_ms` or until `max_batch_size` texts, and embeds them with a single
+    `embed_documents` call (one batched `encode` for HuggingFaceEmbeddings). Requests
+    that arrive while a batch is encoding form the next batch. When no other caller is
+    embedding, the batch goes out without waiting, so a lone session pays no extra
+    latency. Identical texts already in flight are embedded once and shared.
+
+    Args:
+        embeddings (Embeddings): The model to wrap.
+        cache_size (int): Number of vectors kept in the cache.
+        max_batch_size (int): Most texts per encode call.
+        max_wait_ms (float): How long a batch waits to fill up, in milliseconds.
+        batch_queries (bool): Batch queries with documents through `embed_documents`. Set
+            to False for models whose `embed_query` differs (e.g. adds a query instruction);
+            queries are then embedded one at a time with `embed_query`, still cached.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache_size: int = EMBEDDING_CACHE_SIZE,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+        batch_queries: bool = True,
+    ):
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batch_queries = batch_queries
+        self._cache = LRUTTLCache(cache_size)
+        self._queue: "queue.Queue[Optional[List[Tuple[str, str, float]]]]" = queue.Queue()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        # Callers inside embed_documents, queued or about to be
+        self._active = 0
+        self.requests = 0
+        self.texts = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.embedded = 0
+        self.encode_seconds = 0.0
+        self.errors = 0
+        self._started = time.monotonic()
+        self._batch_sizes = _Histogram(BATCH_SIZE_BUCKETS)
+        self._waits = _Histogram(WAIT_MS_BUCKETS)
+
+    @staticmethod
+    def _key(text: str, kind: str = "") -> str:
+        return hashlib.sha1((kind + "\x00" + text).encode("utf-8")).hexdigest()
+
+    def _ensure_dispatcher(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._dispatch, name="embedding-batcher", daemon=True)
+            self._thread.start()
+
+    def _dispatch(self):
+        # Queue items are the new texts of one call; a call larger than a batch carries over
+        carry: List[Tuple[str, str, float]] = []
+        while True:
+            if carry:
+                batch, callers = carry, 1
+            else:
+                item = self._queue.get()
+                if item is None:
+                    return
+                batch, callers = list(item), 1
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                # Nobody else is embedding right now: waiting would only add latency
+                if self._queue.empty() and self._active <= callers:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    # Finish this batch, then stop
+                    self._queue.put(None)
+                    break
+                batch.extend(item)
+                callers += 1
+            carry = batch[self.max_batch_size:]
+            self._run_batch(batch[:self.max_batch_size])
+
+    def _run_batch(self, batch: List[Tuple[str, str, float]]):
+        now = time.monotonic()
+        texts = [text for _, text, _ in batch]
+        start = time.perf_counter()
+        try:
+            vectors = self.embeddings.embed_documents(texts)
+            error = None
+        except Exception as e:
+            vectors, error = None, e
+        elapsed = time.perf_counter() - start
+
+        if error is None:
+            for (key, _, _), vector in zip(batch, vectors):
+                self._cache.set(key, vector)
+
+        with self._lock:
+            self.batches += 1
+            self.encode_seconds += elapsed
+            self._batch_sizes.observe(len(batch))
+            for _, _, enqueued in batch:
+                self._waits.observe((now - enqueued) * 1000)
+            if error is None:
+                self.embedded += len(batch)
+            else:
+                self.errors += 1
+            futures = [self._pending.pop(key) for key, _, _ in batch]
+
+        for i, future in enumerate(futures):
+            if error is None:
+                future.set_result(vectors[i])
+            else:
+                future.set_exception(error)
+
+    def _submit(self, texts: List[str]) -> List[Any]:
+        """Returns, per text, its cached vector or a Future for it."""
+        results: List[Any] = []
+        queued: List[Tuple[str, str, float]] = []
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BatchingEmbeddings has been closed.")
+            self.requests += 1
+            self.texts += len(texts)
+        for text in texts:
+            key = self._key(text)
+            vector = self._cache.get(key)
+            if vector is not MISSING:
+                results.append(vector)
+                continue
+            with self._lock:
+                pending = self._pending.get(key)
+                if pending is not None:
+                    self.coalesced += 1
+                    results.append(pending)
+                    continue
+                # The batch that had it may have finished since the lookup above
+                vector = self._cache.get(key)
+                if vector is not MISSING:
+                    results.append(vector)
+                    continue
+                future: Future = Future()
+                self._pending[key] = future
+            queued.append((key, text, time.monotonic()))
+            results.append(future)
+        if queued:
+            with self._lock:
+                self._ensure_dispatcher()
+            self._queue.put(queued)
+        return results
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self._active += 1
+        try:
+            results = self._submit(list(texts))
+            return [list(r.result() if isinstance(r, Future) else r) for r in results]
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.batch_queries:
+            return self.embed_documents([text])[0]
+        key = self._key(text, "query")
+        vector = self._cache.get(key)
+        if vector is MISSING:
+            vector = self.embeddings.embed_query(text)
+            self._cache.set(key, vector)
+        return list(vector)
+
+    def close(self):
+        """Stop the dispatcher after the queued texts are embedded."""
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, throughput and histograms of batch sizes and queue waits (ms)."""
+        with self._lock:
+            wall = time.monotonic() - self._started
+            return {
+                "requests": self.requests,
+                "texts": self.texts,
+                "cache": self._cache.stats(),
+                "coalesced": self.coalesced,
+                "batches": self.batches,
+                "embedded": self.embedded,
+                "errors": self.errors,
+                "mean_batch_size": self.embedded / self.batches if self.batches else 0.0,
+                # Texts per second while the model is encoding, and over the wrapper's lifetime
+                "encode_throughput": self.embedded / self.encode_seconds if self.encode_seconds else 0.0,
+                "throughput": self.embedded / wall if wall else 0.0,
+                "batch_size_histogram": self._batch_sizes.to_dict(),
+                "wait_ms_histogram": self._waits.to_dict(),
+            }
@@ -1,16 +1,629 @@
-from typing import List
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union
 from langchain_openai import ChatOpenAI
 from transformers import AutoModelForCausalLM, AutoTokenizer
-from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage, convert_to_messages
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableSequence
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from collections import OrderedDict, deque
+from ..utils.cache import MISSING, LRUTTLCache, SQLiteCache, TieredCache
+import asyncio
+import concurrent.futures
+import contextvars
+import copy
+import hashlib
+import json
 import random
-import requests
+import threading
+import time
+import httpx
+import openai
+
+# --- Shared connection pool settings (one pool per base URL) ---
+MAX_CONNECTIONS = 512
+MAX_KEEPALIVE_CONNECTIONS = 128
+KEEPALIVE_EXPIRY = 60.0
+REQUEST_TIMEOUT = 600.0
+CONNECT_TIMEOUT = 10.0
+
+# --- Replica load balancing / failover settings ---
+EWMA_ALPHA = 0.3  # Weight of the newest latency sample in the moving average
+BREAKER_FAILURE_THRESHOLD = 3  # Consecutive failures before a replica is taken out of rotation
+BREAKER_RESET_TIMEOUT = 30.0  # Seconds before an open breaker lets a probe request through
+MAX_RETRIES = 2  # Extra attempts, each on another healthy replica when possible
+
+# --- Request hedging settings (opt-in) ---
+HEDGE_PERCENTILE = 95.0  # Hedge once a request is slower than this latency percentile
+HEDGE_MAX_RATIO = 0.05  # At most this fraction of requests may send a hedge
+HEDGE_BURST = 5.0  # Hedges that may be spent at once after a quiet period
+HEDGE_MIN_SAMPLES = 20  # Latency samples needed before hedging starts
+HEDGE_WINDOW = 512  # Recent latencies used to compute the percentile
+
+# --- Bound runnable memoization ---
+BOUND_CACHE_SIZE = 256  # (schema or tool set, replica, kwargs) combinations kept per LLM
+
+# --- Response cache defaults ---
+RESPONSE_CACHE_SIZE = 2048
+RESPONSE_CACHE_TTL = 3600.0
+
+T = TypeVar("T")
+
+
+def _is_replica_fault(error: BaseException) -> bool:
+    """
+    Whether `error` says the replica itself is unavailable, so that another replica may
+    succeed: transport errors, timeouts, 5xx and 429. Other errors (a bad request, an
+    oversized prompt, an auth error) would fail the same way everywhere.
+    """
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError, asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        status = error.status_code
+    elif isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+    else:
+        return False
+    return status >= 500 or status in (408, 429)
+
+
+def _split_parser(runnable: Runnable) -> Tuple[Runnable, Optional[Runnable]]:
+    """Split a bound chain into the model call and the output parser that follows it, if any."""
+    if not isinstance(runnable, RunnableSequence):
+        return runnable, None
+    rest = runnable.steps[1:]
+    return runnable.first, rest[0] if len(rest) == 1 else RunnableSequence(*rest)
+
+
+class CancelScope:
+    """
+    Lets another thread cancel the LLM requests made through the sync API.
+
+    Every blocking call issued by the current thread inside `with scope:` is registered
+    with the scope. `scope.cancel()` cancels them on the event loop (closing their HTTP
+    requests) and makes the blocked call, and any later one, raise
+    concurrent.futures.CancelledError in the thread that issued it.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._futures = set()
+        self._lock = threading.Lock()
+        self._tokens = []
+
+    def __enter__(self) -> "CancelScope":
+        self._tokens.append(_CANCEL_SCOPE.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _CANCEL_SCOPE.reset(self._tokens.pop())
+
+    def register(self, future: concurrent.futures.Future):
+        with self._lock:
+            if self.cancelled:
+                future.cancel()
+            else:
+                self._futures.add(future)
+
+    def unregister(self, future: concurrent.futures.Future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            futures, self._futures = self._futures, set()
+        for future in futures:
+            future.cancel()
+
+
+_CANCEL_SCOPE: contextvars.ContextVar[Optional[CancelScope]] = contextvars.ContextVar("llm_cancel_scope", default=None)
+
+
+def raise_if_cancelled():
+    """
+    Raise concurrent.futures.CancelledError if the current thread runs inside a cancelled
+    CancelScope. Cancelling a scope only interrupts LLM requests; call this before any other
+    side effect a cancelled caller must not perform, such as starting a tool call.
+    """
+    scope = _CANCEL_SCOPE.get()
+    if scope is not None and scope.cancelled:
+        raise concurrent.futures.CancelledError()
+
+
+class _EventLoopThread:
+    """
+    A background event loop that owns every pooled async HTTP connection.
+
+    httpx.AsyncClient connections are bound to the loop they were opened on, so all
+    async LLM work is executed here. The sync API blocks on this loop and coroutines
+    running on other loops await it through `asyncio.wrap_future`.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    thread = threading.Thread(target=loop.run_forever, name="llm-event-loop", daemon=True)
+                    thread.start()
+                    self._loop = loop
+        return self._loop
+
+    def in_loop(self) -> bool:
+        """Return True when called from a coroutine running on the background loop."""
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def run(self, coro):
+        """Run a coroutine on the background loop and block until it finishes."""
+        if self.in_loop():
+            coro.close()
+            raise RuntimeError("Sync LLM methods cannot be called from the LLM event loop, use the async variants instead.")
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        scope = _CANCEL_SCOPE.get()
+        if scope is not None:
+            scope.register(future)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            if scope is not None:
+                scope.unregister(future)
+
+    async def arun(self, coro):
+        """Await a coroutine on the background loop from any event loop."""
+        if self.in_loop():
+            return await coro
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncIterator) -> Iterator:
+        """Drive an async generator on the background loop from sync code."""
+        try:
+            while True:
+                done, item = self.run(_anext(agen))
+                if done:
+                    return
+                yield item
+        finally:
+            self.run(agen.aclose())
+
+    async def aiterate(self, agen: AsyncIterator) -> AsyncIterator:
+        """Drive an async generator on the background loop from another event loop."""
+        try:
+            while True:
+                done, item = await self.arun(_anext(agen))
+                if done:
+                    return
+                yield item
+        finally:
+            await self.arun(agen.aclose())
+
+
+async def _anext(agen: AsyncIterator) -> Tuple[bool, Any]:
+    # StopAsyncIteration cannot cross a concurrent.futures.Future, so return a flag instead
+    try:
+        return False, await agen.__anext__()
+    except StopAsyncIteration:
+        return True, None
+
+
+_EVENT_LOOP = _EventLoopThread()
+
+_HTTP_POOLS: Dict[str, Tuple[httpx.Client, httpx.AsyncClient]] = {}
+_HTTP_POOLS_LOCK = threading.Lock()
+
+
+def get_http_clients(base_url: str) -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    Return the keep-alive (sync, async) httpx clients shared by every LLM using base_url.
+
+    Args:
+        base_url (str): Base URL of the OpenAI-compatible endpoint.
+
+    Returns:
+        Tuple[httpx.Client, httpx.AsyncClient]: The pooled clients for this base URL.
+    """
+    key = base_url.rstrip("/")
+    with _HTTP_POOLS_LOCK:
+        if key not in _HTTP_POOLS:
+            limits = httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            )
+            timeout = httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+            _HTTP_POOLS[key] = (
+                httpx.Client(limits=limits, timeout=timeout),
+                httpx.AsyncClient(limits=limits, timeout=timeout),
+            )
+        return _HTTP_POOLS[key]
+
+
+class CircuitBreaker:
+    """
+    Per-replica circuit breaker.
+
+    closed -> open after `failure_threshold` consecutive failures. After `reset_timeout`
+    seconds the breaker is half-open and lets a single probe request through: a success
+    closes it again, a failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        return state == "half_open" and not self.probe_in_flight
+
+    def on_request(self):
+        if self.state == "half_open":
+            self.probe_in_flight = True
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.probe_in_flight or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+
+    def release(self):
+        """Forget an in-flight probe that was cancelled before it could succeed or fail."""
+        self.probe_in_flight = False
+
+
+class Replica:
+    """One `base_url` endpoint: its ChatOpenAI client, load counters and circuit breaker."""
+
+    def __init__(self, index: int, base_url: str, llm: ChatOpenAI, breaker: CircuitBreaker):
+        self.index = index
+        self.base_url = base_url
+        self.llm = llm
+        self.breaker = breaker
+        self.outstanding = 0
+        self.requests = 0
+        self.successes = 0
+        self.errors = 0
+        self.ewma_latency: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.breaker.allow_request()
+
+    def track(self) -> "_ReplicaCall":
+        """Context manager that accounts for one request sent to this replica."""
+        return _ReplicaCall(self)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "successes": self.successes,
+            "errors": self.errors,
+            "ewma_latency": self.ewma_latency,
+            "breaker": self.breaker.state,
+            "last_error": self.last_error,
+        }
+
+
+class _ReplicaCall:
+    def __init__(self, replica: Replica):
+        self.replica = replica
+        self.start = 0.0
+
+    def __enter__(self) -> "_ReplicaCall":
+        replica = self.replica
+        replica.outstanding += 1
+        replica.requests += 1
+        replica.breaker.on_request()
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        replica = self.replica
+        replica.outstanding -= 1
+        if exc_type is None:
+            latency = time.monotonic() - self.start
+            replica.successes += 1
+            if replica.ewma_latency is None:
+                replica.ewma_latency = latency
+            else:
+                replica.ewma_latency = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * replica.ewma_latency
+            replica.breaker.record_success()
+        elif issubclass(exc_type, Exception) and _is_replica_fault(exc):
+            replica.errors += 1
+            replica.last_error = f"{exc_type.__name__}: {exc}"
+            replica.breaker.record_failure()
+        else:
+            # Cancelled by the caller, or a request error that is not the replica's fault:
+            # neither a success nor a failure
+            replica.breaker.release()
+        return False
+
+
+class ReplicaSelector:
+    """Base class for replica selection policies. `candidates` is never empty."""
+
+    def select(self, candidates: Sequence[Replica]) -> Replica:
+        raise NotImplementedError
+
+
+class RandomSelector(ReplicaSelector):
+    """Uniform random choice, the original behaviour."""
+
+    def select(self, candidates: Sequence[Replica]) -> Replica:
+        return random.choice(candidates)
+
+
+class LeastOutstandingSelector(ReplicaSelector):
+    """Pick the replica with the fewest in-flight requests, ties broken at random."""
+
+    def select(self, candidates: Sequence[Replica]) -> Replica:
+        fewest = min(replica.outstanding for replica in candidates)
+        return random.choice([replica for replica in candidates if replica.outstanding == fewest])
+
+
+class EwmaLatencySelector(ReplicaSelector):
+    """
+    Pick the replica with the lowest expected wait: EWMA latency scaled by its queue depth.
+    Replicas without a latency sample yet are tried first so every replica gets measured.
+    """
+
+    def select(self, candidates: Sequence[Replica]) -> Replica:
+        unmeasured = [replica for replica in candidates if replica.ewma_latency is None]
+        if unmeasured:
+            return LeastOutstandingSelector().select(unmeasured)
+        return min(candidates, key=lambda replica: replica.ewma_latency * (replica.outstanding + 1))
+
+
+SELECTORS = {
+    "random": RandomSelector,
+    "least_outstanding": LeastOutstandingSelector,
+    "ewma": EwmaLatencySelector,
+}
+
+
+def _freeze(value: Any) -> Any:
+    """Turn a schema, tool list or kwargs value into a hashable cache key."""
+    if isinstance(value, dict):
+        return tuple(sorted(((key, _freeze(item)) for key, item in value.items()), key=lambda kv: str(kv[0])))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        # Tool objects and other unhashable values are keyed by identity; the cache
+        # keeps them alive alongside the entry so the id cannot be reused meanwhile
+        return ("id", id(value))
+
+
+class _BoundRunnableCache:
+    """Thread-safe LRU of bound runnables. Each entry pins the objects its key was built from."""
+
+    def __init__(self, maxsize: int = BOUND_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple, Tuple[Any, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key: Tuple, create: Callable[[], Any], pin: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+        value = create()
+        with self._lock:
+            # Another thread may have built the same entry meanwhile, keep the first one
+            entry = self._entries.setdefault(key, (value, pin))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return entry[0]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _canonical_input(input: Any) -> Any:
+    """Reduce a prompt (str, messages, tuples, PromptValue) to its content, without message ids."""
+    if isinstance(input, str):
+        return input
+    if isinstance(input, PromptValue):
+        input = input.to_messages()
+    canonical = []
+    for message in convert_to_messages(input):
+        canonical.append({
+            "type": message.type,
+            "content": message.content,
+            "name": message.name,
+            "tool_calls": [
+                {"name": tool_call["name"], "args": tool_call["args"]}
+                for tool_call in getattr(message, "tool_calls", None) or []
+            ],
+        })
+    return canonical
+
+
+def _schema_fingerprint(schema_or_tools: Any) -> Any:
+    """JSON description of a structured-output schema or a tool list, as sent to the model."""
+    items = schema_or_tools if isinstance(schema_or_tools, (list, tuple)) else [schema_or_tools]
+    fingerprint = []
+    for item in items:
+        try:
+            fingerprint.append(convert_to_openai_tool(item))
+        except Exception:
+            fingerprint.append(repr(item))
+    return fingerprint
+
+
+class ResponseCache:
+    """
+    Exact-match cache for LLM responses.
+
+    Entries are keyed on a SHA-256 of the canonical JSON of (model, messages, schema or
+    tools, sampling params). A bounded in-memory LRU with TTL sits in front of an optional
+    SQLite file (`path`) that survives restarts. Values are returned as deep copies, so
+    callers can never mutate a cached response.
+
+    Args:
+        maxsize (int): Maximum number of responses kept in memory.
+        ttl (float, optional): Seconds a response stays valid. None means forever.
+        path (str, optional): SQLite file for the persistent tier. None keeps the cache in memory only.
+    """
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: Optional[float] = RESPONSE_CACHE_TTL, path: Optional[str] = None):
+        disk = SQLiteCache(path, ttl=ttl, table="llm_responses") if path else None
+        self.store = TieredCache(LRUTTLCache(maxsize, ttl), disk)
+
+    @staticmethod
+    def make_key(kind: str, model: str, input: Any, schema: Any = None, params: Optional[Dict[str, Any]] = None) -> str:
+        payload = {
+            "kind": kind,
+            "model": model,
+            "input": _canonical_input(input),
+            "schema": schema,
+            "params": params or {},
+        }
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Any:
+        value = self.store.get(key)
+        return value if value is MISSING else copy.deepcopy(value)
+
+    def set(self, key: str, value: Any):
+        self.store.set(key, copy.deepcopy(value))
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
+
+class _ReplicaRunnable(Runnable):
+    """
+    Runnable returned by `LLM.with_structured_output` / `LLM.bind_tools`.
+
+    Each call picks a replica through the LLM's selector, fetches the runnable bound
+    from that replica's ChatOpenAI instance (built once per key and replica) and runs
+    it on the shared event loop, failing over to another replica when the replica
+    fails. The output parser of a structured-output chain runs after the replica call,
+    so a malformed answer raises at once instead of counting against the replica.
+    """
+
+    def __init__(self, owner: "LLM", key: Tuple, bind: Callable[[ChatOpenAI], Runnable], pin: Any = None, options: Optional[Dict[str, Any]] = None):
+        self.owner = owner
+        self.key = key
+        self.bind = bind
+        self.pin = pin
+        self.options = options or {}
+        self._fingerprint = None
+
+    def bound(self, replica: Replica) -> Tuple[Runnable, Optional[Runnable]]:
+        """Return the (model call, output parser or None) bound on `replica`, building them on first use."""
+        return self.owner._bound_cache.get_or_create(
+            (self.key, replica.index), lambda: _split_parser(self.bind(replica.llm)), self.pin
+        )
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return _EVENT_LOOP.run(self.ainvoke(input, config, **kwargs))
+
+    def fingerprint(self) -> Dict[str, Any]:
+        """Schema/tools and binding options as they enter the response cache key."""
+        if self._fingerprint is None:
+            # The options stay a dict, so make_key serializes them as JSON with sorted keys
+            self._fingerprint = {"schema": _schema_fingerprint(self.pin), "options": dict(self.options)}
+        return self._fingerprint
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        parsers = []
+
+        async def call_model(replica: Replica) -> Any:
+            model, parser = self.bound(replica)
+            parsers.append(parser)
+            return await model.ainvoke(input, config, **kwargs)
+
+        async def call() -> Any:
+            output = await _EVENT_LOOP.arun(self.owner._acall(call_model))
+            # Every replica binds the same parser; parse outside the tracked replica call
+            parser = parsers[-1]
+            return output if parser is None else await parser.ainvoke(output, config)
+
+        return await self.owner._cached(self.key[0], input, {**self.fingerprint(), "kwargs": kwargs}, call)
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[Any]:
+        yield from _EVENT_LOOP.iterate(self.astream(input, config, **kwargs))
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        stream = _EVENT_LOOP.aiterate(self.owner._astream(lambda replica: self.bound(replica)[0].astream(input, config, **kwargs)))
+        parser = self.bound(self.owner.replicas[0])[1]
+        if parser is not None:
+            stream = parser.atransform(stream, config)
+        async for chunk in stream:
+            yield chunk
+
 
 class LLM:
     """
     A wrapper class for language models, supporting both the OpenAI API via langchain
+
+    Every method has an async counterpart (`ainvoke`, `astream`, `abind_tools`,
+    `acall_straight`). Requests run on a shared background event loop over one
+    keep-alive connection pool per base URL, and the sync methods are thin
+    wrappers that block on it.
+
+    Each base URL is a replica. Requests are routed by a pluggable `ReplicaSelector`,
+    replicas that keep failing are taken out of rotation by a circuit breaker, and a
+    failed call is retried on another healthy replica. `get_replica_stats()` exposes
+    the per-replica counters.
+
+    With `hedge=True`, a non-streaming request that is still pending after the
+    `hedge_percentile` latency is duplicated on another replica; the first answer
+    wins and the other request is cancelled. `get_hedge_stats()` reports how often
+    this happens and how often the hedge wins.
+
+    Runnables returned by `with_structured_output` and `bind_tools` are memoized per
+    (schema or tool set, kwargs), and the per-replica bound chain behind them is built
+    once per replica, so repeated calls with the same schema are a dictionary lookup.
+
+    With a `response_cache`, identical non-streaming calls (`invoke`, structured output,
+    bound tools) are answered from the cache. Sampled responses are not reproducible,
+    so the cache is bypassed unless temperature is 0 or `cache_nondeterministic=True`.
     """
     # Truyền tham số hàm invoke
-    def __init__(self, api_key: str, base_url: List[str], model: str, top_p: float = None, temperature: float = None, max_tokens: int = 24768, add_stop_token: List[str] = None):
+    def __init__(self, api_key: str, base_url: List[str], model: str, top_p: float = None, temperature: float = None, max_tokens: int = 24768, add_stop_token: List[str] = None, selector: Union[str, ReplicaSelector] = "least_outstanding", max_retries: int = MAX_RETRIES, breaker_failure_threshold: int = BREAKER_FAILURE_THRESHOLD, breaker_reset_timeout: float = BREAKER_RESET_TIMEOUT, hedge: bool = False, hedge_percentile: float = HEDGE_PERCENTILE, hedge_max_ratio: float = HEDGE_MAX_RATIO, response_cache: Optional[ResponseCache] = None, cache_nondeterministic: bool = False):
         """
         Initializes the LLM instance.
 
@@ -21,6 +634,16 @@ class LLM:
             temperature (float): Sampling temperature for the model.
             max_tokens (int): Maximum number of tokens to generate.
             add_stop_token (List[str]): List of stop tokens to use in generation.
+            selector (Union[str, ReplicaSelector]): Replica selection policy, one of
+                "random", "least_outstanding", "ewma" or a custom ReplicaSelector.
+            max_retries (int): How many times a failed call is retried on another replica.
+            breaker_failure_threshold (int): Consecutive failures that open a replica's breaker.
+            breaker_reset_timeout (float): Seconds before an open breaker lets a probe through.
+            hedge (bool): Send a backup copy of slow requests to another replica.
+            hedge_percentile (float): Latency percentile after which a request is hedged.
+            hedge_max_ratio (float): Cap on hedged requests as a fraction of all requests.
+            response_cache (ResponseCache, optional): Cache for identical non-streaming calls.
+            cache_nondeterministic (bool): Also cache when temperature is unset or > 0.
         """
 
         # Initialize openai_server client via Langchain's OpenAI-compatible wrapper
@@ -33,15 +656,34 @@ class LLM:
             print(f"Cannot load tokenizer for model {model} since it is not a local path or a valid Huggingface model name. Please ensure the model is accessible.")
         if add_stop_token:
             self.add_stop_token.extend(add_stop_token)
+        self.selector = SELECTORS[selector]() if isinstance(selector, str) else selector
+        self.max_retries = max_retries
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_max_ratio = hedge_max_ratio
+        self._latencies = deque(maxlen=HEDGE_WINDOW)
+        self._hedge_tokens = HEDGE_BURST
+        self._hedge_counters = {"requests": 0, "hedged": 0, "hedge_wins": 0}
+        self._bound_cache = _BoundRunnableCache()
+        self.response_cache = response_cache
+        # An unset temperature means the server default, which samples
+        self.cache_enabled = response_cache is not None and (cache_nondeterministic or temperature == 0)
+        self.sampling_params = {"temperature": temperature, "top_p": top_p, "max_tokens": max_tokens, "stop": self.add_stop_token}
         self.llms = []
+        self.replicas: List[Replica] = []
         for url in base_url:
+            http_client, http_async_client = get_http_clients(url)
             # Create a dictionary of arguments that are always present
             kwargs = {
                 "api_key": api_key,
                 "base_url": url,
                 "model": model,
                 "max_tokens": max_tokens,
-                "stop": self.add_stop_token
+                "stop": self.add_stop_token,
+                "http_client": http_client,
+                "http_async_client": http_async_client,
+                # Failover across replicas replaces the client's own retries
+                "max_retries": 0,
             }
 
             # Conditionally add arguments if they are not None
@@ -52,67 +694,231 @@ class LLM:
 
             # Unpack the dictionary to create the ChatOpenAI instance
             self.llms.append(ChatOpenAI(**kwargs))
+            self.replicas.append(Replica(
+                index=len(self.replicas),
+                base_url=url,
+                llm=self.llms[-1],
+                breaker=CircuitBreaker(breaker_failure_threshold, breaker_reset_timeout),
+            ))
 
         # print(f"Openai server model '{model}' initialized.")
 
+    def _choose(self, tried: Sequence[Replica] = ()) -> Replica:
+        """
+        Pick the replica that serves the next attempt. Replicas already tried for this
+        request are avoided while others remain, and replicas with an open breaker are
+        only used when no healthy replica is left.
+        """
+        untried = [replica for replica in self.replicas if replica not in tried] or self.replicas
+        candidates = [replica for replica in untried if replica.healthy] or untried
+        if len(candidates) == 1:
+            return candidates[0]
+        return self.selector.select(candidates)
+
+    async def _acall(self, call: Callable[[Replica], Awaitable[T]]) -> T:
+        """Run a non-streaming call, hedging it when enabled, with failover on errors."""
+        if not self.hedge or len(self.replicas) < 2:
+            return await self._acall_with_failover(call, [])
+        return await self._acall_hedged(call)
+
+    async def _acall_with_failover(self, call: Callable[[Replica], Awaitable[T]], tried: List[Replica]) -> T:
+        """Run `call` on a selected replica, retrying on another replica when the replica fails."""
+        attempts = 0
+        while True:
+            replica = self._choose(tried)
+            tried.append(replica)
+            attempts += 1
+            start = time.monotonic()
+            try:
+                with replica.track():
+                    result = await call(replica)
+                self._latencies.append(time.monotonic() - start)
+                return result
+            except Exception as e:
+                if attempts > self.max_retries or not _is_replica_fault(e):
+                    raise
+                print(f"LLM replica {replica.base_url} failed ({type(e).__name__}: {e}). Retrying on another replica.")
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Latency percentile after which a pending request gets hedged, None while warming up."""
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile / 100))]
+
+    async def _acall_hedged(self, call: Callable[[Replica], Awaitable[T]]) -> T:
+        counters = self._hedge_counters
+        counters["requests"] += 1
+        # Token bucket: every request earns `hedge_max_ratio` of a hedge, every hedge spends one
+        self._hedge_tokens = min(HEDGE_BURST, self._hedge_tokens + self.hedge_max_ratio)
+        delay = self._hedge_delay()
+        if delay is None:
+            return await self._acall_with_failover(call, [])
+
+        primary_tried: List[Replica] = []
+        primary = asyncio.ensure_future(self._acall_with_failover(call, primary_tried))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or self._hedge_tokens < 1:
+                return await primary
+            self._hedge_tokens -= 1
+            counters["hedged"] += 1
+            # The hedge starts by avoiding the replica the primary is stuck on
+            hedge = asyncio.ensure_future(self._acall_with_failover(call, list(primary_tried)))
+            pending = {primary, hedge}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            counters["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Cancel whichever request lost (or both, if we were cancelled ourselves)
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def get_hedge_stats(self) -> Dict[str, Any]:
+        """Return how many requests were hedged and how many of those the hedge won."""
+        counters = self._hedge_counters
+        return {
+            **counters,
+            "hedge_rate": counters["hedged"] / counters["requests"] if counters["requests"] else 0.0,
+            "win_rate": counters["hedge_wins"] / counters["hedged"] if counters["hedged"] else 0.0,
+            "hedge_delay": self._hedge_delay(),
+        }
+
+    async def _astream(self, stream: Callable[[Replica], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Stream from a selected replica. Fails over only if nothing has been yielded yet."""
+        tried: List[Replica] = []
+        while True:
+            replica = self._choose(tried)
+            tried.append(replica)
+            started = False
+            try:
+                with replica.track():
+                    async for chunk in stream(replica):
+                        started = True
+                        yield chunk
+                return
+            except Exception as e:
+                if started or len(tried) > self.max_retries or not _is_replica_fault(e):
+                    raise
+                print(f"LLM replica {replica.base_url} failed ({type(e).__name__}: {e}). Retrying on another replica.")
+
+    def _replica_runnable(self, key: Tuple, bind: Callable[[ChatOpenAI], Runnable], pin: Any = None, options: Optional[Dict[str, Any]] = None) -> _ReplicaRunnable:
+        """Return the memoized runnable for `key`, creating it on first use."""
+        return self._bound_cache.get_or_create(key, lambda: _ReplicaRunnable(self, key, bind, pin, options), pin)
+
+    async def _cached(self, kind: str, input: Any, schema: Any, call: Callable[[], Awaitable[T]]) -> T:
+        """Serve `call` from the response cache when caching applies to this LLM."""
+        if not self.cache_enabled:
+            return await call()
+        key = ResponseCache.make_key(kind, self.model, input, schema, self.sampling_params)
+        cached = self.response_cache.get(key)
+        if cached is not MISSING:
+            return cached
+        result = await call()
+        self.response_cache.set(key, result)
+        return result
+
+    def get_replica_stats(self) -> List[Dict[str, Any]]:
+        """Return latency, load, error and breaker counters for every replica."""
+        return [replica.stats() for replica in self.replicas]
+
     def invoke(self, prompt: str) -> str:
         """
         Invokes the LLM with a given prompt and returns the text response.
         Handles both openai_server API calls and local model inference.
         """
+        return _EVENT_LOOP.run(self.ainvoke(prompt))
+
+    async def ainvoke(self, prompt: str) -> str:
+        """
+        Asynchronously invokes the LLM with a given prompt and returns the text response.
+        """
         # For openai_server, the temperature is set at initialization
-        if len(self.llms) == 1:
-            picked_llm = self.llms[0]
-        else:
-            picked_llm = random.choice(self.llms)
-        response = picked_llm.invoke(prompt)
-        return response.content if hasattr(response, 'content') else str(response)
-    
-    def bind_tools(self, tools):
+        async def call() -> str:
+            response = await _EVENT_LOOP.arun(self._acall(lambda replica: replica.llm.ainvoke(prompt)))
+            return response.content if hasattr(response, 'content') else str(response)
+
+        return await self._cached("invoke", prompt, None, call)
+
+    def bind_tools(self, tools, **kwargs):
         """
         Bind tools to the LLM instance.
         """
-        if len(self.llms) == 1:
-            picked_llm = self.llms[0]
-        else:
-            picked_llm = random.choice(self.llms)
-        return picked_llm.bind_tools(tools)
-    
+        return self._replica_runnable(("tools", _freeze(tools), _freeze(kwargs)), lambda llm: llm.bind_tools(tools, **kwargs), pin=tools, options=kwargs)
+
+    async def abind_tools(self, tools, **kwargs):
+        """
+        Async counterpart of `bind_tools`. The returned runnable supports `ainvoke`/`astream`.
+        """
+        return self.bind_tools(tools, **kwargs)
+
     def stream(self, prompt: str):
         """
         Stream the response from the LLM based on the provided prompt.
         This method is a placeholder for actual streaming logic.
         """
-        if len(self.llms) == 1:
-            picked_llm = self.llms[0]
-        else:
-            picked_llm = random.choice(self.llms)
-        return picked_llm.stream(prompt)
-    
+        yield from _EVENT_LOOP.iterate(self.astream(prompt))
+
+    async def astream(self, prompt: str):
+        """
+        Asynchronously stream the response chunks from the LLM.
+        """
+        stream = self._astream(lambda replica: replica.llm.astream(prompt))
+        async for chunk in _EVENT_LOOP.aiterate(stream):
+            yield chunk
+
     def with_structured_output(self, output_schema, **kwargs):
         """
         Configure the LLM to use structured output.
         Accepts and passes along any additional keyword arguments.
         """
         # Pass the schema and all other kwargs to the real method
-        if len(self.llms) == 1:
-            picked_llm = self.llms[0]
-        else:
-            picked_llm = random.choice(self.llms)
-        return picked_llm.with_structured_output(output_schema, **kwargs)
+        return self._replica_runnable(("structured", _freeze(output_schema), _freeze(kwargs)), lambda llm: llm.with_structured_output(output_schema, **kwargs), pin=output_schema, options=kwargs)
+
+    def with_json_output(self, output_schema, **kwargs):
+        """
+        Constrain the output to `output_schema` like `with_structured_output`, but without
+        parsing it, so that `stream` yields the JSON text chunks as they are generated.
+        """
+        return self._replica_runnable(("json", _freeze(output_schema), _freeze(kwargs)), lambda llm: llm.bind(response_format=output_schema, **kwargs), pin=output_schema, options=kwargs)
 
     @property
     def llm(self):
         """Return a single ChatOpenAI instance for compatibility."""
-        if len(self.llms) == 1:
-            return self.llms[0]
-        else:
-            return random.choice(self.llms)
+        return self._choose().llm
 
     def call_straight(self, messages: List[BaseMessage] = None, prompt: str = None, n: int = 1, temperature: float = None, top_p: float = None, top_k: int = None, max_tokens: int = 22768, reasoning_mode: bool = True):
+        """
+        Call the LLM directly with either messages or prompt string.
+        Sync wrapper around `acall_straight`, see it for the arguments.
+
+        Returns:
+            List of response strings
+        """
+        return _EVENT_LOOP.run(self.acall_straight(
+            messages=messages,
+            prompt=prompt,
+            n=n,
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k,
+            max_tokens=max_tokens,
+            reasoning_mode=reasoning_mode,
+        ))
+
+    async def acall_straight(self, messages: List[BaseMessage] = None, prompt: str = None, n: int = 1, temperature: float = None, top_p: float = None, top_k: int = None, max_tokens: int = 22768, reasoning_mode: bool = True):
         """
         Call the LLM directly with either messages or prompt string
-        
+
         Args:
             messages: List of BaseMessage objects (HumanMessage, SystemMessage, AIMessage)
             prompt: Direct prompt string (used if messages is None)
@@ -121,7 +927,7 @@ class LLM:
             top_p: Top-p sampling parameter
             top_k: Top-k sampling parameter
             max_tokens: Maximum tokens to generate
-        
+
         Returns:
             List of response strings
         """
@@ -136,12 +942,12 @@ class LLM:
                     formatted_messages.append({"role": "user", "content": msg.content})
                 elif isinstance(msg, AIMessage):
                     formatted_messages.append({"role": "assistant", "content": msg.content})
-            
+
             # Apply chat template
             prompt_text = self.tokenizer.apply_chat_template(
-                formatted_messages, 
-                tokenize=False, 
-                add_generation_prompt=True, 
+                formatted_messages,
+                tokenize=False,
+                add_generation_prompt=True,
                 enable_thinking=reasoning_mode,
             )
         else:
@@ -168,15 +974,16 @@ class LLM:
 
         answers = []
         thinkings = []
-        # Pick a random base URL for the request
-        if len(self.llms) == 1:
-            host = self.base_url[0] + "/completions"
-        else:
-            host = random.choice(self.base_url) + "/completions"
+        async def post(replica: Replica) -> httpx.Response:
+            # Reuse the pooled connections of the selected base URL
+            _, http_async_client = get_http_clients(replica.base_url)
+            response = await http_async_client.post(replica.base_url + "/completions", headers=headers, json=json_data)
+            response.raise_for_status()
+            return response
 
-        responses = requests.post(host, headers=headers, json=json_data)
+        responses = await _EVENT_LOOP.arun(self._acall(post))
         # print(responses.json())
-        
+
         for response in responses.json()["choices"]:
             # print(response)
             # print("-" * 50)
@@ -189,5 +996,5 @@ class LLM:
                     thinkings.append("")
             except:
                 print("One response die because of model overthinking")
-            
-        return answers, thinkings
\ No newline at end of file
+
+        return answers, thinkings
@@ -0,0 +1,201 @@
+import inspect
+import os
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Model used for the memory store in main.py
+DEFAULT_MODEL = "keepitreal/vietnamese-sbert"
+# Where exported models are kept, one directory per model
+ONNX_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "simpleagent", "onnx")
+ONNX_OPSET = 14
+# Texts per inference call
+ONNX_BATCH_SIZE = 32
+# PhoBERT-based models have 258 positions, 2 of them reserved
+ONNX_MAX_LENGTH = 256
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+
+
+def _require(module: str, purpose: str):
+    try:
+        return __import__(module, fromlist=["_"])
+    except ImportError as e:
+        raise ImportError(f"{purpose} requires the optional dependency '{module}' (pip install '.[onnx]').") from e
+
+
+def model_dir(model_name: str, cache_dir: str = ONNX_CACHE_DIR) -> str:
+    """Directory holding the exported files of `model_name`."""
+    return os.path.join(cache_dir, model_name.replace("/", "--"))
+
+
+def export_onnx(model_name: str = DEFAULT_MODEL, output_dir: Optional[str] = None, quantize: bool = True, opset: int = ONNX_OPSET) -> str:
+    """
+    Exports a Hugging Face encoder to ONNX and, optionally, quantizes it to int8.
+
+    The graph takes input_ids/attention_mask (and token_type_ids when the model uses
+    them) with dynamic batch and sequence axes, and returns the last hidden state;
+    pooling is done by ONNXEmbeddings. Quantization is dynamic: weights of the MatMul
+    and Gemm nodes are stored as int8 and activations are quantized at run time, so no
+    calibration data is needed. Export needs torch; running the result does not.
+
+    Args:
+        model_name (str): Hugging Face model name or local path.
+        output_dir (str, optional): Where to write the files. Defaults to model_dir(model_name).
+        quantize (bool): Also write the int8 model.
+        opset (int): ONNX opset version.
+
+    Returns:
+        str: Path of the int8 model if `quantize`, otherwise of the float32 model.
+    """
+    output_dir = output_dir or model_dir(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    int8_path = os.path.join(output_dir, INT8_FILE)
+
+    if not os.path.exists(fp32_path):
+        torch = _require("torch", "Exporting a model to ONNX")
+        from transformers import AutoModel, AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name)
+        model.eval()
+        dummy = tokenizer(["xin chào", "một câu dài hơn một chút"], padding=True, return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        export_kwargs = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            # torch >= 2.9 defaults to the dynamo exporter, which needs onnxscript and ignores dynamic_axes
+            export_kwargs["dynamo"] = False
+        class LastHiddenState(torch.nn.Module):
+            # Takes the inputs positionally in input_names order and passes them by name, since
+            # the positional order of the model's forward() differs between transformers versions
+            def __init__(self, encoder):
+                super().__init__()
+                self.encoder = encoder
+
+            def forward(self, *inputs):
+                return self.encoder(**dict(zip(input_names, inputs)), return_dict=False)[0]
+
+        with torch.no_grad():
+            torch.onnx.export(
+                LastHiddenState(model),
+                tuple(dummy[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=opset,
+                do_constant_folding=True,
+                **export_kwargs,
+            )
+        tokenizer.save_pretrained(output_dir)
+
+    if not quantize:
+        return fp32_path
+    if not os.path.exists(int8_path):
+        quantization = _require("onnxruntime.quantization", "Quantizing an ONNX model")
+        quantization.quantize_dynamic(fp32_path, int8_path, weight_type=quantization.QuantType.QInt8)
+    return int8_path
+
+
+class ONNXEmbeddings(Embeddings):
+    """
+    Sentence-transformers style embeddings computed with ONNX Runtime on CPU.
+
+    A drop-in replacement for HuggingFaceEmbeddings in `InMemoryStore(index={"embed": ...})`:
+    same tokenizer, same pooling, by default no normalization. The model is exported and
+    int8-quantized on first use (see export_onnx) and cached on disk, so later starts
+    only load the quantized file. `onnx_path` also accepts a model exported by
+    `optimum-cli export onnx --task feature-extraction`, with its tokenizer next to it.
+    Needs the `onnx` extra; not yet benchmarked against the trained
+    keepitreal/vietnamese-sbert weights, so main.py does not offer it. Texts are sorted by length and run in batches of
+    `batch_size` to keep padding low.
+
+    Args:
+        model_name (str): Hugging Face model name or local path.
+        onnx_path (str, optional): A model already exported; skips export.
+        quantize (bool): Use the int8 model; False uses the float32 export.
+        intra_op_threads (int, optional): Threads ONNX Runtime uses inside an operator.
+            Defaults to the number of CPUs.
+        batch_size (int): Texts per inference call.
+        max_length (int): Longer texts are truncated to this many tokens.
+        pooling (str): "mean" over the attention mask (sentence-transformers default) or "cls".
+        normalize (bool): L2-normalize the vectors.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        onnx_path: Optional[str] = None,
+        quantize: bool = True,
+        intra_op_threads: Optional[int] = None,
+        batch_size: int = ONNX_BATCH_SIZE,
+        max_length: int = ONNX_MAX_LENGTH,
+        pooling: str = "mean",
+        normalize: bool = False,
+    ):
+        if pooling not in ("mean", "cls"):
+            raise ValueError(f"Unknown pooling: {pooling}")
+        ort = _require("onnxruntime", "ONNXEmbeddings")
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.onnx_path = onnx_path or export_onnx(model_name, quantize=quantize)
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.pooling = pooling
+        self.normalize = normalize
+
+        tokenizer_dir = os.path.dirname(self.onnx_path)
+        has_tokenizer = os.path.exists(os.path.join(tokenizer_dir, "tokenizer_config.json"))
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_dir if has_tokenizer else model_name)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(self.onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_names = [i.name for i in self.session.get_inputs()]
+
+    def _run(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        feed = {name: encoded[name].astype(np.int64) for name in self._input_names if name in encoded}
+        if "token_type_ids" in self._input_names and "token_type_ids" not in feed:
+            feed["token_type_ids"] = np.zeros_like(feed["input_ids"])
+        hidden = self.session.run(None, feed)[0]
+
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = encoded["attention_mask"][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Embeds `texts` into a (len(texts), dims) float32 array, in input order."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Similar lengths in a batch means less padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out: Optional[np.ndarray] = None
+        for start in range(0, len(order), self.batch_size):
+            chunk = order[start:start + self.batch_size]
+            vectors = self._run([texts[i] for i in chunk])
+            if out is None:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[chunk] = vectors
+        return out
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
@@ -0,0 +1,205 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from ..utils.cache import MISSING, LRUTTLCache
+
+# Rows allocated for labeled vectors before the first doubling
+INITIAL_CAPACITY = 64
+# Recently classified questions whose vectors `record` reuses instead of embedding again
+RECENT_VECTORS_SIZE = 256
+
+# Matches the few-shot lines of SELECTOR_SYSTEM_PROMPT: - Câu hỏi: "..." → "normal"
+PROMPT_EXAMPLE_PATTERN = re.compile(r'Câu hỏi:\s*"(?P<question>[^"]+)"\s*→\s*"(?P<label>\w+)"')
+
+
+class PreRouterPrediction(NamedTuple):
+    label: str
+    confidence: float
+    similarity: float
+
+
+def parse_prompt_examples(prompt: str) -> List[Dict[str, str]]:
+    """Extract the labeled few-shot questions of a router prompt."""
+    return [match.groupdict() for match in PROMPT_EXAMPLE_PATTERN.finditer(prompt)]
+
+
+class EmbeddingPreRouter:
+    """
+    Local kNN classifier that answers the router decision without an LLM call.
+
+    Labeled questions are embedded once and kept as unit vectors. A question is
+    classified by a similarity-weighted vote of its `k` nearest labeled neighbours;
+    the prediction is only returned when the winning label holds at least `confidence`
+    of the vote and the nearest neighbour is at least `min_similarity` away, otherwise
+    the caller falls back to the LLM router. Decisions made by the LLM are added back
+    with `record` (and appended to `log_path`), so the router keeps learning.
+
+    Vectors live in a preallocated matrix that doubles when full, so learning a decision
+    costs one row write. `record` reuses the vector computed by `classify` and skips
+    questions that already have a labeled neighbour at `dedupe_similarity` or closer.
+    The log is rotated to `<log_path>.1` once it holds `max_log_records` records.
+
+    Args:
+        embeddings (Embeddings): Model used to embed questions.
+        k (int): Number of neighbours that vote.
+        confidence (float): Minimum share of the vote for a confident answer.
+        min_similarity (float): Minimum cosine similarity of the nearest neighbour.
+        log_path (str, optional): JSONL file where recorded LLM decisions are appended.
+        dedupe_similarity (float): Recorded questions at least this similar to a labeled one are skipped.
+        max_log_records (int): Records per log file before it is rotated.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        k: int = 5,
+        confidence: float = 0.8,
+        min_similarity: float = 0.5,
+        log_path: Optional[str] = None,
+        dedupe_similarity: float = 0.97,
+        max_log_records: int = 10000,
+    ):
+        self.embeddings = embeddings
+        self.k = k
+        self.confidence = confidence
+        self.min_similarity = min_similarity
+        self.log_path = log_path
+        self.dedupe_similarity = dedupe_similarity
+        self.max_log_records = max_log_records
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._size = 0
+        self._labels: List[str] = []
+        self._questions: List[str] = []
+        self._recent = LRUTTLCache(RECENT_VECTORS_SIZE)
+        self._log_records = 0
+        self.predictions = 0
+        self.confident = 0
+        self.duplicates = 0
+
+    @classmethod
+    def from_prompt(cls, embeddings: Embeddings, prompt: str, **kwargs) -> "EmbeddingPreRouter":
+        """Build a pre-router seeded with the examples of a router prompt and, if present, the decision log."""
+        router = cls(embeddings, **kwargs)
+        examples = parse_prompt_examples(prompt)
+        router.add_examples([e["question"] for e in examples], [e["label"] for e in examples])
+        if router.log_path:
+            # The rotated log holds the older decisions
+            if os.path.exists(router.log_path + ".1"):
+                router.load_log(router.log_path + ".1")
+            if os.path.exists(router.log_path):
+                router._log_records = router.load_log(router.log_path)
+        return router
+
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _append(self, vectors: np.ndarray, questions: Sequence[str], labels: Sequence[str]):
+        # Caller holds the lock. Rows below _size are never rewritten, so views handed out stay valid
+        needed = self._size + len(vectors)
+        if self._vectors is None or needed > self._vectors.shape[0]:
+            capacity = max(INITIAL_CAPACITY, self._vectors.shape[0] if self._vectors is not None else 0)
+            while capacity < needed:
+                capacity *= 2
+            grown = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+            if self._vectors is not None:
+                grown[:self._size] = self._vectors[:self._size]
+            self._vectors = grown
+        self._vectors[self._size:needed] = vectors
+        self._size = needed
+        self._questions.extend(questions)
+        self._labels.extend(labels)
+
+    def add_examples(self, questions: Sequence[str], labels: Sequence[str]):
+        """Add labeled questions, embedded in one batch."""
+        if not questions:
+            return
+        vectors = self._normalize(np.asarray(self.embeddings.embed_documents(list(questions)), dtype=np.float32))
+        with self._lock:
+            self._append(vectors, questions, labels)
+
+    def load_log(self, path: str) -> int:
+        """Add the decisions stored in a JSONL log of {"question", "decision"} records and return how many there were."""
+        questions, labels = [], []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    questions.append(record["question"])
+                    labels.append(record["decision"])
+        self.add_examples(questions, labels)
+        return len(questions)
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        self._recent.set(question, vector)
+        return vector
+
+    def record(self, question: str, decision: str):
+        """Learn a decision made by the LLM router and append it to the log, unless a near-identical question is known."""
+        vector = self._recent.get(question)
+        if vector is MISSING:
+            vector = self._embed(question)
+        with self._lock:
+            if self._size and float((self._vectors[:self._size] @ vector).max()) >= self.dedupe_similarity:
+                self.duplicates += 1
+                return
+            self._append(vector[None, :], [question], [decision])
+            if self.log_path:
+                if self._log_records >= self.max_log_records:
+                    os.replace(self.log_path, self.log_path + ".1")
+                    self._log_records = 0
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"question": question, "decision": decision}, ensure_ascii=False) + "\n")
+                self._log_records += 1
+
+    def classify(self, question: str) -> Optional[PreRouterPrediction]:
+        """Return the kNN vote for `question` whatever its confidence, None without examples."""
+        vector = self._embed(question)
+        with self._lock:
+            if not self._size:
+                return None
+            similarities = self._vectors[:self._size] @ vector
+            labels = self._labels
+        k = min(self.k, similarities.shape[0])
+        nearest = np.argpartition(-similarities, k - 1)[:k]
+        votes: Dict[str, float] = {}
+        for index in nearest:
+            votes[labels[index]] = votes.get(labels[index], 0.0) + max(float(similarities[index]), 0.0)
+        total = sum(votes.values())
+        label = max(votes, key=votes.get)
+        return PreRouterPrediction(
+            label=label,
+            confidence=votes[label] / total if total > 0 else 0.0,
+            similarity=float(similarities[nearest].max()),
+        )
+
+    def predict(self, question: str) -> Optional[PreRouterPrediction]:
+        """Return a confident prediction, or None when the LLM router should decide."""
+        prediction = self.classify(question)
+        self.predictions += 1
+        if prediction is None or prediction.confidence < self.confidence or prediction.similarity < self.min_similarity:
+            return None
+        self.confident += 1
+        return prediction
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "examples": len(self._labels),
+            "predictions": self.predictions,
+            "confident": self.confident,
+            "duplicates": self.duplicates,
+            "coverage": self.confident / self.predictions if self.predictions else 0.0,
+        }
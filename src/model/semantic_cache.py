@@ -0,0 +1,137 @@
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from ..utils.cache import MISSING, LRUTTLCache
+
+# Questions whose embedding is kept around, so one turn embeds its question only once
+EMBEDDING_MEMO_SIZE = 256
+
+
+class SemanticCacheHit(NamedTuple):
+    value: Any
+    score: float
+    question: str
+
+
+class SemanticCache:
+    """
+    Cache keyed on the meaning of a question rather than its exact text.
+
+    Questions are embedded with the given embeddings model (the same HuggingFaceEmbeddings
+    used by the memory store) and kept as unit vectors in a preallocated NumPy matrix.
+    A lookup is one matrix-vector product: the most similar cached question is a hit when
+    its cosine similarity reaches `threshold`. When the cache is full the least recently
+    used entry is evicted, and every entry counts its own hits.
+
+    Args:
+        embeddings (Embeddings): Model used to embed questions.
+        threshold (float): Minimum cosine similarity for a cached question to be reused.
+        maxsize (int): Maximum number of cached questions.
+        ttl (float, optional): Seconds an entry stays valid. None means forever.
+    """
+
+    def __init__(self, embeddings: Embeddings, threshold: float = 0.92, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # (maxsize, dims), allocated on first insert
+        self._live = np.zeros(maxsize, dtype=bool)
+        self._last_used = np.zeros(maxsize, dtype=np.float64)
+        self._created = np.zeros(maxsize, dtype=np.float64)
+        self._questions: List[Optional[str]] = [None] * maxsize
+        self._values: List[Any] = [None] * maxsize
+        self._hits = np.zeros(maxsize, dtype=np.int64)
+        self._embedding_memo = LRUTTLCache(EMBEDDING_MEMO_SIZE)
+        self.lookups = 0
+        self.total_hits = 0
+        self.evictions = 0
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = self._embedding_memo.get(text)
+        if vector is MISSING:
+            vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                vector = vector / norm
+            self._embedding_memo.set(text, vector)
+        return vector
+
+    def _expire(self, now: float):
+        if self.ttl is not None:
+            expired = self._live & (self._created + self.ttl <= now)
+            self._live[expired] = False
+
+    def lookup(self, question: str) -> Optional[SemanticCacheHit]:
+        """Return the cached value of the most similar question, or None below the threshold."""
+        vector = self._embed(question)
+        with self._lock:
+            self.lookups += 1
+            if self._vectors is None or not self._live.any():
+                return None
+            now = time.time()
+            self._expire(now)
+            scores = self._vectors @ vector
+            scores[~self._live] = -np.inf
+            slot = int(np.argmax(scores))
+            score = float(scores[slot])
+            if score < self.threshold:
+                return None
+            self._hits[slot] += 1
+            self._last_used[slot] = now
+            self.total_hits += 1
+            return SemanticCacheHit(self._values[slot], score, self._questions[slot])
+
+    def add(self, question: str, value: Any):
+        """Cache `value` for `question`, replacing a near-identical entry if there is one."""
+        vector = self._embed(question)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+            now = time.time()
+            self._expire(now)
+            scores = self._vectors @ vector
+            scores[~self._live] = -np.inf
+            if self._live.any() and scores.max() >= self.threshold:
+                slot = int(np.argmax(scores))
+            elif not self._live.all():
+                slot = int(np.argmin(self._live))
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._questions[slot] = question
+            self._values[slot] = value
+            self._live[slot] = True
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._hits[slot] = 0
+
+    def clear(self):
+        with self._lock:
+            self._live[:] = False
+
+    def __len__(self) -> int:
+        return int(self._live.sum())
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        """Overall hit rate plus the `top` most hit entries."""
+        with self._lock:
+            live = np.flatnonzero(self._live)
+            order = live[np.argsort(-self._hits[live])][:top]
+            return {
+                "size": int(live.size),
+                "lookups": self.lookups,
+                "hits": self.total_hits,
+                "hit_rate": self.total_hits / self.lookups if self.lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": [
+                    {"question": self._questions[slot], "hits": int(self._hits[slot])}
+                    for slot in order
+                ],
+            }
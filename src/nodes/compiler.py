@@ -0,0 +1,254 @@
+# File: nodes/compiler.py
+
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.store.base import BaseStore
+from pydantic import BaseModel, Field
+
+from ..graph.state import State
+from ..output_parser import END_OF_PLAN, ID_PATTERN, LLMCompilerPlanParser, Task
+from .deep_researcher import FinalAnswer, collect_tool_message, submit_tool_call
+from .memory_retriever import get_memories
+
+# Số lần lập lại kế hoạch tối đa trong một lượt
+MAX_REPLANS = 2
+# Thời gian tối đa để thực thi toàn bộ một kế hoạch
+PLAN_TIMEOUT_SECONDS = 60.0
+
+# --- Prompt cho Planner: sinh toàn bộ kế hoạch dưới dạng DAG trong MỘT lần gọi LLM ---
+PLANNER_PROMPT = """Bạn là bộ lập kế hoạch của một trợ lý nghiên cứu. Hãy lập một kế hoạch gồm các lệnh gọi công cụ để trả lời câu hỏi của người dùng, với khả năng chạy song song tối đa.
+
+**Các công cụ có sẵn:**
+{tool_descriptions}
+{join_index}. join(): Thu thập kết quả và kết thúc kế hoạch. Luôn là hành động cuối cùng.
+
+**Định dạng (mỗi dòng một mục):**
+Thought: <suy nghĩ ngắn, không bắt buộc>
+1. tên_công_cụ(tên_đối_số="giá trị")
+2. tên_công_cụ(tên_đối_số="... $1 ...")
+N. join()
+{end_of_plan}
+
+**Quy tắc:**
+- Mỗi hành động có một chỉ số tăng dần, bắt đầu từ 1.
+- Dùng `$N` để tham chiếu kết quả của hành động N. Hành động chỉ được tham chiếu các hành động trước nó.
+- Các hành động không phụ thuộc nhau sẽ được chạy song song, vì vậy đừng tạo phụ thuộc không cần thiết.
+- Chỉ dùng các công cụ đã liệt kê. Kết thúc bằng `join()` rồi dòng `{end_of_plan}`.
+{replan}
+Một số thông tin từ người dùng:
+{user_info}
+"""
+
+REPLAN_INSTRUCTION = """- Đây là lần lập lại kế hoạch. Kết quả các kế hoạch trước nằm trong hội thoại; KHÔNG lặp lại các lệnh gọi đã có kết quả, chỉ lập kế hoạch cho phần còn thiếu.
+"""
+
+# --- Prompt cho Joiner: tổng hợp kết quả, trả lời hoặc yêu cầu lập lại kế hoạch ---
+JOINER_PROMPT = """Bạn là bộ tổng hợp của một trợ lý nghiên cứu. Dựa trên câu hỏi của người dùng và kết quả thực thi kế hoạch bên dưới, hãy:
+- đưa ra `FinalAnswer` nếu đã đủ thông tin, hoặc
+- đưa ra `Replan` kèm nhận xét về thông tin còn thiếu nếu kết quả chưa đủ để trả lời.
+"""
+
+
+class Replan(BaseModel):
+    """Yêu cầu lập lại kế hoạch khi kết quả hiện tại chưa đủ."""
+    feedback: str = Field(..., description="Phân tích thông tin còn thiếu và những gì kế hoạch mới cần làm.")
+
+
+class JoinOutput(BaseModel):
+    """Quyết định của bộ tổng hợp sau khi một kế hoạch đã được thực thi."""
+    thought: str = Field(..., description="Lý luận ngắn gọn về kết quả đã có.")
+    action: Union[FinalAnswer, Replan] = Field(..., description="Câu trả lời cuối cùng HOẶC yêu cầu lập lại kế hoạch.")
+
+
+# --- Bộ lập lịch DAG ---
+
+def _resolve_arg(arg: Any, observations: Dict[int, Any]) -> Any:
+    """Thay các tham chiếu $N / ${N} bằng kết quả của hành động N."""
+    if isinstance(arg, str):
+        return re.sub(ID_PATTERN, lambda m: str(observations.get(int(m.group(1)), m.group(0))), arg)
+    if isinstance(arg, list):
+        return [_resolve_arg(a, observations) for a in arg]
+    if isinstance(arg, tuple):
+        return tuple(_resolve_arg(a, observations) for a in arg)
+    if isinstance(arg, dict):
+        return {k: _resolve_arg(v, observations) for k, v in arg.items()}
+    return arg
+
+
+def schedule_tasks(tasks: Iterable[Task], timeout: float = PLAN_TIMEOUT_SECONDS) -> List[Tuple[Dict, Future]]:
+    """
+    Thực thi các Task ngay khi chúng được parser sinh ra.
+
+    Mỗi task được gửi lên pool công cụ của deep_researcher ngay khi mọi phụ thuộc của nó đã
+    có kết quả, sau khi thay $N trong đối số; các task độc lập chạy song song. Hàm trả về khi
+    mọi task đã xong hoặc hết `timeout` giây.
+
+    Returns:
+        Danh sách (tool_call, future) theo thứ tự chỉ số task. Future của task không chạy được
+        (lỗi phụ thuộc, hết thời gian) chứa quan sát báo lỗi.
+    """
+    deadline = time.monotonic() + timeout
+    observations: Dict[int, Any] = {}
+    scheduled: Dict[int, Tuple[Dict, Future]] = {}
+    waiting: List[Task] = []
+    in_flight = [0]
+    closed = [False]
+    cond = threading.Condition(threading.RLock())
+
+    def on_done(idx: int, future: Future):
+        try:
+            result = future.result()
+        except Exception as e:
+            result = f"Lỗi khi thực thi hành động {idx}: {e}"
+        with cond:
+            observations[idx] = result
+            in_flight[0] -= 1
+            if not closed[0]:
+                # Gửi các task vừa được mở khóa trước khi nhả khóa, để bên chờ không thấy in_flight == 0 quá sớm
+                for task in [t for t in waiting if set(t["dependencies"]) <= observations.keys()]:
+                    waiting.remove(task)
+                    submit(task)
+            cond.notify_all()
+
+    def submit(task: Task):
+        with cond:
+            args = _resolve_arg(task["args"] or {}, observations)
+            tool_call = {"name": task["tool"].name, "args": args, "id": str(uuid.uuid4())}
+            future = submit_tool_call(tool_call, {task["tool"].name: task["tool"]})
+            scheduled[task["idx"]] = (tool_call, future)
+            in_flight[0] += 1
+        print(f"🚀 Bắt đầu hành động {task['idx']}: {tool_call['name']}({args})")
+        future.add_done_callback(lambda f, idx=task["idx"]: on_done(idx, f))
+
+    try:
+        for task in tasks:
+            if task["tool"] == "join":
+                break
+            with cond:
+                ready = set(task["dependencies"]) <= observations.keys()
+                if not ready:
+                    waiting.append(task)
+            if ready:
+                submit(task)
+    except OutputParserException as e:
+        print(f"LỖI khi phân tích kế hoạch: {e}. Chỉ thực thi các hành động đã phân tích được.")
+
+    # Chờ các hành động đang chạy (và các hành động được chúng mở khóa)
+    with cond:
+        while in_flight[0] and time.monotonic() < deadline:
+            cond.wait(deadline - time.monotonic())
+        closed[0] = True
+
+        for task in waiting:
+            future = Future()
+            future.set_result(f"Lỗi: Hành động {task['idx']} không chạy được vì phụ thuộc {task['dependencies']} chưa có kết quả.")
+            scheduled[task["idx"]] = ({"name": task["tool"].name, "args": task["args"] or {}, "id": str(uuid.uuid4())}, future)
+        return [scheduled[idx] for idx in sorted(scheduled)]
+
+
+def _describe_tools(tools) -> str:
+    return "\n".join(
+        f"{i}. {tool.name}({', '.join(tool.args)}): {tool.description}" for i, tool in enumerate(tools, start=1)
+    )
+
+
+# --- Các Node của LangGraph ---
+
+def plan_and_execute(state: State, config: RunnableConfig, store: BaseStore) -> State:
+    """
+    NODE: Thay vòng lặp ReAct cho câu hỏi cần nhiều công cụ. Một lần gọi LLM sinh toàn bộ
+    kế hoạch; kế hoạch được stream qua LLMCompilerPlanParser và mỗi task chạy ngay khi các
+    phụ thuộc của nó có kết quả.
+    """
+    print("--- Thực hiện Node: plan_and_execute ---")
+
+    replanning = bool(state.get("replan"))
+    state["plan_iter"] = state.get("plan_iter", 0) + 1 if replanning else 1
+    state["replan"] = False
+
+    memories = get_memories(state, config, store)
+    user_info = "\n".join([d["data"] for d in memories])
+
+    tools = config["configurable"]["research_tools"] or []
+    planner_prompt = PLANNER_PROMPT.format(
+        tool_descriptions=_describe_tools(tools),
+        join_index=len(tools) + 1,
+        end_of_plan=END_OF_PLAN,
+        replan=REPLAN_INSTRUCTION if replanning else "",
+        user_info=user_info,
+    )
+    messages = state["messages"][-6:] if len(state["messages"]) >= 6 else state["messages"]
+    prompt_messages = [SystemMessage(content=planner_prompt)] + [m for m in messages if not isinstance(m, SystemMessage)]
+
+    llm = config["configurable"]["llm"]
+    parser = LLMCompilerPlanParser(tools=tools)
+    timeout = config["configurable"].get("plan_timeout", PLAN_TIMEOUT_SECONDS)
+
+    try:
+        scheduled = schedule_tasks(parser.transform(llm.stream(prompt_messages)), timeout)
+    except Exception as e:
+        print(f"LỖI trong plan_and_execute: {e}")
+        scheduled = []
+
+    if not scheduled:
+        print("Kế hoạch không có hành động nào.")
+        return state
+
+    # Thu kết quả theo thứ tự chỉ số; thời gian chờ đã tính hết trong schedule_tasks
+    tool_calls = [tool_call for tool_call, _ in scheduled]
+    tool_messages = [collect_tool_message(tool_call, future, 0) for tool_call, future in scheduled]
+    state["messages"].append(AIMessage(content=f"Thực thi kế hoạch lần {state['plan_iter']}.", tool_calls=tool_calls))
+    state["messages"].extend(tool_messages)
+    return state
+
+
+def join_results(state: State, config: RunnableConfig) -> State:
+    """NODE: Tổng hợp kết quả kế hoạch thành câu trả lời, hoặc yêu cầu lập lại kế hoạch."""
+    print("--- Thực hiện Node: join_results ---")
+
+    # Câu hỏi mới nhất và mọi kết quả thực thi từ sau câu hỏi đó
+    last_human = max(i for i, m in enumerate(state["messages"]) if isinstance(m, HumanMessage))
+    question = state["messages"][last_human].content
+    results = "\n\n".join(
+        f"[{m.name}] {m.content}" if isinstance(m, ToolMessage) else f"[Ghi chú] {m.content}"
+        for m in state["messages"][last_human + 1:]
+        if isinstance(m, (ToolMessage, AIMessage))
+    )
+    prompt_messages = [
+        SystemMessage(content=JOINER_PROMPT),
+        HumanMessage(content=f"Câu hỏi: {question}\n\nKết quả thực thi kế hoạch:\n{results or '(không có)'}"),
+    ]
+
+    can_replan = state.get("plan_iter", 1) <= MAX_REPLANS
+    llm = config["configurable"]["llm"]
+
+    try:
+        if can_replan:
+            response: JoinOutput = llm.with_structured_output(JoinOutput).invoke(prompt_messages)
+            print(f"\n🤔 LÝ LUẬN: {response.thought}")
+            action = response.action
+        else:
+            action = llm.with_structured_output(FinalAnswer).invoke(prompt_messages)
+    except Exception as e:
+        print(f"LỖI trong join_results: {e}")
+        action = FinalAnswer(answer="Xin lỗi, tôi không thể tổng hợp câu trả lời lúc này.")
+
+    if isinstance(action, Replan):
+        print(f"🔁 LẬP LẠI KẾ HOẠCH: {action.feedback}")
+        state["messages"].append(AIMessage(content=f"Cần lập lại kế hoạch: {action.feedback}"))
+        state["replan"] = True
+        return state
+
+    print("✅ HÀNH ĐỘNG: Câu trả lời cuối cùng")
+    state["messages"].append(AIMessage(content=action.answer))
+    state["answer"] = action.answer
+    state["replan"] = False
+    return state
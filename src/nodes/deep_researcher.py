@@ -2,10 +2,19 @@
 
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage 
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Optional, Tuple, Union
 from langchain_core.runnables import RunnableConfig
 from ..graph.state import State
+from ..model.llm import raise_if_cancelled
+from ..output_parser import StreamingJSONParser
+from ..tools.sandbox import SandboxError, get_sandbox, run_io
+from .memory_retriever import get_memories
+from langgraph.config import get_stream_writer
 from langgraph.store.base import BaseStore
+from pydantic import ValidationError
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import threading
+import time
 import uuid
 
 # --- 1. Định nghĩa các Lược đồ Hành động (bắt chước bind_tools) ---
@@ -43,6 +52,7 @@ Bạn hoạt động trong một vòng lặp:
 
 **Các công cụ có sẵn:**
 - `search_web(query: str)`: Sử dụng công cụ này để tìm kiếm thông tin trên internet.
+- `search_web_batch(queries: List[str])`: Tìm kiếm nhiều truy vấn liên quan cùng lúc; dùng thay cho nhiều lệnh gọi `search_web`.
 - `evaluate_expression(expression: str)`: Sử dụng công cụ này cho các phép tính toán học.
 
 **Đầu ra của bạn PHẢI LUÔN LUÔN là một đối tượng JSON duy nhất hợp lệ với lược đồ được yêu cầu.**
@@ -53,17 +63,194 @@ Một số thông tin từ người dùng:
 Bắt đầu.
 """
 
+# --- Thực thi công cụ song song ---
+# Các ToolCall của cùng một bước chạy đồng thời. Mỗi công cụ có pool luồng riêng, cỡ bằng giới hạn
+# số lệnh gọi đồng thời của nó: lệnh gọi vượt giới hạn xếp hàng trong pool đó mà không chiếm luồng
+# của công cụ khác. Mỗi lệnh gọi có thời gian chờ tối đa riêng.
+
+TOOL_CONCURRENCY_LIMITS = {"search_web": 4, "search_web_batch": 2, "evaluate_expression": 8}
+DEFAULT_TOOL_CONCURRENCY = 4
+TOOL_TIMEOUT_SECONDS = 30.0
+# Công cụ nặng CPU chạy trong ProcessSandbox (bị kill nếu quá thời gian/bộ nhớ);
+# các công cụ còn lại (IO) chạy dưới timeout bất đồng bộ
+SANDBOXED_TOOLS = {"evaluate_expression"}
+TOOL_TIMEOUTS = {"evaluate_expression": 5.0, "search_web": 20.0, "search_web_batch": 25.0}
+
+_TOOL_EXECUTORS: Dict[str, ThreadPoolExecutor] = {}
+_TOOL_EXECUTORS_LOCK = threading.Lock()
+
+
+def _tool_executor(tool_name: str) -> ThreadPoolExecutor:
+    with _TOOL_EXECUTORS_LOCK:
+        if tool_name not in _TOOL_EXECUTORS:
+            limit = TOOL_CONCURRENCY_LIMITS.get(tool_name, DEFAULT_TOOL_CONCURRENCY)
+            _TOOL_EXECUTORS[tool_name] = ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"tool-{tool_name}")
+        return _TOOL_EXECUTORS[tool_name]
+
+
+def _validate_args(tool_function, tool_args: Dict[str, Any]) -> Dict[str, Any]:
+    """Kiểm tra đối số bằng args_schema (Pydantic) của công cụ; ValidationError nếu không hợp lệ."""
+    schema = tool_function.args_schema
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        # Giữ nguyên giá trị đã chuyển kiểu (không dump các model lồng nhau thành dict)
+        return dict(schema.model_validate(tool_args))
+    return tool_args
+
+
+def _invoke_tool(tool_function, tool_name: str, tool_args: Dict[str, Any]) -> str:
+    timeout = TOOL_TIMEOUTS.get(tool_name, TOOL_TIMEOUT_SECONDS)
+    try:
+        if tool_name in SANDBOXED_TOOLS and getattr(tool_function, "func", None):
+            # Kiểm tra và chuyển kiểu đối số theo args_schema như tool_function.invoke, trước khi gửi sang sandbox
+            tool_args = _validate_args(tool_function, tool_args)
+            return get_sandbox().run(tool_function.func, kwargs=tool_args, timeout=timeout)
+        return run_io(tool_function.invoke, tool_args, timeout=timeout)
+    except SandboxError as e:
+        return f"Lỗi: Công cụ '{tool_name}' đã bị dừng: {e}"
+    except Exception as e:
+        return f"Lỗi khi thực thi công cụ {tool_name}: {e}"
+
+
+def submit_tool_call(tool_call: Dict, known_tools: Dict[str, Any]) -> Future:
+    """Bắt đầu chạy một lệnh gọi công cụ trên pool của công cụ đó và trả về Future chứa quan sát."""
+    tool_name = tool_call["name"]
+    tool_function = known_tools.get(tool_name)
+    if not tool_function:
+        future = Future()
+        future.set_result(f"Lỗi: Không tìm thấy công cụ '{tool_name}'.")
+        return future
+    return _tool_executor(tool_name).submit(_invoke_tool, tool_function, tool_name, tool_call["args"])
+
+
+def collect_tool_message(tool_call: Dict, future: Future, timeout: float) -> ToolMessage:
+    """Chờ kết quả của một lệnh gọi công cụ (tối đa `timeout` giây) và gói thành ToolMessage."""
+    tool_name = tool_call["name"]
+    try:
+        observation = future.result(timeout=max(timeout, 0))
+    except FutureTimeoutError:
+        future.cancel()
+        observation = f"Lỗi: Công cụ '{tool_name}' không trả về kết quả trong thời gian cho phép."
+
+    print(f"👁️ QUAN SÁT (từ {tool_name}):\n{observation}")
+
+    # *** KEY FIX IS HERE ***
+    # Add the 'name' parameter to the ToolMessage constructor.
+    return ToolMessage(
+        content=str(observation),
+        tool_call_id=tool_call["id"],
+        name=tool_name  # <-- This is the required addition for Gemini
+    )
+
+# --- Gửi công cụ ngay trong lúc LLM đang sinh ReActStep ---
+# Các lệnh gọi đã được gửi sớm, theo tool_call id, để execute_tool dùng lại thay vì gọi lại.
+
+_DISPATCHED_TOOL_CALLS: Dict[str, Tuple[float, Future]] = {}
+_DISPATCHED_LOCK = threading.Lock()
+
+
+def _register_dispatched(tool_call_id: str, future: Future):
+    now = time.monotonic()
+    with _DISPATCHED_LOCK:
+        # Bỏ các lệnh gọi không bao giờ được thu (ví dụ nhánh suy đoán bị hủy)
+        for stale_id in [k for k, (t, _) in _DISPATCHED_TOOL_CALLS.items() if now - t > 2 * TOOL_TIMEOUT_SECONDS]:
+            del _DISPATCHED_TOOL_CALLS[stale_id]
+        _DISPATCHED_TOOL_CALLS[tool_call_id] = (now, future)
+
+
+def _take_dispatched(tool_call_id: str) -> Optional[Future]:
+    with _DISPATCHED_LOCK:
+        entry = _DISPATCHED_TOOL_CALLS.pop(tool_call_id, None)
+    return entry[1] if entry else None
+
+
+def _cancel_dispatched(tool_calls: List[Dict]):
+    # Lệnh gọi chưa chạy thì bị bỏ khỏi hàng đợi, lệnh gọi đang chạy thì kết quả bị bỏ đi
+    for tool_call in tool_calls:
+        future = _take_dispatched(tool_call["id"])
+        if future is not None:
+            future.cancel()
+
+
+def _reuse_dispatched(response: ReActStep, dispatched_calls: Dict[int, Dict]) -> Dict[int, str]:
+    """
+    Ghép các ToolCall của `response` (sinh lại sau khi stream lỗi) với các lệnh gọi đã gửi sớm
+    có cùng tên và đối số, để execute_tool dùng lại kết quả của chúng. Lệnh gọi đã gửi sớm
+    không khớp với ToolCall nào bị hủy.
+
+    Returns:
+        {vị trí trong action: tool_call id} của các lệnh gọi được dùng lại.
+    """
+    unmatched = list(dispatched_calls.values())
+    reused: Dict[int, str] = {}
+    if not isinstance(response.action, FinalAnswer):
+        for i, tool_call_action in enumerate(response.action):
+            for tool_call in unmatched:
+                if tool_call["name"] == tool_call_action.name and tool_call["args"] == tool_call_action.arguments:
+                    reused[i] = tool_call["id"]
+                    unmatched.remove(tool_call)
+                    break
+    _cancel_dispatched(unmatched)
+    return reused
+
+
+def _stream_writer():
+    try:
+        return get_stream_writer()
+    except Exception:
+        # Ngoài một lần chạy graph
+        return None
+
+
+def stream_react_step(llm, messages: List[Any], known_tools: Dict[str, Any], dispatched: Dict[int, Dict]) -> ReActStep:
+    """
+    Stream một ReActStep dưới dạng JSON và phân tích dần từng đoạn.
+    Mỗi ToolCall trong `action` được gửi lên pool công cụ ngay khi nó hoàn chỉnh, trong khi
+    mô hình vẫn đang sinh; các token của FinalAnswer.answer được in và đẩy ra stream của graph
+    ngay khi đến.
+
+    Args:
+        dispatched: Được điền {vị trí trong action: tool_call} của các lệnh gọi đã gửi sớm, ngay khi
+            gửi, nên bên gọi vẫn có chúng nếu stream lỗi giữa chừng.
+
+    Returns:
+        ReActStep hoàn chỉnh.
+    """
+    parser = StreamingJSONParser()
+    writer = _stream_writer()
+    streamed_answer = False
+
+    for chunk in llm.with_json_output(ReActStep).stream(messages):
+        for kind, path, value in parser.feed(str(chunk.content)):
+            if kind == "value" and len(path) == 2 and path[0] == "action" and isinstance(path[1], int):
+                try:
+                    tool_call_action = ToolCall.model_validate(value)
+                except ValidationError:
+                    continue
+                tool_call = {"name": tool_call_action.name, "args": tool_call_action.arguments, "id": str(uuid.uuid4())}
+                # Nhánh suy đoán đã thua thì dừng, không gửi công cụ thật
+                raise_if_cancelled()
+                _register_dispatched(tool_call["id"], submit_tool_call(tool_call, known_tools))
+                dispatched[path[1]] = tool_call
+                print(f"⚡ Gửi sớm công cụ: {tool_call['name']}, Đối số: {tool_call['args']}")
+            elif kind == "string_delta" and path == ("action", "answer"):
+                streamed_answer = True
+                print(value, end="", flush=True)
+                if writer is not None:
+                    writer({"answer_delta": value})
+
+    if streamed_answer:
+        print()
+    return ReActStep.model_validate_json(parser.text)
+
 # --- Các Node và Cạnh của LangGraph ---
 
 def call_agent_and_parse(state: State, config: RunnableConfig, store: BaseStore) -> State:
     """Node gọi LLM, được cấu trúc để xuất ra một đối tượng ReActStep."""
     print("--- Thực hiện Node: call_agent_and_parse (Hybrid) ---")
 
-    # ... (phần lấy user_info không thay đổi) ...
-    user_id = config["configurable"]["user_id"]
-    namespace = (user_id, "memories")
-    memories = store.search(namespace, query=str(state["messages"][-1].content))
-    user_info = "\n".join([d.value["data"] for d in memories])
+    # Ký ức đã được lấy một lần ở đầu lượt; mỗi vòng ReAct chỉ đọc lại từ state
+    memories = get_memories(state, config, store)
+    user_info = "\n".join([d["data"] for d in memories])
 
     llm = config["configurable"]["llm"]
     llm_with_structure = llm.with_structured_output(ReActStep)
@@ -72,7 +259,27 @@ def call_agent_and_parse(state: State, config: RunnableConfig, store: BaseStore)
     if not any(isinstance(m, SystemMessage) for m in messages):
         messages.insert(0, SystemMessage(content=REACT_HYBRID_PROMPT.format(user_info=user_info)))
 
-    response: ReActStep = llm_with_structure.invoke(messages)
+    dispatched: Dict[int, str] = {}
+    if config["configurable"].get("stream_react_steps"):
+        known_tools = {tool.name: tool for tool in config["configurable"]["research_tools"] or []}
+        dispatched_calls: Dict[int, Dict] = {}
+        try:
+            response = stream_react_step(llm, messages, known_tools, dispatched_calls)
+            dispatched = {i: tool_call["id"] for i, tool_call in dispatched_calls.items()}
+        except CancelledError:
+            _cancel_dispatched(list(dispatched_calls.values()))
+            raise
+        except Exception as e:
+            print(f"LỖI khi stream ReActStep: {e}. Chuyển sang gọi không stream.")
+            try:
+                response = llm_with_structure.invoke(messages)
+            except BaseException:
+                _cancel_dispatched(list(dispatched_calls.values()))
+                raise
+            # Các lệnh gọi đã gửi sớm trùng với câu trả lời mới được dùng lại, số còn lại bị hủy
+            dispatched = _reuse_dispatched(response, dispatched_calls)
+    else:
+        response: ReActStep = llm_with_structure.invoke(messages)
     
     print(f"\n🤔 LÝ LUẬN: {response.reasoning}")
     
@@ -89,11 +296,11 @@ def call_agent_and_parse(state: State, config: RunnableConfig, store: BaseStore)
         # *** THAY ĐỔI CHÍNH Ở ĐÂY ***
         # Tạo tool_calls với ID duy nhất cho mỗi lệnh gọi
         tool_calls = []
-        for tool_call_action in response.action:
+        for i, tool_call_action in enumerate(response.action):
             tool_calls.append({
                 "name": tool_call_action.name,
                 "args": tool_call_action.arguments,
-                "id": str(uuid.uuid4()) # Tạo ID duy nhất
+                "id": dispatched.get(i) or str(uuid.uuid4()) # Tạo ID duy nhất (hoặc dùng ID của lệnh gọi đã gửi sớm)
             })
             print(f"- Công cụ: {tool_call_action.name}, Đối số: {tool_call_action.arguments}, ID: {tool_calls[-1]['id']}")
 
@@ -109,37 +316,21 @@ def call_agent_and_parse(state: State, config: RunnableConfig, store: BaseStore)
 
 
 def execute_tool(state: State, config: RunnableConfig) -> State:
-    """Node thực thi các lệnh gọi công cụ và trả về các ToolMessage."""
+    """Node thực thi các lệnh gọi công cụ (song song) và trả về các ToolMessage theo đúng thứ tự."""
     print("--- Thực hiện Node: execute_tool (Hybrid) ---")
     
     tool_calls: List[Dict] = state["parsed_action"]
     known_tools = {tool.name: tool for tool in config["configurable"]["research_tools"]} if config["configurable"]["research_tools"] else {}
-    
-    tool_messages = []
-    for tool_call in tool_calls:
-        tool_name = tool_call["name"]
-        tool_args = tool_call["args"]
-        tool_call_id = tool_call["id"]
-        
-        tool_function = known_tools.get(tool_name)
-        if not tool_function:
-            observation = f"Lỗi: Không tìm thấy công cụ '{tool_name}'."
-        else:
-            try:
-                observation = tool_function.invoke(tool_args)
-            except Exception as e:
-                observation = f"Lỗi khi thực thi công cụ {tool_name}: {e}"
-        
-        print(f"👁️ QUAN SÁT (từ {tool_name}):\n{observation}")
-        
-        # *** KEY FIX IS HERE ***
-        # Add the 'name' parameter to the ToolMessage constructor.
-        tool_messages.append(ToolMessage(
-            content=str(observation),
-            tool_call_id=tool_call_id,
-            name=tool_name  # <-- This is the required addition for Gemini
-        ))
+    timeout = config["configurable"].get("tool_timeout", TOOL_TIMEOUT_SECONDS)
+
+    # Gửi tất cả lệnh gọi cùng lúc (trừ các lệnh gọi đã gửi sớm khi stream), rồi thu kết quả theo thứ tự ban đầu.
+    # Mỗi lệnh gọi được chờ tối đa `timeout` của riêng nó, không phụ thuộc vị trí trong danh sách
+    futures = [_take_dispatched(tool_call["id"]) or submit_tool_call(tool_call, known_tools) for tool_call in tool_calls]
+    tool_messages = [
+        collect_tool_message(tool_call, future, timeout)
+        for tool_call, future in zip(tool_calls, futures)
+    ]
 
     state["messages"].extend(tool_messages)
     state["parsed_action"] = None 
-    return state
\ No newline at end of file
+    return state
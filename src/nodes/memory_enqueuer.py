@@ -0,0 +1,64 @@
+from langchain_core.runnables import RunnableConfig
+from langgraph.store.base import BaseStore
+from typing import Any, Dict, List
+
+from ..graph.state import State
+from .memory_checker import MAX_TURNS_BEFORE_CHECK, memory_checker
+from .memory_summarizer import memory_summarizer
+from .memory_updater import memory_updater
+
+
+def run_memory_pipeline(messages: List[Any], config: RunnableConfig, store: BaseStore):
+    """
+    Chạy memory_checker -> memory_summarizer -> memory_updater trên một bản chụp tin nhắn,
+    ngoài graph (trong luồng nền của MemoryWriteBehind).
+    """
+    # memory_enqueuer đã đếm lượt, nên đặt bộ đếm để memory_checker kiểm tra ngay
+    state: Dict[str, Any] = {"messages": messages, "memory_update_iter": MAX_TURNS_BEFORE_CHECK - 1}
+    state = memory_checker(state, config)
+    if state.get("update_memory") != "yes":
+        return
+    state = memory_summarizer(state, config)
+    memory_updater(state, config, store)
+
+
+def memory_enqueuer(state: State, config: RunnableConfig, store: BaseStore) -> State:
+    """
+    NODE: Thay thế memory_checker khi bảo trì bộ nhớ chạy nền.
+    Đếm lượt như memory_checker; đến lượt kiểm tra thì đẩy một bản chụp hội thoại vào
+    MemoryWriteBehind và trả về ngay để nhánh trả lời không phải chờ. Không có
+    config["configurable"]["memory_worker"] thì cập nhật bộ nhớ ngay trong lượt.
+    """
+    print("--- Thực hiện Node: memory_enqueuer ---")
+
+    current_turns = state.get("memory_update_iter", 0) + 1
+    state["memory_update_iter"] = current_turns
+    state["update_memory"] = "no"
+
+    if current_turns < MAX_TURNS_BEFORE_CHECK:
+        print(f"Lượt hội thoại {current_turns}/{MAX_TURNS_BEFORE_CHECK}. Bỏ qua kiểm tra bộ nhớ.")
+        return state
+
+    state["memory_update_iter"] = 0
+
+    # Bản chụp: danh sách mới, và chỉ giữ các khóa cấu hình của người dùng (bỏ khóa nội bộ của LangGraph)
+    snapshot = list(state["messages"][-6:])
+    job_config = {"configurable": {k: v for k, v in config["configurable"].items() if not k.startswith("__")}}
+    user_id = job_config["configurable"]["user_id"]
+    memory_worker = config["configurable"].get("memory_worker")
+
+    if memory_worker is None:
+        print("Không có memory_worker. Cập nhật bộ nhớ ngay trong lượt này.")
+        try:
+            run_memory_pipeline(snapshot, job_config, store)
+        except Exception as e:
+            print(f"LỖI khi cập nhật bộ nhớ: {e}")
+        return state
+
+    try:
+        memory_worker.submit(user_id, run_memory_pipeline, snapshot, job_config, store)
+        print(f"Đã đưa việc cập nhật bộ nhớ của người dùng {user_id} vào hàng đợi nền.")
+    except Exception as e:
+        print(f"LỖI: Không thể đưa việc cập nhật bộ nhớ vào hàng đợi: {e}")
+
+    return state
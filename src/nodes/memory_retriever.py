@@ -0,0 +1,71 @@
+# File: nodes/memory_retriever.py
+
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.store.base import BaseStore
+
+from ..graph.state import State
+
+# Số ký ức lấy về một lần mỗi lượt; các node sau chỉ cắt lấy phần đầu theo giới hạn của chúng
+MEMORY_RETRIEVAL_LIMIT = 10
+
+
+def _latest_question(messages: List[Any]) -> str:
+    """Nội dung tin nhắn người dùng mới nhất (hoặc tin nhắn cuối nếu không có)."""
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return str(message.content)
+    return str(messages[-1].content) if messages else ""
+
+
+def _search(state: State, config: RunnableConfig, store: BaseStore, query: str) -> List[Dict[str, Any]]:
+    user_id = config["configurable"]["user_id"]
+    namespace = (user_id, "memories")
+    items = store.search(namespace, query=query, limit=MEMORY_RETRIEVAL_LIMIT)
+
+    state["memories"] = [{"key": d.key, "data": d.value["data"], "score": d.score} for d in items]
+    state["memory_query"] = query
+    # Mỗi lần tìm kiếm embed câu truy vấn đúng một lần
+    state["memory_searches"] = state.get("memory_searches", 0) + 1
+    return state["memories"]
+
+
+def retrieve_memories(state: State, config: RunnableConfig, store: BaseStore) -> State:
+    """
+    NODE: Chạy đầu mỗi lượt. Embed câu hỏi mới nhất và tìm ký ức MỘT lần, lưu
+    MEMORY_RETRIEVAL_LIMIT kết quả vào state để các node sau dùng lại qua get_memories.
+    """
+    print("--- Thực hiện Node: retrieve_memories ---")
+
+    # Bộ đếm tính theo lượt
+    state["memory_searches"] = 0
+    try:
+        memories = _search(state, config, store, _latest_question(state["messages"]))
+        print(f"Đã lấy {len(memories)} ký ức cho lượt này.")
+    except Exception as e:
+        print(f"LỖI khi tìm ký ức: {e}. Các node sau sẽ tự tìm lại.")
+        state["memories"] = None
+        state["memory_query"] = None
+    return state
+
+
+def get_memories(state: State, config: RunnableConfig, store: BaseStore, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Trả về các ký ức của lượt hiện tại, liên quan nhất trước.
+
+    Cắt từ kết quả của retrieve_memories; chỉ tìm trong store khi lượt này chưa có kết quả
+    cho câu hỏi mới nhất (ví dụ node chạy ngoài graph, hoặc bộ nhớ vừa được cập nhật).
+
+    Args:
+        limit (int, optional): Số ký ức tối đa, không vượt quá MEMORY_RETRIEVAL_LIMIT.
+
+    Returns:
+        Danh sách dict {"key", "data", "score"}.
+    """
+    query = _latest_question(state["messages"])
+    memories = state.get("memories")
+    if memories is None or state.get("memory_query") != query:
+        memories = _search(state, config, store, query)
+    return memories[:limit] if limit is not None else memories
@@ -39,6 +39,7 @@ def memory_updater(state: State, config: RunnableConfig, store: BaseStore) -> St
     known_tools = {tool.name: tool for tool in memory_tools} if memory_tools else {}
     namespace = (user_id, "memories")
     query = state["memory_summary"]
+    # Tìm theo bản tóm tắt, không theo câu hỏi: cần đúng các ký ức mâu thuẫn với thông tin mới
     memories = store.search(namespace, query=query, limit=5)
     user_info = "\n".join([f"ID: {d.key}, Nội dung: {d.value['data']}" for d in memories])
 
@@ -75,6 +76,8 @@ def memory_updater(state: State, config: RunnableConfig, store: BaseStore) -> St
                     store=store       # Add the store object
                 )
                 print(f"Thực thi thành công công cụ {tool_name}: {result}")
+                # Bộ nhớ đã thay đổi: các node sau phải tìm lại thay vì dùng kết quả cũ
+                state["memories"] = None
             except Exception as e:
                 print(f"Lỗi khi thực thi công cụ {tool_name}: {e}")
     
@@ -0,0 +1,79 @@
+# File: nodes/router.py
+
+from langchain_core.messages import SystemMessage
+from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel, Field
+from typing import Literal
+
+from ..graph.state import State
+from .memory_checker import MAX_TURNS_BEFORE_CHECK
+from .selector import select_node
+
+# --- Prompt gộp memory_checker và select_node vào MỘT lần gọi LLM ---
+FUSED_ROUTER_PROMPT = """Bạn là hệ thống điều phối của một trợ lý trò chuyện. Đọc vài lượt hội thoại gần đây và đưa ra HAI quyết định độc lập.
+
+**1. update_memory** - có cần cập nhật bộ nhớ dài hạn về người dùng hay không:
+- "yes": nếu có thông tin mới, đã thay đổi, hoặc đã lỗi thời về người dùng (sự kiện, sở thích, thông tin cá nhân).
+- "no": nếu không có gì cần ghi nhớ.
+
+Ví dụ:
+- "Hãy nhớ rằng tôi thích pizza" → "yes"
+- "Tôi không còn thích pizza nữa, giờ tôi thích burger" → "yes"
+- "Thời tiết hôm nay thế nào?" → "no"
+
+**2. decision** - cách trả lời câu hỏi MỚI NHẤT của người dùng:
+- "normal": lời chào, hỏi đáp thông thường, hoặc có thể trả lời trực tiếp mà không cần tra cứu.
+- "deep_research": cần tìm kiếm web, tính toán phức tạp, hoặc bất kỳ hành động nào cần công cụ bên ngoài.
+
+Ví dụ:
+- "Chào bạn, bạn khỏe không?" → "normal"
+- "Thủ đô của Pháp là gì?" → "normal" (kiến thức phổ thông)
+- "Giá cổ phiếu Tesla hôm nay là bao nhiêu?" → "deep_research"
+- "Tính căn bậc hai của 529." → "deep_research"
+
+Hãy xem xét đoạn hội thoại gần đây và đưa ra cả hai quyết định.
+"""
+
+
+class RouteDecision(BaseModel):
+    """Quyết định gộp: có cập nhật bộ nhớ không và cách xử lý câu hỏi mới nhất."""
+    reasoning: str = Field(description="Lý do ngắn gọn cho hai quyết định.")
+    update_memory: Literal["yes", "no"] = Field(description="'yes' nếu có thông tin về người dùng cần cập nhật vào bộ nhớ dài hạn, ngược lại là 'no'.")
+    decision: Literal["normal", "deep_research"] = Field(description="Lựa chọn phải là 'normal' hoặc 'deep_research'.")
+
+
+def fused_router(state: State, config: RunnableConfig) -> State:
+    """
+    NODE: Thay thế chuỗi memory_checker -> select_node.
+    Ở lượt cần kiểm tra bộ nhớ, cả hai quyết định đến từ MỘT lần gọi LLM có cấu trúc;
+    các lượt khác chỉ cần select_node.
+    """
+    print("--- Thực hiện Node: fused_router ---")
+
+    current_turns = state.get("memory_update_iter", 0) + 1
+    state["memory_update_iter"] = current_turns
+    state["update_memory"] = "no"
+
+    if current_turns < MAX_TURNS_BEFORE_CHECK:
+        print(f"Lượt hội thoại {current_turns}/{MAX_TURNS_BEFORE_CHECK}. Chỉ cần chọn cách trả lời.")
+        return select_node(state, config)
+
+    print(f"Đã đạt đến lượt thứ {current_turns}. Kiểm tra bộ nhớ và chọn cách trả lời trong một lần gọi...")
+    state["memory_update_iter"] = 0
+
+    messages = state["messages"][-6:]
+    llm = config["configurable"]["llm"]
+    structured_llm = llm.with_structured_output(RouteDecision)
+
+    prompt_messages = [SystemMessage(content=FUSED_ROUTER_PROMPT)] + messages
+
+    try:
+        response: RouteDecision = structured_llm.invoke(prompt_messages)
+        print(f"Quyết định bộ nhớ: '{response.update_memory}', cách trả lời: '{response.decision}'. Lý do: {response.reasoning}")
+        state["update_memory"] = response.update_memory
+        state["decision"] = response.decision
+    except Exception as e:
+        print(f"LỖI trong fused_router: {e}. Chuyển sang select_node.")
+        return select_node(state, config)
+
+    return state
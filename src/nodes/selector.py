@@ -3,7 +3,7 @@
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
-from typing import Literal, Dict, Any
+from typing import Literal, Dict, Any, Optional
 from langgraph.store.base import BaseStore
 
 from ..graph.state import State
@@ -34,21 +34,31 @@ class Decision(BaseModel):
         description="Lựa chọn phải là 'normal' hoặc 'deep_research'."
     )
 
-def select_node(state: State, config: RunnableConfig) -> State:
-    """NODE SELECTOR: Quyết định cách xử lý dựa trên câu hỏi."""
-    print("--- Thực hiện Node: select_node ---")
-    
-    question = ""
-    for message in reversed(state["messages"]):
-        if isinstance(message, HumanMessage):
-            question = message.content
-            break
-    
-    if not question:
-        print("LỖI: Không tìm thấy HumanMessage trong state['messages']")
-        state["decision"] = "normal"  # Fallback
-        return state
-    
+def quick_decision(question: str, config: RunnableConfig) -> Optional[str]:
+    """Quyết định không cần LLM (semantic cache hoặc pre-router đủ tự tin), None nếu phải hỏi LLM."""
+    # Câu hỏi tương tự đã được phân loại trước đó thì dùng lại quyết định, không gọi LLM
+    router_cache = config["configurable"].get("router_cache")
+    if router_cache is not None:
+        hit = router_cache.lookup(question)
+        if hit is not None:
+            print(f"Quyết định (semantic cache, độ tương đồng {hit.score:.3f}): {hit.value}")
+            return hit.value
+
+    # Bộ phân loại kNN cục bộ trả lời ngay nếu đủ tự tin, chỉ câu hỏi mơ hồ mới cần LLM
+    pre_router = config["configurable"].get("pre_router")
+    if pre_router is not None:
+        prediction = pre_router.predict(question)
+        if prediction is not None:
+            print(f"Quyết định (pre-router, độ tin cậy {prediction.confidence:.2f}): {prediction.label}")
+            return prediction.label
+    return None
+
+
+def llm_decision(question: str, config: RunnableConfig) -> str:
+    """Hỏi LLM cách xử lý câu hỏi và ghi quyết định vào semantic cache và pre-router."""
+    router_cache = config["configurable"].get("router_cache")
+    pre_router = config["configurable"].get("pre_router")
+
     messages = [
         SystemMessage(content=SELECTOR_SYSTEM_PROMPT),
         HumanMessage(content=f"Câu hỏi: {question}")
@@ -64,14 +74,39 @@ def select_node(state: State, config: RunnableConfig) -> State:
     try:
         response_object = structured_llm.invoke(messages)
         decision = response_object.decision
+        if router_cache is not None:
+            router_cache.add(question, decision)
+        if pre_router is not None:
+            pre_router.record(question, decision)
     except Exception as e:
         # Xử lý lỗi nếu LLM không thể trả về đúng định dạng sau nhiều lần thử
         print(f"LỖI: LLM không thể tạo output có cấu trúc. Lỗi: {e}. Sử dụng fallback.")
         decision = "normal" # Fallback an toàn
 
     print(f"Quyết định: {decision}")
+    return decision
+
+
+def select_node(state: State, config: RunnableConfig) -> State:
+    """NODE SELECTOR: Quyết định cách xử lý dựa trên câu hỏi."""
+    print("--- Thực hiện Node: select_node ---")
+    
+    question = ""
+    for message in reversed(state["messages"]):
+        if isinstance(message, HumanMessage):
+            question = message.content
+            break
+    
+    if not question:
+        print("LỖI: Không tìm thấy HumanMessage trong state['messages']")
+        state["decision"] = "normal"  # Fallback
+        return state
+
+    decision = quick_decision(question, config)
+    if decision is None:
+        decision = llm_decision(question, config)
     
     # Cập nhật state (đổi 'decision' thành 'decision' để phù hợp với builder.py)
     state["decision"] = decision
     
-    return state
\ No newline at end of file
+    return state
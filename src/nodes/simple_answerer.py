@@ -3,8 +3,10 @@
 from langchain_core.messages import SystemMessage, BaseMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
 from ..graph.state import State
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from langgraph.store.base import BaseStore
+from .memory_retriever import get_memories
+from ..model.llm import raise_if_cancelled
 import uuid
 
 # Merged system prompt for simple chatbot (Không thay đổi)
@@ -16,14 +18,43 @@ Một số thông tin từ người dùng:
 {info}
 """
 
+# Ngưỡng điểm ký ức mặc định (config["configurable"]["memory_relevance_threshold"]). Câu trả lời
+# chỉ được dùng chung qua semantic cache cho mọi người dùng khi không có ký ức nào đạt ngưỡng.
+# Phân bố điểm phụ thuộc vào embedder, nên mặc định là None: có bất kỳ ký ức nào được trả về
+# thì câu trả lời được coi là cá nhân hóa và không đi qua cache dùng chung. Chỉ đặt một số
+# khi đã đo điểm của embedder đang dùng, vì ngưỡng quá cao sẽ để lộ câu trả lời dựa trên
+# ký ức của một người dùng cho người khác.
+MEMORY_RELEVANCE_THRESHOLD: Optional[float] = None
+
+
+def _is_personalized(memories: List[Dict[str, Any]], threshold: Optional[float]) -> bool:
+    if threshold is None:
+        return bool(memories)
+    return any(d["score"] is None or d["score"] >= threshold for d in memories)
+
+
 def simple_answerer(state: State, config: RunnableConfig, store: BaseStore) -> State:
     """NODE: Trả lời câu hỏi đơn giản như một chatbot thông thường."""
     print("--- Thực hiện Node: simple_answerer ---")
 
-    user_id = config["configurable"]["user_id"]
-    namespace = (user_id, "memories")
-    memories = store.search(namespace, query=str(state["messages"][-1].content), limit=3)
-    info = "\n".join([d.value["data"] for d in memories])
+    memories = get_memories(state, config, store, limit=3)
+    info = "\n".join([d["data"] for d in memories])
+
+    question = str(state["messages"][-1].content)
+    answer_cache = config["configurable"].get("answer_cache")
+    threshold = config["configurable"].get("memory_relevance_threshold", MEMORY_RELEVANCE_THRESHOLD)
+    personalized = _is_personalized(memories, threshold)
+    # Câu trả lời dựa trên cả các lượt trước ("tại sao?"), nên chỉ dùng cache ở lượt đầu của thread,
+    # khi câu trả lời chỉ phụ thuộc vào câu hỏi
+    first_turn = len(state["messages"]) == 1
+    cacheable = answer_cache is not None and not personalized and first_turn
+    if cacheable:
+        hit = answer_cache.lookup(question)
+        if hit is not None:
+            print(f"Trả lời (semantic cache, độ tương đồng {hit.score:.3f}): {hit.value}")
+            state["answer"] = hit.value
+            state["messages"].append(HumanMessage(content=hit.value))
+            return state
 
     messages = state["messages"][-6:] if len(state["messages"]) >= 6 else state["messages"]
     
@@ -38,7 +69,10 @@ def simple_answerer(state: State, config: RunnableConfig, store: BaseStore) -> S
     # Nó trả về một đối tượng BaseMessage (thường là AIMessage), không phải chuỗi thô.
     llm = config["configurable"]["llm"]
     response = llm.invoke(prompt_messages)
-
+    # Nhánh suy đoán đã thua (bị hủy sau khi LLM trả lời) thì không ghi vào cache
+    raise_if_cancelled()
+    if cacheable:
+        answer_cache.add(question, response)
     
     print(f"Trả lời: {response}")
     
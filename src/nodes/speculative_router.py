@@ -0,0 +1,162 @@
+# File: nodes/speculative_router.py
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.store.base import BaseStore
+
+from ..graph.state import State
+from ..model.llm import CancelScope
+from .deep_researcher import call_agent_and_parse
+from .selector import llm_decision, quick_decision, select_node
+from .simple_answerer import simple_answerer
+
+# Luồng chạy song song router và hai nhánh suy đoán
+_SPECULATION_EXECUTOR = ThreadPoolExecutor(max_workers=48, thread_name_prefix="speculation")
+
+
+class SpeculationBudget:
+    """
+    Ngân sách cho chi phí LLM suy đoán, kèm số liệu thống kê.
+
+    Mỗi lượt (speculative hay không) tích lũy `max_ratio` lượt suy đoán, tối đa `burst`;
+    mỗi lần suy đoán tiêu một lượt. Nhánh thua tốn thêm khoảng một lần gọi LLM, nên
+    `max_ratio` là số lần gọi LLM thêm chấp nhận được trên mỗi lượt hội thoại.
+
+    Args:
+        max_ratio (float): Số lần suy đoán tối đa trên mỗi lượt, tính trung bình.
+        burst (float): Số lần suy đoán có thể dùng liền sau một thời gian nhàn rỗi.
+    """
+
+    def __init__(self, max_ratio: float = 0.5, burst: float = 5.0):
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.speculations = 0
+        self.wins = {"normal": 0, "deep_research": 0}
+        self.fallbacks = 0
+        self.loser_cancelled = 0
+        self.loser_completed = 0
+        self.saved_seconds = 0.0
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self.turns += 1
+            self._tokens = min(self.burst, self._tokens + self.max_ratio)
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            self.speculations += 1
+            return True
+
+    def record(self, decision: str, won: bool, loser_done: bool, saved: float):
+        with self._lock:
+            if won:
+                self.wins[decision] += 1
+                self.saved_seconds += saved
+            else:
+                self.fallbacks += 1
+            if loser_done:
+                self.loser_completed += 1
+            else:
+                self.loser_cancelled += 1
+
+    def stats(self) -> Dict[str, Any]:
+        won = sum(self.wins.values())
+        return {
+            "turns": self.turns,
+            "speculations": self.speculations,
+            "speculation_rate": self.speculations / self.turns if self.turns else 0.0,
+            "wins": dict(self.wins),
+            "win_rate": won / self.speculations if self.speculations else 0.0,
+            "fallbacks": self.fallbacks,
+            "loser_cancelled": self.loser_cancelled,
+            "loser_completed": self.loser_completed,
+            "saved_seconds": self.saved_seconds,
+        }
+
+
+_DEFAULT_BUDGET = SpeculationBudget()
+
+
+def _branch_state(state: State) -> State:
+    # Mỗi nhánh có danh sách tin nhắn riêng, thay đổi của nhánh thua bị bỏ đi
+    return {**state, "messages": list(state["messages"])}
+
+
+def _run_in_scope(scope: CancelScope, node: Callable, *args) -> State:
+    with scope:
+        return node(*args)
+
+
+def _submit(fn: Callable, *args):
+    # Mỗi nhánh chạy trong một bản sao context của node (cấu hình tracing/callbacks)
+    return _SPECULATION_EXECUTOR.submit(contextvars.copy_context().run, fn, *args)
+
+
+def speculative_router(state: State, config: RunnableConfig, store: BaseStore) -> State:
+    """
+    NODE: Chạy router LLM cùng lúc với simple_answerer và bước call_agent_and_parse đầu tiên.
+    Khi có quyết định, nhánh thua bị hủy (các yêu cầu LLM của nó bị đóng, nó không gửi thêm
+    công cụ hay ghi cache) và trạng thái của nó bị bỏ đi. Chỉ suy đoán khi router chưa chắc
+    chắn (semantic cache và pre-router không quyết định được) và còn ngân sách.
+    """
+    print("--- Thực hiện Node: speculative_router ---")
+    state["speculated"] = False
+
+    question = ""
+    for message in reversed(state["messages"]):
+        if isinstance(message, HumanMessage):
+            question = message.content
+            break
+
+    if not question:
+        return select_node(state, config)
+
+    # Quyết định không cần LLM được dùng luôn, không tra cache và pre-router lần nữa
+    decision = quick_decision(question, config)
+    if decision is not None:
+        state["decision"] = decision
+        return state
+
+    budget: SpeculationBudget = config["configurable"].get("speculation_budget") or _DEFAULT_BUDGET
+    if not budget.try_acquire():
+        print("Không suy đoán: đã hết ngân sách.")
+        state["decision"] = llm_decision(question, config)
+        return state
+
+    scopes = {"normal": CancelScope(), "deep_research": CancelScope()}
+    start = time.monotonic()
+    router_future = _submit(llm_decision, question, config)
+    branch_futures = {
+        "normal": _submit(_run_in_scope, scopes["normal"], simple_answerer, _branch_state(state), config, store),
+        "deep_research": _submit(_run_in_scope, scopes["deep_research"], call_agent_and_parse, _branch_state(state), config, store),
+    }
+
+    decision = router_future.result()
+    router_latency = time.monotonic() - start
+    loser = "deep_research" if decision == "normal" else "normal"
+    loser_done = branch_futures[loser].done()
+    scopes[loser].cancel()
+    branch_futures[loser].cancel()
+    print(f"Quyết định: {decision}. Hủy nhánh suy đoán '{loser}'.")
+
+    try:
+        winner_state = branch_futures[decision].result()
+    except Exception as e:
+        print(f"LỖI trong nhánh suy đoán '{decision}': {e}. Chạy lại theo cách thông thường.")
+        budget.record(decision, won=False, loser_done=loser_done, saved=0.0)
+        state["decision"] = decision
+        return state
+
+    budget.record(decision, won=True, loser_done=loser_done, saved=router_latency)
+    winner_state["decision"] = decision
+    winner_state["speculated"] = True
+    return winner_state
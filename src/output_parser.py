@@ -1,4 +1,5 @@
 import ast
+import json
 import re
 from typing import (
     Any,
@@ -181,4 +182,108 @@ class LLMCompilerPlanParser(BaseTransformOutputParser[dict], extra="allow"):
             )
             thought = None
         # Else it is just dropped
-        return task, thought
\ No newline at end of file
+        return task, thought
+
+### Incremental JSON parsing for streamed structured output
+
+_JSON_WHITESPACE = " \t\n\r"
+_SCALAR_END = ",}]" + _JSON_WHITESPACE
+
+
+class _Frame:
+    __slots__ = ("is_object", "slot", "start", "path", "expect_key")
+
+    def __init__(self, is_object: bool, start: int, path: Tuple):
+        self.is_object = is_object
+        # Current key of an object / index of an array
+        self.slot: Union[str, int, None] = None if is_object else -1
+        self.start = start
+        self.path = path
+        self.expect_key = is_object
+
+
+class StreamingJSONParser:
+    """Incremental parser for a JSON document that arrives in chunks.
+
+    `feed` scans only the new text and returns events for what it completed:
+
+    - ``("value", path, value)`` when a value (scalar, string, object or array) closes.
+    - ``("string_delta", path, text)`` with the decoded characters of a string value
+      received in this chunk, before the string closes.
+
+    `path` is the tuple of object keys and array indices from the root, e.g.
+    ``("action", 0)`` for the first element of the ``action`` list.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._stack: List[_Frame] = []
+        self._string: Optional[Dict[str, Any]] = None
+        self._scalar: Optional[Tuple[int, Tuple]] = None
+
+    def _begin_value(self) -> Tuple:
+        if self._stack and not self._stack[-1].is_object:
+            self._stack[-1].slot += 1
+        return tuple(frame.slot for frame in self._stack)
+
+    def feed(self, chunk: str) -> List[Tuple[str, Tuple, Any]]:
+        events: List[Tuple[str, Tuple, Any]] = []
+        offset = len(self.text)
+        self.text += chunk
+        for i in range(offset, len(self.text)):
+            c = self.text[i]
+            string = self._string
+            if string is not None:
+                if string["escape"] is not None:
+                    string["escape"] += c
+                    if string["escape"][1] == "u" and len(string["escape"]) < 6:
+                        continue
+                    string["delta"].append(json.loads('"' + string["escape"] + '"'))
+                    string["escape"] = None
+                elif c == "\\":
+                    string["escape"] = c
+                elif c == '"':
+                    value = json.loads(self.text[string["start"]:i + 1])
+                    self._string = None
+                    if string["is_key"]:
+                        self._stack[-1].slot = value
+                    else:
+                        if string["delta"]:
+                            events.append(("string_delta", string["path"], "".join(string["delta"])))
+                        events.append(("value", string["path"], value))
+                else:
+                    string["delta"].append(c)
+                continue
+
+            if self._scalar is not None:
+                if c not in _SCALAR_END:
+                    continue
+                start, path = self._scalar
+                self._scalar = None
+                events.append(("value", path, json.loads(self.text[start:i])))
+
+            if c in _JSON_WHITESPACE:
+                continue
+            if c == ",":
+                if self._stack and self._stack[-1].is_object:
+                    self._stack[-1].expect_key = True
+            elif c == ":":
+                self._stack[-1].expect_key = False
+            elif c in "}]":
+                frame = self._stack.pop()
+                events.append(("value", frame.path, json.loads(self.text[frame.start:i + 1])))
+            elif c == '"':
+                is_key = bool(self._stack) and self._stack[-1].is_object and self._stack[-1].expect_key
+                path = None if is_key else self._begin_value()
+                self._string = {"start": i, "is_key": is_key, "path": path, "escape": None, "delta": []}
+            elif c in "{[":
+                path = self._begin_value()
+                self._stack.append(_Frame(c == "{", i, path))
+            else:
+                self._scalar = (i, self._begin_value())
+
+        # Flush the part of an open string value received in this chunk
+        if self._string is not None and not self._string["is_key"] and self._string["delta"]:
+            events.append(("string_delta", self._string["path"], "".join(self._string["delta"])))
+            self._string["delta"] = []
+        return events
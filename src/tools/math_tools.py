@@ -1,33 +1,112 @@
 from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, field_validator
-import sympy as sp
+from functools import lru_cache
+from typing import List, Union
+import ast
+import operator
+import re
 
 _TOOL_DESCRIPTION = (
-    "evaluate_expression(expression: str) -> float:\n"
-    " - Evaluates a mathematical expression (e.g., '(1 + 2) * 3 / 4') involving addition (+), subtraction (-), multiplication (*), division (/), and parentheses.\n"
+    "evaluate_expression(expression: str | list[str]) -> float | list:\n"
+    " - Evaluates a mathematical expression (e.g., '(1 + 2) * 3 / 4') involving addition (+), subtraction (-), multiplication (*), division (/), powers (**), and parentheses.\n"
     " - Supports numbers (e.g., '1', '3.14') and percentages (e.g., '110%' -> 1.1).\n"
     " - Returns the result as a float.\n"
+    " - Accepts a list of expressions to evaluate them in one call; returns a list with one float (or error message) per expression.\n"
 )
 
+# Memoized results of the most recent distinct expressions
+EXPRESSION_CACHE_SIZE = 4096
+# Integer powers whose result would exceed this many bits are rejected before they are computed.
+# Nested powers like '9**999**2' are checked at every level, so no chain can hang on a huge integer;
+# anything this large overflows float anyway.
+MAX_POWER_RESULT_BITS = 100_000
+
+_PERCENT_PATTERN = re.compile(r'\d+(?:\.\d+)?%')
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+    ast.BitXor: operator.pow,  # sympify reads '^' as a power too
+}
+
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
 class MathExpressionInput(BaseModel):
-    expression: str
+    expression: Union[str, List[str]]
 
     @field_validator('expression')
     def validate_expression(cls, value):
-        if not value.strip():
+        expressions = [value] if isinstance(value, str) else value
+        if not expressions or any(not e.strip() for e in expressions):
             raise ValueError("Expression cannot be empty")
         return value
 
-def evaluate_expression(expression: str) -> float:
+
+class _NotNumeric(Exception):
+    """The expression is not plain arithmetic and needs sympy."""
+
+
+def _check_power_size(base: Union[int, float], exponent: Union[int, float]):
+    # Float powers overflow quickly on their own; only exact integer powers can grow without bound
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        if abs(base).bit_length() * exponent > MAX_POWER_RESULT_BITS:
+            raise OverflowError("result too large")
+
+
+def _eval_node(node: ast.AST) -> Union[int, float]:
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left, right = _eval_node(node.left), _eval_node(node.right)
+        if isinstance(node.op, (ast.Pow, ast.BitXor)):
+            _check_power_size(left, right)
+        return _BINARY_OPERATORS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_eval_node(node.operand))
+    raise _NotNumeric()
+
+
+def _fast_eval(expression: str) -> float:
     """
-    Evaluate a mathematical expression.
-    Example: '(1 + 2) * 3 / 4' -> 2.25
+    Evaluate plain arithmetic by walking the Python AST. Only numeric literals and
+    + - * / ** ^ and parentheses are accepted; anything else raises _NotNumeric.
     """
-    inputs = MathExpressionInput(expression=expression)
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError:
+        raise _NotNumeric()
+    result = _eval_node(tree.body)
+    if isinstance(result, complex):
+        raise _NotNumeric()
+    return float(result)
+
+
+def _sympy_eval(expression: str) -> float:
+    # Imported here so that sympy is only loaded for symbolic input
+    import sympy as sp
+
+    try:
+        result = sp.sympify(expression, evaluate=True)
+        return float(result)
+    except sp.SympifyError:
+        raise ValueError(f"Invalid expression: {expression}")
+    except ZeroDivisionError:
+        raise ValueError("Division by zero is not allowed")
+    except Exception as e:
+        raise ValueError(f"Error evaluating expression: {str(e)}")
 
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def _evaluate(expression: str) -> float:
     # Replace percentages (e.g., '110%' -> 1.1)
-    import re
-    for perc in re.findall(r'\d+%', expression):
+    for perc in _PERCENT_PATTERN.findall(expression):
         try:
             resolved_value = str(float(perc[:-1]) / 100.0)
             expression = expression.replace(perc, resolved_value)
@@ -35,19 +114,37 @@ def evaluate_expression(expression: str) -> float:
             raise ValueError(f"Invalid percentage format: {perc}")
 
     try:
-        result = sp.sympify(expression, evaluate=True)
-        return float(result)
-    except sp.SympifyError:
-        raise ValueError(f"Invalid expression: {expression}")
+        return _fast_eval(expression)
+    except _NotNumeric:
+        return _sympy_eval(expression)
     except ZeroDivisionError:
         raise ValueError("Division by zero is not allowed")
-    except Exception as e:
+    except (OverflowError, ValueError) as e:
         raise ValueError(f"Error evaluating expression: {str(e)}")
 
+
+def evaluate_expression(expression: Union[str, List[str]]) -> Union[float, List[Union[float, str]]]:
+    """
+    Evaluate a mathematical expression, or a list of them.
+    Example: '(1 + 2) * 3 / 4' -> 2.25
+    """
+    inputs = MathExpressionInput(expression=expression)
+
+    if isinstance(inputs.expression, str):
+        return _evaluate(inputs.expression)
+
+    results = []
+    for item in inputs.expression:
+        try:
+            results.append(_evaluate(item))
+        except ValueError as e:
+            results.append(f"Error: {e}")
+    return results
+
 def get_math_tool():
     return StructuredTool.from_function(
         name="evaluate_expression",
         func=evaluate_expression,
         description=_TOOL_DESCRIPTION,
         args_schema=MathExpressionInput
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,232 @@
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from ..model.llm import _EVENT_LOOP
+from .sandbox_worker import SandboxError, SandboxMemoryError, SandboxTimeout, worker_main
+
+# How often a busy worker's result pipe and memory are checked
+POLL_INTERVAL = 0.05
+# How long a new worker may take to start and import its preload modules
+STARTUP_TIMEOUT = 60.0
+# Threads for IO tools; a call that times out keeps its thread until it returns
+IO_MAX_WORKERS = 32
+
+_IO_EXECUTOR = ThreadPoolExecutor(max_workers=IO_MAX_WORKERS, thread_name_prefix="io-tool")
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of a process, or None where /proc is not available."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _Worker:
+    def __init__(self, ctx, preload: Iterable[str]):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=worker_main, args=(child_conn, tuple(preload)), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self) -> bool:
+        # Startup (imports) does not count against the time limit of the first call
+        if not self.ready and self.conn.poll(STARTUP_TIMEOUT):
+            self.ready = self.conn.recv() == "ready"
+        return self.ready
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class ProcessSandbox:
+    """
+    Pre-forked pool of worker processes for CPU-heavy tools.
+
+    Each call runs in an idle worker under a wall-clock limit and an RSS limit. A worker
+    that exceeds either, or dies, is killed and replaced by a fresh one, so a pathological
+    call costs one worker restart instead of a thread blocked forever. Waiting for an idle
+    worker counts against the call's time limit. `fn` and its arguments must be picklable
+    (for example a module-level function).
+
+    Args:
+        num_workers (int): Number of worker processes.
+        timeout (float): Default wall-clock limit per call, in seconds.
+        max_rss_mb (float, optional): RSS limit per worker in MiB. None disables the check.
+        preload (Iterable[str]): Modules every worker imports when it starts.
+        start_method (str, optional): multiprocessing start method. Defaults to "forkserver"
+            where available, else "spawn". Plain "fork" is unsafe here: the parent runs the LLM
+            event loop and several thread pools, and a child forked while another thread holds
+            a lock can deadlock on it.
+    """
+
+    def __init__(
+        self,
+        num_workers: int = 2,
+        timeout: float = 10.0,
+        max_rss_mb: Optional[float] = 512,
+        preload: Iterable[str] = (),
+        start_method: Optional[str] = None,
+    ):
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._ctx = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            # Workers, and respawns after a kill, fork from a server that already imported
+            # the dependency-free worker entry point and the preload modules
+            self._ctx.set_forkserver_preload([worker_main.__module__, *preload])
+        self.timeout = timeout
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024 if max_rss_mb is not None else None
+        self.preload = tuple(preload)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers = [_Worker(self._ctx, self.preload) for _ in range(num_workers)]
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.calls = 0
+        self.timeouts = 0
+        self.memory_kills = 0
+        self.crashes = 0
+        self.respawns = 0
+
+    def _respawn(self, worker: _Worker) -> _Worker:
+        worker.kill()
+        fresh = _Worker(self._ctx, self.preload)
+        with self._lock:
+            self._workers[self._workers.index(worker)] = fresh
+            self.respawns += 1
+        return fresh
+
+    def run(self, fn: Callable[..., Any], args: tuple = (), kwargs: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Any:
+        """Run `fn(*args, **kwargs)` in a worker and return its result or re-raise its exception."""
+        kwargs = kwargs or {}
+        if self._closed:
+            raise SandboxError("ProcessSandbox has been closed.")
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self.timeouts += 1
+            raise SandboxTimeout(f"No sandbox worker became free within the {timeout:g}s time limit.")
+        waited = time.monotonic() - start
+        with self._lock:
+            self.calls += 1
+        try:
+            try:
+                if not worker.wait_ready():
+                    raise OSError("worker did not start")
+                worker.conn.send((fn, args, kwargs))
+            except (BrokenPipeError, EOFError, OSError) as e:
+                with self._lock:
+                    self.crashes += 1
+                worker = self._respawn(worker)
+                raise SandboxError(f"Sandbox worker was not available: {e}")
+
+            # The wait for an idle worker counts, the worker's startup does not
+            deadline = time.monotonic() + timeout - waited
+            while not worker.conn.poll(POLL_INTERVAL):
+                if not worker.process.is_alive():
+                    with self._lock:
+                        self.crashes += 1
+                    worker = self._respawn(worker)
+                    raise SandboxError("Sandbox worker died during the call.")
+                if time.monotonic() >= deadline:
+                    with self._lock:
+                        self.timeouts += 1
+                    worker = self._respawn(worker)
+                    raise SandboxTimeout(f"Call exceeded the {timeout:g}s time limit.")
+                if self.max_rss_bytes is not None:
+                    rss = _rss_bytes(worker.process.pid)
+                    if rss is not None and rss > self.max_rss_bytes:
+                        with self._lock:
+                            self.memory_kills += 1
+                        worker = self._respawn(worker)
+                        raise SandboxMemoryError(f"Call exceeded the {self.max_rss_bytes // (1024 * 1024)} MiB memory limit.")
+
+            try:
+                ok, value = worker.conn.recv()
+            except EOFError:
+                with self._lock:
+                    self.crashes += 1
+                worker = self._respawn(worker)
+                raise SandboxError("Sandbox worker died during the call.")
+        finally:
+            self._idle.put(worker)
+
+        if ok:
+            return value
+        raise value
+
+    def close(self):
+        """Stop every worker."""
+        self._closed = True
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                worker.kill()
+
+    def __enter__(self) -> "ProcessSandbox":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._workers),
+            "idle": self._idle.qsize(),
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "memory_kills": self.memory_kills,
+            "crashes": self.crashes,
+            "respawns": self.respawns,
+        }
+
+
+async def _arun_io(fn: Callable[..., Any], args: tuple, timeout: float) -> Any:
+    loop = asyncio.get_running_loop()
+    call = contextvars.copy_context().run
+    return await asyncio.wait_for(loop.run_in_executor(_IO_EXECUTOR, call, fn, *args), timeout)
+
+
+def run_io(fn: Callable[..., Any], *args: Any, timeout: float) -> Any:
+    """
+    Run a blocking IO call under an asyncio timeout on the shared event loop.
+    On timeout the caller gets SandboxTimeout right away; the call itself finishes in the
+    background on the IO thread pool.
+    """
+    try:
+        return _EVENT_LOOP.run(_arun_io(fn, args, timeout))
+    except asyncio.TimeoutError:
+        raise SandboxTimeout(f"Call exceeded the {timeout:g}s time limit.")
+
+
+_default_sandbox: Optional[ProcessSandbox] = None
+_default_sandbox_lock = threading.Lock()
+
+
+def get_sandbox() -> ProcessSandbox:
+    """The process-wide sandbox for CPU-heavy tools, started on first use."""
+    global _default_sandbox
+    with _default_sandbox_lock:
+        if _default_sandbox is None:
+            _default_sandbox = ProcessSandbox(preload=(f"{__package__}.math_tools",))
+        return _default_sandbox
@@ -0,0 +1,46 @@
+"""
+Entry point of the ProcessSandbox worker processes.
+
+Kept free of project and third-party imports: the forkserver imports this module once
+and every worker is forked from it, so anything imported here is carried by all of them.
+The modules a worker needs for its calls are listed in the sandbox's `preload`.
+"""
+import signal
+from typing import Iterable
+
+
+class SandboxError(Exception):
+    """A sandboxed call did not produce a result."""
+
+
+class SandboxTimeout(SandboxError):
+    """The call exceeded its wall-clock limit and its worker was killed."""
+
+
+class SandboxMemoryError(SandboxError):
+    """The call exceeded the RSS limit and its worker was killed."""
+
+
+def worker_main(conn, preload: Iterable[str]):
+    # Ctrl+C in the parent must not kill the workers mid-call
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for module in preload:
+        __import__(module)
+    conn.send("ready")
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        fn, args, kwargs = job
+        try:
+            result = (True, fn(*args, **kwargs))
+        except BaseException as e:
+            result = (False, e)
+        try:
+            conn.send(result)
+        except Exception as e:
+            # Unpicklable result or exception
+            conn.send((False, SandboxError(f"Cannot send the result back: {e!r}")))
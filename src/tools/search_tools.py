@@ -5,7 +5,14 @@ from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field
 from tavily import TavilyClient
 import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from ..utils.cache import MISSING, LRUTTLCache, SQLiteCache, SingleFlight, TieredCache
+from ..utils.helper import estimate_tokens, truncate_to_tokens
 
 # Load variables from .env file
 load_dotenv()
@@ -18,6 +25,78 @@ except KeyError:
     raise Exception("Lỗi: Biến môi trường TAVILY_API_KEY chưa được thiết lập. Vui lòng thêm API key của bạn.")
 
 
+# Các truy vấn của search_web_batch chạy song song trên cùng một session HTTP của client
+SEARCH_POOL_SIZE = 8
+_search_session = getattr(tavily_client, "session", None)
+if _search_session is not None:
+    _search_adapter = HTTPAdapter(pool_connections=SEARCH_POOL_SIZE, pool_maxsize=SEARCH_POOL_SIZE)
+    _search_session.mount("https://", _search_adapter)
+    _search_session.mount("http://", _search_adapter)
+_SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=SEARCH_POOL_SIZE, thread_name_prefix="search")
+
+
+# --- 1b. Cache kết quả tìm kiếm ---
+# Kết quả được lưu theo truy vấn đã chuẩn hóa + tham số tìm kiếm, trong một tầng LRU/TTL trên bộ nhớ
+# và một tầng SQLite tùy chọn (bật bằng biến môi trường SEARCH_CACHE_PATH).
+# Các truy vấn giống nhau đang chạy đồng thời được gộp thành một lần gọi Tavily.
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "900"))
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH")
+
+_search_flight = SingleFlight()
+_search_stats_lock = threading.Lock()
+_search_stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+
+def configure_search_cache(maxsize: int = SEARCH_CACHE_SIZE, ttl: Optional[float] = SEARCH_CACHE_TTL, path: Optional[str] = SEARCH_CACHE_PATH) -> TieredCache:
+    """Thay cache tìm kiếm của module (ví dụ để đổi TTL hoặc bật tầng đĩa)."""
+    global search_cache
+    disk = SQLiteCache(path, ttl=ttl, table="search_results") if path else None
+    search_cache = TieredCache(LRUTTLCache(maxsize=maxsize, ttl=ttl), disk)
+    return search_cache
+
+
+search_cache = configure_search_cache()
+
+
+def _count(name: str):
+    with _search_stats_lock:
+        _search_stats[name] += 1
+
+
+def _search_key(query: str, **params: Any) -> str:
+    # Chuẩn hóa: không phân biệt hoa thường và khoảng trắng thừa
+    normalized = " ".join(query.lower().split())
+    return json.dumps({"query": normalized, **params}, sort_keys=True, ensure_ascii=False)
+
+
+def cached_search(query: str, **params: Any) -> Dict[str, Any]:
+    """Gọi `tavily_client.search(query, **params)` qua cache và gộp các truy vấn trùng đang chạy."""
+    key = _search_key(query, **params)
+    result = search_cache.get(key)
+    if result is not MISSING:
+        _count("hits")
+        return result
+
+    def fetch() -> Dict[str, Any]:
+        fresh = tavily_client.search(query=query, **params)
+        search_cache.set(key, fresh)
+        return fresh
+
+    result, shared = _search_flight.do(key, fetch)
+    _count("coalesced" if shared else "misses")
+    return result
+
+
+def get_search_cache_stats() -> Dict[str, Any]:
+    """Số lần trúng cache, trượt cache (gọi Tavily) và gộp truy vấn, cùng thống kê của từng tầng cache."""
+    with _search_stats_lock:
+        stats: Dict[str, Any] = dict(_search_stats)
+    stats["tiers"] = search_cache.stats()
+    return stats
+
+
 # --- 2. Cập nhật Mô tả và Schema cho công cụ ---
 
 # Mô tả này ngắn gọn và rõ ràng hơn cho LLM.
@@ -40,8 +119,8 @@ def search_web(query: str) -> str:
     
     try:
         # Gọi API của Tavily. Bạn có thể tùy chỉnh các tham số khác như max_results.
-        search_results = tavily_client.search(
-            query=query, 
+        search_results = cached_search(
+            query, 
             search_depth="basic", # "basic" cho tốc độ, "advanced" cho chi tiết
             max_results=3
         )
@@ -62,6 +141,83 @@ def search_web(query: str) -> str:
     return formatted_results
 
 
+# --- 3b. Tìm kiếm nhiều truy vấn cùng lúc ---
+
+# Ngân sách token mặc định cho quan sát của search_web_batch
+SEARCH_TOKEN_BUDGET = 1500
+
+_BATCH_TOOL_DESCRIPTION = (
+    "Tìm kiếm nhiều truy vấn liên quan cùng lúc trên internet. Các kết quả trùng lặp được gộp lại "
+    "và kết quả được rút gọn. Dùng thay cho nhiều lệnh gọi search_web riêng lẻ."
+)
+
+class BatchSearchInput(BaseModel):
+    queries: List[str] = Field(description="Danh sách các câu truy vấn tìm kiếm rõ ràng và cụ thể.")
+
+
+def _normalize_url(url: str) -> str:
+    return url.strip().rstrip("/").lower()
+
+
+def search_web_batch(queries: List[str], max_results: int = 3, token_budget: int = SEARCH_TOKEN_BUDGET) -> str:
+    """
+    Chạy nhiều truy vấn Tavily song song, gộp kết quả theo URL và rút gọn quan sát
+    cho vừa `token_budget` token.
+    """
+    # Bỏ các truy vấn trùng (sau chuẩn hóa), giữ thứ tự
+    unique_queries: Dict[str, str] = {}
+    for q in queries:
+        if q.strip():
+            unique_queries.setdefault(_search_key(q), q)
+    unique_queries = list(unique_queries.values())
+    print(f"--- Đang thực thi Công cụ Tìm kiếm Tavily với {len(unique_queries)} truy vấn: {unique_queries} ---")
+    if not unique_queries:
+        return "Không có truy vấn tìm kiếm nào."
+
+    futures = [
+        _SEARCH_EXECUTOR.submit(cached_search, q, search_depth="basic", max_results=max_results)
+        for q in unique_queries
+    ]
+    per_query, errors = [], []
+    for query, future in zip(unique_queries, futures):
+        try:
+            per_query.append(future.result().get("results", []))
+        except Exception as e:
+            errors.append(f"Đã xảy ra lỗi khi gọi Tavily API cho truy vấn '{query}': {e}")
+            per_query.append([])
+
+    # Xen kẽ theo thứ hạng (kết quả tốt nhất của mỗi truy vấn trước), bỏ URL trùng
+    merged, seen = [], set()
+    for rank in range(max((len(r) for r in per_query), default=0)):
+        for results in per_query:
+            if rank < len(results):
+                url = _normalize_url(results[rank].get("url", "N/A"))
+                if url not in seen:
+                    seen.add(url)
+                    merged.append(results[rank])
+
+    if not merged:
+        return "\n".join(errors) or "Không tìm thấy kết quả nào từ Tavily."
+
+    # Thêm kết quả cho đến khi hết ngân sách token; kết quả cuối có thể bị cắt bớt
+    blocks, used = list(errors), sum(estimate_tokens(e) for e in errors)
+    kept = 0
+    for res in merged:
+        block = f"Nguồn: {res.get('url', 'N/A')}\nNội dung: {res.get('content', '')}"
+        remaining = token_budget - used
+        if estimate_tokens(block) > remaining:
+            if remaining >= 50:
+                blocks.append(truncate_to_tokens(block, remaining))
+                kept += 1
+            break
+        blocks.append(block)
+        used += estimate_tokens(block) + 1
+        kept += 1
+    if kept < len(merged):
+        blocks.append(f"(Đã lược bớt {len(merged) - kept} kết quả để giữ trong giới hạn token.)")
+    return "\n\n".join(blocks)
+
+
 # --- 4. Hàm get_search_tool không thay đổi ---
 
 def get_search_tool():
@@ -71,4 +227,13 @@ def get_search_tool():
         func=search_web,
         description=_TOOL_DESCRIPTION,
         args_schema=SearchInput
-    )
\ No newline at end of file
+    )
+
+def get_batch_search_tool():
+    """Trả về một StructuredTool để tìm kiếm nhiều truy vấn cùng lúc bằng Tavily."""
+    return StructuredTool.from_function(
+        name="search_web_batch",
+        func=search_web_batch,
+        description=_BATCH_TOOL_DESCRIPTION,
+        args_schema=BatchSearchInput
+    )
@@ -1,7 +1,200 @@
+import operator
 import re
-from typing import List
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
-def convert_to_markdown_table(data: dict) -> str:
+import numpy as np
+
+from .cache import LRUTTLCache
+
+# Rough characters-per-token ratio used when no tokenizer is at hand
+CHARS_PER_TOKEN = 3
+
+def estimate_tokens(text: str, tokenizer: Any = None) -> int:
+    """
+    Estimates the number of tokens in a text, for budgeting what goes into a prompt.
+
+    Args:
+        text (str): The text to measure.
+        tokenizer (optional): A tokenizer with an `encode` method (e.g. the model's
+            Hugging Face tokenizer). Without one, the count is approximated from the length.
+
+    Returns:
+        int: The approximate token count.
+    """
+    if tokenizer is not None:
+        try:
+            return len(tokenizer.encode(text, add_special_tokens=False))
+        except TypeError:
+            return len(tokenizer.encode(text))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = "…") -> str:
+    """
+    Truncates a text to roughly `max_tokens` tokens, cutting at a word boundary when possible.
+
+    Args:
+        text (str): The text to truncate.
+        max_tokens (int): The token budget.
+        marker (str): Appended when the text was cut.
+
+    Returns:
+        str: The text itself if it fits, otherwise its truncated prefix followed by `marker`.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(max_tokens * CHARS_PER_TOKEN - len(marker), 0)
+    cut = text[:limit]
+    if " " in cut[limit // 2:]:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip() + marker
+
+# Rows whose cost decides how many columns fit in a budget
+COLUMN_SAMPLE_ROWS = 20
+# Rows a budgeted table should still be able to show after column pruning
+MIN_TABLE_ROWS = 5
+# Share of the row budget kept for the last rows of a table that does not fit
+TAIL_ROW_SHARE = 1 / 3
+
+def _markdown_row(cells, max_cell_chars: Optional[int] = None, marker: Optional[str] = None) -> str:
+    cells = [str(cell) for cell in cells]
+    if max_cell_chars is not None:
+        cells = [cell if len(cell) <= max_cell_chars else cell[:max(max_cell_chars - 1, 0)] + "…" for cell in cells]
+    if marker is not None:
+        cells.append(marker)
+    return "| " + " | ".join(cells) + " |"
+
+def iter_markdown_table(
+    data: dict,
+    max_tokens: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    tokenizer: Any = None,
+    max_columns: Optional[int] = None,
+    max_cell_chars: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Renders a list-of-lists table as Markdown, yielding one line at a time.
+
+    Without limits the lines are exactly those of `convert_to_markdown_table`. With a
+    token and/or character budget the table is cut down to fit:
+
+    1. Columns are pruned from the right (the first, label column is always kept) until
+       the header and MIN_TABLE_ROWS typical rows fit; the header then ends with a
+       "… (+N columns)" cell.
+    2. Rows are taken from the top and, with TAIL_ROW_SHARE of the budget, from the
+       bottom; the rows in between are replaced by one "… (N rows omitted)" line.
+
+    The header and separator are always emitted. Rows are rendered and measured lazily,
+    so a large table is never built in memory as a whole.
+
+    Args:
+        data (dict): A dictionary with a key "table", as for `convert_to_markdown_table`.
+        max_tokens (int, optional): Token budget, measured with `tokenizer` if given,
+            otherwise estimated from the length.
+        max_chars (int, optional): Character budget, newlines included.
+        tokenizer (optional): The model's tokenizer, used to measure tokens exactly.
+        max_columns (int, optional): Maximum number of columns, label column included.
+        max_cell_chars (int, optional): Longer cells are cut and end with "…".
+
+    Yields:
+        str: The lines of the Markdown table, without trailing newlines.
+    """
+    if not isinstance(data, dict) or "table" not in data or not data["table"]:
+        return
+
+    table_data = data["table"]
+    header = list(table_data[0])
+    rows = table_data[1:]
+    budgeted = max_tokens is not None or max_chars is not None
+    budget = (max_tokens or 0, max_chars or 0)
+
+    def cost(line: str) -> Tuple[int, int]:
+        return (estimate_tokens(line, tokenizer) + 1 if max_tokens is not None else 0, len(line) + 1)
+
+    def within(total: Tuple[int, int], limit: Tuple[int, int]) -> bool:
+        return (max_tokens is None or total[0] <= limit[0]) and (max_chars is None or total[1] <= limit[1])
+
+    def add(used: Tuple[int, int], extra: Tuple[int, int]) -> Tuple[int, int]:
+        return (used[0] + extra[0], used[1] + extra[1])
+
+    def header_lines(num_columns: int) -> Tuple[str, str]:
+        hidden = len(header) - num_columns
+        marker = f"… (+{hidden} columns)" if hidden else None
+        return _markdown_row(header[:num_columns], max_cell_chars, marker), _markdown_row(["---"] * (num_columns + bool(hidden)))
+
+    # 1. Column pruning
+    num_columns = len(header)
+    if max_columns is not None:
+        num_columns = min(num_columns, max(max_columns, 1))
+    if budgeted:
+        sample = rows[:COLUMN_SAMPLE_ROWS]
+        while num_columns > 1:
+            used = (0, 0)
+            for line in header_lines(num_columns):
+                used = add(used, cost(line))
+            if sample:
+                sample_costs = [cost(_markdown_row(row[:num_columns], max_cell_chars)) for row in sample]
+                typical = (-(-sum(c[0] for c in sample_costs) // len(sample)), -(-sum(c[1] for c in sample_costs) // len(sample)))
+                min_rows = min(MIN_TABLE_ROWS, len(rows))
+                used = add(used, (typical[0] * min_rows, typical[1] * min_rows))
+            if within(used, budget):
+                break
+            num_columns -= 1
+    hidden_columns = len(header) - num_columns
+
+    # 2. Header
+    header_line, separator_line = header_lines(num_columns)
+    yield header_line
+    yield separator_line
+
+    def render(row) -> str:
+        return _markdown_row(row[:num_columns] if hidden_columns else row, max_cell_chars)
+
+    if not budgeted:
+        for row in rows:
+            yield render(row)
+        return
+
+    used = add(cost(header_line), cost(separator_line))
+
+    # 3. Rows from the bottom, within their share of what is left
+    marker_cost = cost(f"| … ({len(rows)} rows omitted) |")
+    tail_budget = (int((budget[0] - used[0]) * TAIL_ROW_SHARE), int((budget[1] - used[1]) * TAIL_ROW_SHARE))
+    tail: List[str] = []
+    tail_used = (0, 0)
+    tail_start = len(rows)
+    while tail_start > 0:
+        line = render(rows[tail_start - 1])
+        total = add(tail_used, cost(line))
+        if not within(total, tail_budget):
+            break
+        tail.append(line)
+        tail_used = total
+        tail_start -= 1
+    tail.reverse()
+    used = add(used, tail_used)
+
+    # 4. Rows from the top, streamed, keeping room for the omission marker
+    position = 0
+    while position < tail_start:
+        line = render(rows[position])
+        line_cost = cost(line)
+        if not within(add(used, add(line_cost, marker_cost)), budget):
+            break
+        yield line
+        used = add(used, line_cost)
+        position += 1
+
+    if position < tail_start:
+        yield f"| … ({tail_start - position} rows omitted) |"
+    yield from tail
+
+def convert_to_markdown_table(
+    data: dict,
+    max_tokens: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    tokenizer: Any = None,
+) -> str:
     """
     Converts a dictionary containing a list-of-lists table into a Markdown table string.
 
@@ -11,77 +204,384 @@ def convert_to_markdown_table(data: dict) -> str:
     Args:
         data (dict): A dictionary with a key "table".
                      e.g., {"table": [["h1", "h2"], ["r1c1", "r1c2"]]}
+        max_tokens (int, optional): Token budget; see `iter_markdown_table`.
+        max_chars (int, optional): Character budget; see `iter_markdown_table`.
+        tokenizer (optional): The model's tokenizer, used to measure tokens exactly.
 
     Returns:
         str: A string containing the formatted Markdown table. Returns an empty string
              if the input is invalid or the table is empty.
     """
-    # 1. Validate input and extract the table data
-    if not isinstance(data, dict) or "table" not in data or not data["table"]:
-        return ""
-
-    table_data = data["table"]
-    # 2. Separate header from the rest of the rows
-    header = table_data[0]
-    rows = table_data[1:]
-    num_columns = len(header)
-
+    return "\n".join(iter_markdown_table(data, max_tokens=max_tokens, max_chars=max_chars, tokenizer=tokenizer))
+
+_NUMBER_PATTERN = re.compile(r'-?[\d,]+(?:\.\d+)?(?:\s*[%$KMBT]|\s*[a-zA-Z]+)?')
+_NON_NUMERIC = re.compile(r'[^\d.-]')
+# Arguments that float() parses exactly like the pattern above
+_PLAIN_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+# Parsed tables kept for reuse, keyed by table content
+TABLE_CACHE_SIZE = 256
+_MISSING_CELLS = ("NA", "-", "")
+
+def _parse_cell(item) -> float:
+    """Parses a table cell into a float, or NaN for a missing or non-numeric cell."""
+    if item is None:
+        return np.nan
+    s_item = str(item).strip()
+    if s_item in _MISSING_CELLS:
+        return np.nan
+    match = _NUMBER_PATTERN.search(s_item)
+    if match:
+        try:
+            return float(_NON_NUMERIC.sub('', match.group(0)))
+        except ValueError:
+            pass
+    return np.nan
 
-    
-    # 3. Build the Markdown header line
-    # Example: | Header 1 | Header 2 |
-    header_line = "| " + " | ".join(str(cell) for cell in header) + " |"
+class ParsedTable:
+    """
+    A table parsed once for the table_* operations.
 
-    # 4. Build the Markdown separator line
-    # Example: |----------|----------|
-    separator_line = "| " + " | ".join(["---"] * num_columns) + " |"
+    Holds a case-insensitive index from row label to row, and the numeric cells of every
+    row in one NumPy array, with a mask of the cells that hold a number. Reductions are
+    computed for all rows at once, on first use, so each table operation is a lookup.
 
-    # 5. Build the data row lines
-    row_lines = []
-    for row in rows:
-        # Ensure all cells are strings for the join operation
-        row_str = [str(cell) for cell in row]
-        row_lines.append("| " + " | ".join(row_str) + " |")
+    Args:
+        table_data (List[List]): Table data. First row is header, subsequent rows are data.
+    """
 
-    # 6. Combine all parts into the final table string
-    markdown_table = [header_line, separator_line] + row_lines
+    __slots__ = ('index', 'values', 'mask', 'counts', 'has_cells', '_reductions')
+
+    def __init__(self, table_data: List[List]):
+        rows = [row for row in table_data[1:] if row]
+        self.index: Dict[str, int] = {}
+        for position, row in enumerate(rows):
+            # The first row with a label wins, as in a top-down scan
+            self.index.setdefault(str(row[0]).strip().lower(), position)
+
+        width = max((len(row) - 1 for row in rows), default=0)
+        self.values = np.full((len(rows), width), np.nan)
+        for position, row in enumerate(rows):
+            self.values[position, :len(row) - 1] = [_parse_cell(item) for item in row[1:]]
+        self.mask = ~np.isnan(self.values)
+        self.counts = self.mask.sum(axis=1)
+        self.has_cells = np.array([len(row) > 1 for row in rows], dtype=bool)
+        self._reductions: Dict[str, np.ndarray] = {}
+
+    def _row(self, row_identifier: str) -> int:
+        position = self.index.get(row_identifier.strip().lower())
+        if position is None or not self.has_cells[position]:
+            raise ValueError(f"Metric row identifier '{row_identifier}' not found in the table.")
+        if not self.counts[position]:
+            raise ValueError(f"No numeric data found for metric row '{row_identifier}'.")
+        return position
+
+    def row_values(self, row_identifier: str) -> np.ndarray:
+        """
+        Returns the numeric values of a row, in column order.
+
+        Args:
+            row_identifier (str): The row label, matched case-insensitively.
+
+        Returns:
+            np.ndarray: The row's numeric cells, with missing cells left out.
+        """
+        position = self._row(row_identifier)
+        return self.values[position][self.mask[position]]
+
+    def _reduction(self, func_name: str) -> np.ndarray:
+        reduced = self._reductions.get(func_name)
+        if reduced is None:
+            if func_name == 'table_max':
+                reduced = np.where(self.mask, self.values, -np.inf).max(axis=1, initial=-np.inf)
+            elif func_name == 'table_min':
+                reduced = np.where(self.mask, self.values, np.inf).min(axis=1, initial=np.inf)
+            else:
+                # cumsum adds left to right like sum(), so totals match it exactly
+                filled = np.where(self.mask, self.values, 0.0)
+                reduced = filled.cumsum(axis=1)[:, -1] + 0.0 if filled.shape[1] else np.zeros(len(filled))
+                if func_name == 'table_average':
+                    reduced = reduced / np.maximum(self.counts, 1)
+            self._reductions[func_name] = reduced
+        return reduced
+
+    def reduce(self, func_name: str, row_identifier: str) -> float:
+        """
+        Applies a table function to a row.
+
+        Args:
+            func_name (str): One of table_max, table_min, table_sum, table_average.
+            row_identifier (str): The row label, matched case-insensitively.
+
+        Returns:
+            float: The reduced value.
+        """
+        return float(self._reduction(func_name)[self._row(row_identifier)])
+
+_TABLE_CACHE = LRUTTLCache(maxsize=TABLE_CACHE_SIZE)
+
+def parse_table(table_data: Union[ParsedTable, List[List]]) -> ParsedTable:
+    """
+    Parses table data into a ParsedTable, reusing the parsed table when the same content
+    was parsed before.
 
-    return "\n".join(markdown_table)
+    Args:
+        table_data (Union[ParsedTable, List[List]]): Table data, or an already parsed table.
 
-def _get_column_values(row_identifier: str, table_data: List[List]) -> List[float]:
-    """Helper function to extract numeric values from a specified row in the table."""
+    Returns:
+        ParsedTable: The parsed table.
+    """
+    if isinstance(table_data, ParsedTable):
+        return table_data
     if not table_data:
         raise ValueError("Table data not found. Cannot perform table operations.")
+    try:
+        key = tuple(tuple(row) for row in table_data)
+        hash(key)
+    except TypeError:
+        # Unhashable cells: parse without caching
+        return ParsedTable(table_data)
+    parsed = _TABLE_CACHE.get(key, None)
+    if parsed is None:
+        parsed = ParsedTable(table_data)
+        _TABLE_CACHE.set(key, parsed)
+    return parsed
+
+# Programs compiled by `compile_program` that are kept for reuse
+PROGRAM_CACHE_SIZE = 4096
+
+_TABLE_FUNCTIONS = ('table_max', 'table_min', 'table_sum', 'table_average')
+_DELIMITERS = re.compile(r'[(),]')
+# The common case: an arithmetic operation on references, constants and plain numbers
+_SIMPLE_ARG = r'\s*(#\d+|const_\d+(?:\.\d+)?|-?\d+(?:\.\d+)?)\s*'
+_SIMPLE_OPERATION = re.compile(r'\s*(add|subtract|multiply|divide)\(' + _SIMPLE_ARG + ',' + _SIMPLE_ARG + r'\)\s*(?:,|$)')
+
+def _divide(a, b):
+    if b == 0:
+        raise ValueError("Division by zero")
+    return a / b
+
+_ARITHMETIC = {
+    'add': operator.add,
+    'subtract': operator.sub,
+    'multiply': operator.mul,
+    'divide': _divide,
+}
+
+def _split_operations(program: str) -> List[str]:
+    """Splits a program on the commas that are not inside parentheses."""
+    operations = []
+    start = 0
+    paren_count = 0
+    for match in _DELIMITERS.finditer(program):
+        char = match.group()
+        if char == '(':
+            paren_count += 1
+        elif char == ')':
+            paren_count -= 1
+        elif paren_count == 0:
+            i = match.start()
+            if program[start:i].strip():
+                operations.append(program[start:i].strip())
+            start = i + 1
+    if program[start:].strip():
+        operations.append(program[start:].strip())
+    return operations
+
+def _parse_number(arg: str) -> float:
+    if _PLAIN_NUMBER.fullmatch(arg):
+        return float(arg)
+    try:
+        match = _NUMBER_PATTERN.search(arg)
+        if match:
+            number_str = match.group(0)
+            value = float(_NON_NUMERIC.sub('', number_str))
+            # Convert percentage to decimal if % is present
+            if '%' in number_str:
+                value = value / 100
+            return value
+        raise ValueError(f"Invalid number: {arg}")
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid number: {arg}")
+
+def _compile_operation(operation: str, position: int) -> tuple:
+    """Compiles one operation, given the number of operations before it, into an op tuple."""
+    if not ('(' in operation and ')' in operation):
+        raise ValueError(f"Invalid operation format: {operation}")
+
+    func_name = operation.split('(')[0].strip()
+    args_str = operation[operation.index('(')+1:operation.rindex(')')].strip()
+    args = [arg.strip() for arg in args_str.split(',') if arg.strip()] if args_str else []
+
+    if func_name in _TABLE_FUNCTIONS:
+        # Filter out 'none' (case-insensitive); the row identifier may contain spaces/parentheses
+        args = [arg for arg in args if arg.lower() != 'none']
+        return ('table', func_name, args[0].strip('"\'') if args else None)
+
+    operands = []
+    for arg in args:
+        if arg.startswith('#'):
+            index = int(arg[1:])
+            if index >= position:
+                raise ValueError(f"Invalid reference #{index}: only {position} results available")
+            if index < -position:
+                raise IndexError("list index out of range")
+            operands.append((True, index % position))
+        elif arg.startswith('const_'):
+            operands.append((False, float(arg.split("_")[1])))
+        else:
+            operands.append((False, _parse_number(arg)))
 
-    values_str = []
-    for row in table_data[1:]:
-        if row and row[0].strip().lower() == row_identifier.strip().lower():
-            values_str.extend(row[1:])
-            break
-    
-    if not values_str:
-         raise ValueError(f"Metric row identifier '{row_identifier}' not found in the table.")
-
-    values = []
-    number_pattern = re.compile(r'-?[\d,]+(?:\.\d+)?(?:\s*[%$KMBT]|\s*[a-zA-Z]+)?')
-    for item in values_str:
-        if item is None or str(item).strip() in ["NA", "-", ""]:
-            continue
+    if func_name not in _ARITHMETIC:
+        raise ValueError(f"Unknown function: {func_name}")
+    if len(operands) != 2:
+        raise ValueError(f"{func_name} requires exactly 2 arguments, got {len(operands)}")
+    return ('arith', func_name, tuple(operands))
+
+class CompiledProgram:
+    """
+    A program parsed once into a list of ops, ready to run many times.
+
+    Ops are ('arith', name, operands) with operands (is_reference, index_or_value),
+    ('table', name, row_identifier), or ('error', exception_type, message) for an
+    operation that failed to compile. Errors are raised when execution reaches them,
+    so a program fails with the same error, in the same order, as when it was
+    interpreted directly.
+
+    Programs with the same `shape` differ only in their constants and row identifiers,
+    which lets `execute_programs` run them together as NumPy column operations.
+    """
+
+    __slots__ = ('ops', '_shape', '_constants')
+
+    def __init__(self, ops: Tuple[tuple, ...]):
+        self.ops = ops
+        self._shape = self._constants = None
+
+    def _split_shape(self):
+        shape, constants = [], []
+        for op in self.ops:
+            kind = op[0]
+            if kind == 'arith':
+                # (name, reference or None, reference or None)
+                (ref_a, a), (ref_b, b) = op[2]
+                shape.append((op[1], a if ref_a else None, b if ref_b else None))
+                if not ref_a:
+                    constants.append(a)
+                if not ref_b:
+                    constants.append(b)
+            elif kind == 'table':
+                # (name, whether the row identifier is missing)
+                shape.append((op[1], op[2] is None))
+            else:
+                self._shape, self._constants = (), ()
+                return
+        self._shape, self._constants = tuple(shape), tuple(constants)
+
+    @property
+    def shape(self) -> Optional[tuple]:
+        """The program with constants and row identifiers left out, or None if it cannot compile."""
+        if self._shape is None:
+            self._split_shape()
+        return self._shape or None
+
+    @property
+    def constants(self) -> tuple:
+        """The numeric constants of the program, in order."""
+        if self._constants is None:
+            self._split_shape()
+        return self._constants
+
+    def table_value(self, op: tuple, table_data: Union[ParsedTable, List[List], None]) -> float:
+        _, func_name, row_identifier = op
+        if not table_data:
+            raise ValueError(f"Table data required for {func_name} function")
+        if row_identifier is None:
+            raise ValueError(f"{func_name} requires at least one argument (row_identifier)")
+        return parse_table(table_data).reduce(func_name, row_identifier)
+
+    def run(self, table_data: Union[ParsedTable, List[List], None] = None) -> float:
+        """
+        Runs the program.
+
+        Args:
+            table_data (Union[ParsedTable, List[List]], optional): Table data for table operations.
+
+        Returns:
+            float: The result of the last operation.
+        """
+        results = []
+        for op in self.ops:
+            kind = op[0]
+            if kind == 'arith':
+                (ref_a, a), (ref_b, b) = op[2]
+                results.append(_ARITHMETIC[op[1]](results[a] if ref_a else a, results[b] if ref_b else b))
+            elif kind == 'table':
+                if table_data and not isinstance(table_data, ParsedTable):
+                    # Parsed once per run, however many table operations the program has
+                    table_data = parse_table(table_data)
+                results.append(self.table_value(op, table_data))
+            else:
+                raise op[1](op[2])
+
+        if not results:
+            raise ValueError("No results generated")
+        return results[-1]
+
+def _compile_simple(program: str) -> Optional[Tuple[tuple, ...]]:
+    """Compiles a program made only of simple arithmetic operations in one regex pass, or returns None."""
+    ops = []
+    pos = 0
+    while pos < len(program):
+        match = _SIMPLE_OPERATION.match(program, pos)
+        if match is None:
+            return None
+        operands = []
+        for arg in match.group(2, 3):
+            if arg[0] == '#':
+                index = int(arg[1:])
+                if index >= len(ops):
+                    return None
+                operands.append((True, index))
+            elif arg[0] == 'c':
+                operands.append((False, float(arg[6:])))
+            else:
+                operands.append((False, float(arg)))
+        ops.append(('arith', match.group(1), tuple(operands)))
+        pos = match.end()
+    return tuple(ops) or None
+
+@lru_cache(maxsize=PROGRAM_CACHE_SIZE)
+def _compile_program(program: str) -> CompiledProgram:
+    simple = _compile_simple(program)
+    if simple is not None:
+        return CompiledProgram(simple)
+
+    operations = _split_operations(program.replace('\n', ' ').replace('\r', ' '))
+    if not operations:
+        raise ValueError("No valid operations found")
+
+    ops = []
+    for position, operation in enumerate(operations):
         try:
-            s_item = str(item).strip()
-            match = number_pattern.search(s_item)
-            if match:
-                number_str = match.group(0)
-                cleaned_str = re.sub(r'[^\d.-]', '', number_str)
-                value = float(cleaned_str)
-                values.append(value)
-        except (ValueError, TypeError):
-            continue
+            ops.append(_compile_operation(operation, position))
+        except (ValueError, IndexError) as e:
+            ops.append(('error', type(e), str(e)))
+    return CompiledProgram(tuple(ops))
 
-    if not values:
-        raise ValueError(f"No numeric data found for metric row '{row_identifier}'.")
+def compile_program(program: str) -> CompiledProgram:
+    """
+    Parses a program string in the exe_ans format into a CompiledProgram, memoized in an LRU cache.
 
-    return values
+    Args:
+        program (str): A program string with operations separated by commas.
+
+    Returns:
+        CompiledProgram: The compiled program.
+    """
+    if not program or not program.strip():
+        raise ValueError("Empty program")
+    return _compile_program(program)
 
 def execute_program(program, table_data=None):
     """
@@ -93,132 +593,89 @@ def execute_program(program, table_data=None):
                       or "table_max(P/E (x)), add(#0, const_10)"
         table_data (List[List], optional): Table data for table operations.
                                          First row is header, subsequent rows are data.
+                                         A ParsedTable from `parse_table` is accepted too.
 
     Returns:
         str: The final result as a string with 4 decimal places
     """
-
-    results = []
-
-    if not program or not program.strip():
-        raise ValueError("Empty program")
-
-    program = program.replace('\n', ' ').replace('\r', ' ')
-    operations = []
-    current_op = ""
-    paren_count = 0
-
-    for char in program:
-        if char == '(':
-            paren_count += 1
-            current_op += char
-        elif char == ')':
-            paren_count -= 1
-            current_op += char
-        elif char == ',' and paren_count == 0:
-            if current_op.strip():
-                operations.append(current_op.strip())
-            current_op = ""
+    return f"{compile_program(program).run(table_data):.4f}"
+
+def _run_group(members: List[Tuple[int, CompiledProgram]], tables: List[Optional[List[List]]], outputs: List[Any]):
+    """Runs programs of one shape together, one NumPy column per op."""
+    shape = members[0][1].shape
+    n = len(members)
+    constants = np.array([compiled.constants for _, compiled in members], dtype=float).reshape(n, -1)
+    errors: List[Optional[Exception]] = [None] * n
+    columns = []
+    next_constant = 0
+    # Programs of a batch often share their table, so each table is parsed once
+    parsed_tables: Dict[int, Any] = {}
+
+    for position, op_shape in enumerate(shape):
+        if op_shape[0] in _TABLE_FUNCTIONS:
+            column = np.full(n, np.nan)
+            for row, (i, compiled) in enumerate(members):
+                if errors[row] is None:
+                    table = tables[i]
+                    if table and not isinstance(table, ParsedTable):
+                        if id(table) not in parsed_tables:
+                            parsed_tables[id(table)] = parse_table(table)
+                        table = parsed_tables[id(table)]
+                    try:
+                        column[row] = compiled.table_value(compiled.ops[position], table)
+                    except ValueError as e:
+                        errors[row] = e
         else:
-            current_op += char
-
-    if current_op.strip():
-        operations.append(current_op.strip())
+            operands = []
+            for reference in op_shape[1:]:
+                if reference is None:
+                    operands.append(constants[:, next_constant])
+                    next_constant += 1
+                else:
+                    operands.append(columns[reference])
+            a, b = operands
+            if op_shape[0] == 'divide':
+                zero = b == 0
+                for row in np.flatnonzero(zero):
+                    if errors[row] is None:
+                        errors[row] = ValueError("Division by zero")
+                column = a / np.where(zero, 1.0, b)
+            else:
+                column = _ARITHMETIC[op_shape[0]](a, b)
+        columns.append(column)
 
-    if not operations:
-        raise ValueError("No valid operations found")
+    for row, (i, _) in enumerate(members):
+        outputs[i] = errors[row] if errors[row] is not None else f"{float(columns[-1][row]):.4f}"
 
-    for operation in operations:
-        if '(' in operation and ')' in operation:
-            func_name = operation.split('(')[0].strip()
-            args_str = operation[operation.index('(')+1:operation.rindex(')')].strip()
+def execute_programs(programs: List[str], table_data: Union[ParsedTable, List[List], None] = None, tables: Optional[List[Union[ParsedTable, List[List], None]]] = None) -> List[Union[str, Exception]]:
+    """
+    Executes a batch of programs. Programs are compiled (through the cache) and grouped by
+    shape; each group runs as vectorized NumPy operations across its programs.
 
-            if not args_str:
-                args = []
-            else:
-                if func_name in ['table_max', 'table_min', 'table_sum', 'table_average']:
-                    # Split args but preserve row identifier with spaces/parentheses
-                    args = [arg.strip() for arg in args_str.split(',') if arg.strip()]
-                    # Filter out 'none' (case-insensitive)
-                    args = [arg for arg in args if arg.lower() != 'none']
-                else:
-                    args = [arg.strip() for arg in args_str.split(',') if arg.strip()]
-
-            if func_name in ['table_max', 'table_min', 'table_sum', 'table_average']:
-                if not table_data:
-                    raise ValueError(f"Table data required for {func_name} function")
-                
-                if len(args) < 1:
-                    raise ValueError(f"{func_name} requires at least one argument (row_identifier)")
-                
-                row_identifier = args[0].strip('"\'')
-                values = _get_column_values(row_identifier, table_data)
-                
-                if func_name == 'table_max':
-                    result = max(values)
-                elif func_name == 'table_min':
-                    result = min(values)
-                elif func_name == 'table_sum':
-                    result = sum(values)
-                elif func_name == 'table_average':
-                    result = sum(values) / len(values) if values else 0.0
-                
-                results.append(result)
-                
-            else:
-                parsed_args = []
-                number_pattern = re.compile(r'-?[\d,]+(?:\.\d+)?(?:\s*[%$KMBT]|\s*[a-zA-Z]+)?')
-                for arg in args:
-                    if arg.startswith('#'):
-                        index = int(arg[1:])
-                        if index >= len(results):
-                            raise ValueError(f"Invalid reference #{index}: only {len(results)} results available")
-                        parsed_args.append(results[index])
-                    elif arg.startswith('const_'):
-                        tm_value = float(arg.split("_")[1])
-                        parsed_args.append(tm_value)
-                    else:
-                        try:
-                            match = number_pattern.search(arg)
-                            if match:
-                                number_str = match.group(0)
-                                cleaned_str = re.sub(r'[^\d.-]', '', number_str)
-                                value = float(cleaned_str)
-                                # Convert percentage to decimal if % is present
-                                if '%' in number_str:
-                                    value = value / 100
-                                parsed_args.append(value)
-                            else:
-                                raise ValueError(f"Invalid number: {arg}")
-                        except (ValueError, TypeError):
-                            raise ValueError(f"Invalid number: {arg}")
-
-                if func_name == 'add':
-                    if len(parsed_args) != 2:
-                        raise ValueError(f"add requires exactly 2 arguments, got {len(parsed_args)}")
-                    result = parsed_args[0] + parsed_args[1]
-                elif func_name == 'subtract':
-                    if len(parsed_args) != 2:
-                        raise ValueError(f"subtract requires exactly 2 arguments, got {len(parsed_args)}")
-                    result = parsed_args[0] - parsed_args[1]
-                elif func_name == 'multiply':
-                    if len(parsed_args) != 2:
-                        raise ValueError(f"multiply requires exactly 2 arguments, got {len(parsed_args)}")
-                    result = parsed_args[0] * parsed_args[1]
-                elif func_name == 'divide':
-                    if len(parsed_args) != 2:
-                        raise ValueError(f"divide requires exactly 2 arguments, got {len(parsed_args)}")
-                    if parsed_args[1] == 0:
-                        raise ValueError("Division by zero")
-                    result = parsed_args[0] / parsed_args[1]
-                else:
-                    raise ValueError(f"Unknown function: {func_name}")
+    Args:
+        programs (List[str]): The program strings.
+        table_data (Union[ParsedTable, List[List]], optional): A table shared by every program.
+        tables (List[Union[ParsedTable, List[List]]], optional): One table per program, overriding `table_data`.
 
-                results.append(result)
-        else:
-            raise ValueError(f"Invalid operation format: {operation}")
+    Returns:
+        List[Union[str, Exception]]: For each program, what `execute_program` would return
+            (the result with 4 decimal places), or the exception it would raise.
+    """
+    if tables is None:
+        tables = [table_data] * len(programs)
+    outputs: List[Any] = [None] * len(programs)
+    groups: Dict[tuple, List[Tuple[int, CompiledProgram]]] = {}
 
-    if not results:
-        raise ValueError("No results generated")
+    for i, program in enumerate(programs):
+        try:
+            compiled = compile_program(program)
+            if compiled.shape is None:
+                outputs[i] = f"{compiled.run(tables[i]):.4f}"
+            else:
+                groups.setdefault(compiled.shape, []).append((i, compiled))
+        except (ValueError, IndexError) as e:
+            outputs[i] = e
 
-    return f"{results[-1]:.4f}"
+    for members in groups.values():
+        _run_group(members, tables, outputs)
+    return outputs